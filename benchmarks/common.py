@@ -0,0 +1,49 @@
+import os
+import platform
+import tempfile
+from pathlib import Path
+
+
+def prepare_environment(db_url: str | None = None) -> Path:
+    """
+    Настройки читаются при импорте src.config, поэтому окружение готовится до импорта приложения.
+    Если ключей JWT нет - генерируются временные, чтобы прогон не зависел от certs/.
+    Возвращает временную папку прогона.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="todo-bench-"))
+    os.environ["DB__URL"] = db_url or f"sqlite+aiosqlite:///{workdir / 'bench.db'}"
+
+    from src.config import settings
+
+    if settings.auth.JWT_PRIVATE_KEY_PATH.exists() and settings.auth.JWT_PUBLIC_KEY_PATH.exists():
+        return workdir
+
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_path = workdir / "jwt-private.pem"
+    public_path = workdir / "jwt-public.pem"
+    private_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ))
+    public_path.write_bytes(key.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    ))
+    settings.auth.JWT_PRIVATE_KEY_PATH = private_path
+    settings.auth.JWT_PUBLIC_KEY_PATH = public_path
+    return workdir
+
+
+def environment_meta() -> dict:
+    """Описание машины для отчета: сравнивать имеет смысл только прогоны на одном окружении"""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
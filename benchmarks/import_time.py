@@ -0,0 +1,70 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Отчет о времени импорта приложения по данным python -X importtime.
+# Импорт идет в отдельном процессе, чтобы модули не были уже загружены.
+#
+#   python -m benchmarks.import_time                 # топ модулей по времени
+#   python -m benchmarks.import_time --budget 1.5    # код 1, если импорт дольше 1.5 s
+
+
+def measure_imports(module: str) -> list[tuple[str, int, int]]:
+    """Список (модуль, собственное время us, накопленное us) в порядке завершения импорта"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if result.returncode != 0:
+        sys.stderr.write(result.stderr)
+        raise SystemExit(f"Импорт {module} завершился с ошибкой")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time:       123 |        456 |   package.module
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def top_level_package(name: str) -> str:
+    return name.split(".")[0]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Время импорта приложения по модулям")
+    parser.add_argument("--module", default="src.main", help="что импортировать")
+    parser.add_argument("--top", type=int, default=25, help="сколько модулей показать")
+    parser.add_argument("--budget", type=float, help="допустимое время импорта, с")
+    args = parser.parse_args(argv)
+
+    rows = measure_imports(args.module)
+    total_us = sum(self_us for _, self_us, _ in rows)
+
+    print(f"Импорт {args.module}: {total_us / 1e6:.3f} s, модулей {len(rows)}\n")
+
+    print(f"{'накопленное, ms':>16} {'собственное, ms':>16}  модуль")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>16.1f} {self_us / 1000:>16.1f}  {name}")
+
+    packages: dict[str, int] = {}
+    for name, self_us, _ in rows:
+        packages[top_level_package(name)] = packages.get(top_level_package(name), 0) + self_us
+    print(f"\n{'всего, ms':>16}  пакет")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>16.1f}  {package}")
+
+    if args.budget is not None and total_us / 1e6 > args.budget:
+        print(f"\nИмпорт дольше бюджета {args.budget:.2f} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
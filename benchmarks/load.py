@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from benchmarks.common import environment_meta, prepare_environment
+
+# Нагрузочный прогон API в одном процессе: приложение src.main:app вызывается
+# напрямую через ASGI-транспорт httpx, без сети и uvicorn. База - временный SQLite
+# (по умолчанию) или локальный Postgres через --db-url.
+#
+#   python -m benchmarks.load                       # прогон и таблица
+#   python -m benchmarks.load --save baseline.json  # сохранить базовую линию
+#   python -m benchmarks.load --check baseline.json --threshold 0.2  # сравнить, код 1 при регрессии
+
+BENCH_EMAIL = "bench-{}@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+class BenchContext:
+    """Общие данные прогона: клиент, заголовки и заранее созданные строки"""
+
+    def __init__(self, client, email: str):
+        self.client = client
+        self.email = email
+        self.headers: dict[str, str] = {}
+        self.id_list = 0 # лист для операций с задачами
+        self.large_list_id = 0 # лист с большим количеством задач
+        self.list_ids: list[int] = []
+        self.task_ids: list[int] = [] # задачи для patch
+        self.deletable_task_ids: list[int] = [] # задачи для delete
+
+
+async def seed(ctx: BenchContext, requests: int, large_list_size: int) -> None:
+    """Заполнение базы напрямую через ORM, чтобы подготовка не попадала в замеры"""
+    from src.auth import utils as auth_utils
+    from src.database.crud import auth as auth_crud
+    from src.database.crud import todo_lists as todo_lists_crud
+    from src.database.tables import TasksORM
+    from src.models.schemas import ListAddSchema
+
+    user = await auth_crud.create_user(
+        name="bench",
+        email=ctx.email,
+        hashed_password=auth_utils.hash_password(BENCH_PASSWORD),
+    )
+
+    lst = ListAddSchema(title="bench", description="bench")
+    for _ in range(max(requests // 10, 1)):
+        new_lst = await todo_lists_crud.add_todo_lists(id_user=user.id_user, lst=lst)
+        ctx.list_ids.append(new_lst.id_list)
+    ctx.id_list = ctx.list_ids[0]
+    ctx.large_list_id = (await todo_lists_crud.add_todo_lists(id_user=user.id_user, lst=lst)).id_list
+
+    from src.database.config import session_factory
+
+    async with session_factory() as session:
+        tasks = [TasksORM(task_name=f"task {i}", list_id=ctx.id_list) for i in range(requests * 2)]
+        tasks += [
+            TasksORM(task_name=f"large {i}", completed=i % 3 == 0, list_id=ctx.large_list_id)
+            for i in range(large_list_size)
+        ]
+        session.add_all(tasks)
+        await session.commit()
+        ctx.task_ids = [t.id_task for t in tasks[:requests]]
+        ctx.deletable_task_ids = [t.id_task for t in tasks[requests:requests * 2]]
+
+    response = await ctx.client.post(
+        "/auth/login",
+        data={"username": ctx.email, "password": BENCH_PASSWORD},
+    )
+    response.raise_for_status()
+    ctx.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+Scenario = Callable[[BenchContext, int], Awaitable]
+
+# имя -> запрос; i - номер запроса в сценарии
+SCENARIOS: dict[str, Scenario] = {
+    "login": lambda ctx, i: ctx.client.post(
+        "/auth/login", data={"username": ctx.email, "password": BENCH_PASSWORD}),
+    "auth_me": lambda ctx, i: ctx.client.get("/auth/me", headers=ctx.headers),
+    "list_create": lambda ctx, i: ctx.client.post(
+        "/me/to-do-lists", json={"title": f"list {i}", "description": "bench"}, headers=ctx.headers),
+    "list_read": lambda ctx, i: ctx.client.get("/me/to-do-lists", headers=ctx.headers),
+    "list_patch": lambda ctx, i: ctx.client.patch(
+        f"/me/to-do-lists/{ctx.list_ids[i % len(ctx.list_ids)]}", json={"title": f"renamed {i}"}, headers=ctx.headers),
+    "task_create": lambda ctx, i: ctx.client.post(
+        f"/me/todo_lists/{ctx.id_list}/tasks", json={"task_name": f"new task {i}"}, headers=ctx.headers),
+    "task_read": lambda ctx, i: ctx.client.get(f"/me/todo_lists/{ctx.id_list}/tasks", headers=ctx.headers),
+    "task_patch": lambda ctx, i: ctx.client.patch(
+        f"/me/todo_lists/{ctx.id_list}/tasks/{ctx.task_ids[i % len(ctx.task_ids)]}",
+        json={"completed": i % 2 == 0}, headers=ctx.headers),
+    "task_delete": lambda ctx, i: ctx.client.delete(
+        f"/me/todo_lists/{ctx.id_list}/tasks/{ctx.deletable_task_ids[i]}", headers=ctx.headers),
+    "large_list_read": lambda ctx, i: ctx.client.get(
+        f"/me/todo_lists/{ctx.large_list_id}/tasks", headers=ctx.headers),
+}
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(ctx: BenchContext, scenario: Scenario, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter: # общий итератор раздает номера запросов всем воркерам
+            started = time.perf_counter()
+            response = await scenario(ctx, i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    from src.main import app, lifespan
+
+    results = {}
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            ctx = BenchContext(client, BENCH_EMAIL.format(time.time_ns()))
+            await seed(ctx, args.requests, args.large_list_size)
+
+            for name in args.scenarios:
+                requests = args.login_requests if name == "login" else args.requests
+                results[name] = await run_scenario(ctx, SCENARIOS[name], requests, args.concurrency)
+                print_row(name, results[name])
+
+    return {
+        "meta": {
+            **environment_meta(),
+            "database": os.environ["DB__URL"].split("://")[0],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "large_list_size": args.large_list_size,
+        },
+        "results": results,
+    }
+
+
+def print_row(name: str, row: dict) -> None:
+    print(
+        f"{name:<16} {row['throughput_rps']:>10.1f} rps"
+        f"  p50 {row['p50_ms']:>8.2f} ms  p95 {row['p95_ms']:>8.2f} ms  p99 {row['p99_ms']:>8.2f} ms"
+        f"  errors {row['errors']}"
+    )
+
+
+def check_regressions(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Регрессия - p95 вырос или пропускная способность упала больше чем на threshold (доля).
+    Сценарии, которых нет в базовой линии, не проверяются.
+    """
+    regressions = []
+    for name, row in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if row["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms")
+        if row["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {base['throughput_rps']:.1f} -> {row['throughput_rps']:.1f} rps")
+        if row["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {row['errors']}")
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон эндпоинтов API")
+    parser.add_argument("--db-url", help="база для прогона, по умолчанию временный SQLite")
+    parser.add_argument("--concurrency", type=int, default=10, help="одновременных клиентов")
+    parser.add_argument("--requests", type=int, default=200, help="запросов на сценарий")
+    parser.add_argument("--login-requests", type=int, default=10, help="запросов логина (bcrypt медленный)")
+    parser.add_argument("--large-list-size", type=int, default=5000, help="задач в большом листе")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--output", type=Path, help="записать отчет в JSON")
+    parser.add_argument("--save", type=Path, help="сохранить отчет как базовую линию")
+    parser.add_argument("--check", type=Path, help="сравнить с базовой линией")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое ухудшение (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.check and not args.check.exists():
+        print(f"Нет базовой линии {args.check}, сначала запустите make bench-baseline")
+        return 2
+
+    prepare_environment(args.db_url)
+    report = asyncio.run(run(args))
+
+    for path in (args.output, args.save):
+        if path:
+            path.write_text(json.dumps(report, indent=2))
+            print(f"Отчет записан в {path}")
+
+    if args.check:
+        regressions = check_regressions(report, json.loads(args.check.read_text()), args.threshold)
+        if regressions:
+            print("Регрессии производительности:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("Регрессий нет")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
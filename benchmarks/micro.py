@@ -0,0 +1,204 @@
+import argparse
+import gc
+import json
+import math
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.common import environment_meta, prepare_environment
+
+# Микробенчмарки горячих примитивов: bcrypt и JWT из src/auth/utils.py,
+# валидация и сериализация pydantic-схем пачками разного размера.
+#
+#   python -m benchmarks.micro --output before.json
+#   python -m benchmarks.micro --compare before.json             # прогон и сравнение
+#   python -m benchmarks.micro --compare before.json after.json  # сравнение двух файлов
+
+BENCH_PASSWORD = "bench-password"
+
+
+def build_benchmarks(batch_sizes: list[int]) -> dict[str, Callable[[], Any]]:
+    """Имя -> функция без аргументов. Вся подготовка данных выполняется здесь, вне замеров."""
+    from pydantic import TypeAdapter
+    from src.auth import utils as auth_utils
+    from src.auth.schemas import TokenInfo, UserReadSchema, UserRegisterSchema
+    from src.database.tables import ListsORM, TasksORM
+    from src.models.schemas import (
+        ListAddSchema,
+        ListResponseSchema,
+        TaskAddSchema,
+        TaskPatchSchema,
+        TaskResponseSchema,
+    )
+
+    payload = {"sub": "bench@example.com", "name": "bench", "user_id": 1}
+    password_hash = auth_utils.hash_password(BENCH_PASSWORD)
+    token = auth_utils.encode_jwt_token(payload)
+
+    benchmarks: dict[str, Callable[[], Any]] = {
+        "auth.hash_password": lambda: auth_utils.hash_password(BENCH_PASSWORD),
+        "auth.validate_password": lambda: auth_utils.validate_password(BENCH_PASSWORD, password_hash),
+        "auth.encode_jwt_token": lambda: auth_utils.encode_jwt_token(payload),
+        "auth.decode_jwt_token": lambda: auth_utils.decode_jwt_token(
+            encoded_token=token,
+            public_key=auth_utils.get_public_key(),
+            algorithm=auth_utils.ALGORITHM,
+        ),
+        "schemas.TokenInfo.dump_json": lambda: TokenInfo(access_token=token).model_dump_json(),
+    }
+
+    def add_batch(name: str, schema, raw: list, dump: bool = False) -> None:
+        # пачка валидируется одним TypeAdapter, как это делает FastAPI для list[...] в response_model
+        adapter = TypeAdapter(list[schema])
+        for size in batch_sizes:
+            items = raw[:size]
+            benchmarks[f"schemas.{name}.validate[{size}]"] = lambda items=items: adapter.validate_python(items)
+            if dump:
+                models = adapter.validate_python(items)
+                benchmarks[f"schemas.{name}.dump_python_json[{size}]"] = (
+                    lambda models=models: adapter.dump_python(models, mode="json"))
+                benchmarks[f"schemas.{name}.dump_json[{size}]"] = lambda models=models: adapter.dump_json(models)
+
+    largest = max(batch_sizes)
+    add_batch("TaskAddSchema", TaskAddSchema, [
+        {"task_name": f"task number {i}", "completed": i % 2 == 0} for i in range(largest)])
+    add_batch("TaskPatchSchema", TaskPatchSchema, [{"completed": True} for _ in range(largest)])
+    add_batch("ListAddSchema", ListAddSchema, [
+        {"title": f"list {i}", "description": "some description"} for i in range(largest)])
+    add_batch("UserRegisterSchema", UserRegisterSchema, [
+        {"name": "bench", "email": f"user{i}@example.com", "password": BENCH_PASSWORD} for i in range(largest)])
+    add_batch("UserReadSchema", UserReadSchema, [
+        {"id_user": i, "name": "bench", "email": f"user{i}@example.com"} for i in range(largest)])
+    # ответы строятся из ORM-объектов (from_attributes)
+    add_batch("TaskResponseSchema", TaskResponseSchema, [
+        TasksORM(id_task=i, task_name=f"task number {i}", completed=i % 2 == 0, list_id=1) for i in range(largest)],
+        dump=True)
+    add_batch("ListResponseSchema", ListResponseSchema, [
+        ListsORM(id_list=i, title=f"list {i}", description="some description", user_id=1) for i in range(largest)],
+        dump=True)
+
+    return benchmarks
+
+
+def measure(func: Callable[[], Any], samples: int, min_time: float) -> dict:
+    """
+    Калибрует число повторов так, чтобы один замер длился не меньше min_time,
+    затем снимает samples замеров (время одного вызова). GC на время замера отключен (timeit).
+    """
+    timer = timeit.Timer(func)
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.2))
+
+    gc.collect()
+    values = [timer.timeit(loops) / loops for _ in range(samples)]
+    return {
+        "loops": loops,
+        "samples": values,
+        "mean": statistics.fmean(values),
+        "stdev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "median": statistics.median(values),
+        "min": min(values),
+    }
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def welch_test(old: list[float], new: list[float]) -> tuple[float, float]:
+    """
+    t-критерий Уэлча (разные дисперсии). p-value по нормальному приближению -
+    при 10+ замерах с каждой стороны погрешность невелика, а scipy не нужен.
+    """
+    if len(old) < 2 or len(new) < 2:
+        return 0.0, 1.0
+    se = math.sqrt(statistics.variance(old) / len(old) + statistics.variance(new) / len(new))
+    if se == 0:
+        return 0.0, 1.0 if statistics.fmean(old) == statistics.fmean(new) else 0.0
+    t = (statistics.fmean(new) - statistics.fmean(old)) / se
+    p = 2 * (1 - statistics.NormalDist().cdf(abs(t)))
+    return t, p
+
+
+def compare(old_report: dict, new_report: dict, alpha: float) -> None:
+    print(f"{'benchmark':<52} {'old':>10} {'new':>10} {'change':>8}  p-value")
+    for name, new in new_report["benchmarks"].items():
+        old = old_report["benchmarks"].get(name)
+        if old is None:
+            continue
+        _, p = welch_test(old["samples"], new["samples"])
+        change = new["mean"] / old["mean"] - 1
+        if p >= alpha:
+            verdict = "не значимо"
+        else:
+            verdict = "быстрее" if change < 0 else "медленнее"
+        print(
+            f"{name:<52} {format_time(old['mean']):>10} {format_time(new['mean']):>10}"
+            f" {change:>+8.1%}  {p:.3f} {verdict}"
+        )
+
+
+def parse_args(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Микробенчмарки auth-примитивов и pydantic-схем")
+    parser.add_argument("--samples", type=int, default=15, help="замеров на бенчмарк")
+    parser.add_argument("--min-time", type=float, default=0.05, help="минимальная длительность замера, с")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--filter", default="", help="только бенчмарки, в имени которых есть подстрока")
+    parser.add_argument("--output", type=Path, help="записать результаты в JSON")
+    parser.add_argument("--compare", type=Path, nargs="+", metavar="REPORT",
+                        help="OLD - прогнать и сравнить с OLD; OLD NEW - только сравнить два файла")
+    parser.add_argument("--alpha", type=float, default=0.05, help="уровень значимости для сравнения")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    if args.compare and len(args.compare) == 2:
+        old, new = (json.loads(path.read_text()) for path in args.compare)
+        compare(old, new, args.alpha)
+        return 0
+
+    prepare_environment()
+    benchmarks = {
+        name: func for name, func in build_benchmarks(args.batch_sizes).items()
+        if args.filter in name
+    }
+
+    results = {}
+    for name, func in benchmarks.items():
+        results[name] = measure(func, args.samples, args.min_time)
+        row = results[name]
+        print(f"{name:<52} {format_time(row['mean']):>10} ± {format_time(row['stdev']):>10}  (x{row['loops']})")
+
+    report = {
+        "meta": {
+            **environment_meta(),
+            "samples": args.samples,
+            "min_time": args.min_time,
+        },
+        "benchmarks": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Результаты записаны в {args.output}")
+
+    if args.compare:
+        print()
+        compare(json.loads(args.compare[0].read_text()), report, args.alpha)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.common import environment_meta, prepare_environment
+from benchmarks.load import (
+    BENCH_PASSWORD,
+    SCENARIOS,
+    BenchContext,
+    print_row,
+    run_scenario,
+)
+
+# Сравнение сочетаний цикла событий (asyncio/uvloop) и парсера HTTP (h11/httptools):
+# на каждое сочетание поднимается python -m src.main с SERVER__LOOP/SERVER__HTTP,
+# клиенты ходят к нему по настоящему TCP с keep-alive.
+# Недоступные в окружении варианты пропускаются (uv sync --extra server).
+#
+#   python -m benchmarks.runtime
+#   python -m benchmarks.runtime --concurrency 100 --requests 5000 --output runtime.json
+
+LOOPS = ("asyncio", "uvloop")
+HTTP_PARSERS = ("h11", "httptools")
+RUNTIME_SCENARIOS = ("auth_me", "list_read", "task_read")
+
+
+def available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(loop: str, http: str, port: int) -> subprocess.Popen:
+    from src.config import settings
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")])),
+        "SERVER__HOST": "127.0.0.1",
+        "SERVER__PORT": str(port),
+        "SERVER__LOOP": loop,
+        "SERVER__HTTP": http,
+        # ключи могли быть сгенерированы prepare_environment только в настройках этого процесса
+        "AUTH__JWT_PRIVATE_KEY_PATH": str(settings.auth.JWT_PRIVATE_KEY_PATH),
+        "AUTH__JWT_PUBLIC_KEY_PATH": str(settings.auth.JWT_PUBLIC_KEY_PATH),
+        "MONITORING__SERVER_TIMING": "false",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.main"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(client, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            await client.get("/metrics")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise SystemExit("Сервер не ответил за отведенное время")
+
+
+async def seed(ctx: BenchContext) -> None:
+    """Данные создаются через API: сервер в отдельном процессе"""
+    response = await ctx.client.post(
+        "/auth/register", json={"name": "bench", "email": ctx.email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    response = await ctx.client.post("/auth/login", data={"username": ctx.email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    ctx.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await ctx.client.post(
+        "/me/to-do-lists", json={"title": "bench", "description": "bench"}, headers=ctx.headers)
+    response.raise_for_status()
+    ctx.id_list = response.json()["id_list"]
+    ctx.list_ids = [ctx.id_list]
+    for i in range(100):
+        response = await ctx.client.post(
+            f"/me/todo_lists/{ctx.id_list}/tasks", json={"task_name": f"task {i}"}, headers=ctx.headers)
+        response.raise_for_status()
+
+
+async def run_combination(loop: str, http: str, args) -> dict:
+    import httpx
+
+    port = free_port()
+    process = start_server(loop, http, port)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            await wait_ready(client, process)
+            ctx = BenchContext(client, f"runtime-{loop}-{http}-{time.time_ns()}@example.com")
+            await seed(ctx)
+
+            results = {}
+            for name in args.scenarios:
+                await run_scenario(ctx, SCENARIOS[name], args.warmup, args.concurrency) # прогрев соединений
+                results[name] = await run_scenario(ctx, SCENARIOS[name], args.requests, args.concurrency)
+                print_row(f"{loop}/{http} {name}", results[name])
+            return results
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def run(args) -> dict:
+    results = {}
+    for loop in args.loops:
+        for http in args.http:
+            if not available(loop) or not available(http):
+                print(f"{loop}/{http}: не установлен, пропуск")
+                continue
+            results[f"{loop}/{http}"] = await run_combination(loop, http, args)
+
+    return {
+        "meta": {
+            **environment_meta(),
+            "database": os.environ["DB__URL"].split("://")[0],
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+        "results": results,
+    }
+
+
+def print_summary(report: dict) -> None:
+    """Пропускная способность сочетаний относительно asyncio/h11 (значения uvicorn без extras)"""
+    base = report["results"].get("asyncio/h11")
+    if base is None:
+        return
+    print(f"\n{'сочетание':<20} " + " ".join(f"{name:>16}" for name in base))
+    for combination, rows in report["results"].items():
+        cells = [f"{rows[name]['throughput_rps'] / base[name]['throughput_rps']:>15.2f}x" for name in base]
+        print(f"{combination:<20} " + " ".join(cells))
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Сравнение цикла событий и парсера HTTP под нагрузкой")
+    parser.add_argument("--db-url", help="база для прогона, по умолчанию временный SQLite")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных клиентов")
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=200, help="запросов прогрева на сценарий")
+    parser.add_argument("--loops", nargs="+", choices=LOOPS, default=list(LOOPS))
+    parser.add_argument("--http", nargs="+", choices=HTTP_PARSERS, default=list(HTTP_PARSERS))
+    parser.add_argument("--scenarios", nargs="+", choices=RUNTIME_SCENARIOS, default=list(RUNTIME_SCENARIOS))
+    parser.add_argument("--output", type=Path, help="записать отчет в JSON")
+    args = parser.parse_args(argv)
+
+    prepare_environment(args.db_url)
+    report = asyncio.run(run(args))
+    print_summary(report)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Отчет записан в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.common import environment_meta, prepare_environment
+
+# Статистика задач (src/stats.py): векторные агрегаты NumPy против той же сводки циклом на чистом Python.
+#
+#   python -m benchmarks.stats                       # 1M задач в памяти: строки -> сводка
+#   python -m benchmarks.stats --db                  # плюс полный путь из временного SQLite:
+#                                                    # столбцы в массивы vs ORM-объекты и цикл
+#   python -m benchmarks.stats --db --db-url postgresql+asyncpg://...
+#
+# Перед замерами сводки обоих способов сравниваются - бенчмарк заодно проверяет src/stats.py.
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def generate_rows(tasks: int, lists: int, today: int, seed: int) -> list[tuple[int, int, int, int]]:
+    """Строки (list_id, completed, created_day, completed_day) - как их отдает выборка столбцов"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    list_id = rng.zipf(1.3, tasks) % lists + 1 # листы разного размера: несколько крупных, много мелких
+    created_day = today - rng.integers(0, 90, tasks)
+    completed = rng.random(tasks) < 0.6
+    completed_day = np.where(completed, np.minimum(created_day + rng.integers(0, 10, tasks), today), -1)
+    return list(zip(
+        list_id.tolist(), completed.astype(int).tolist(), created_day.tolist(), completed_day.tolist()))
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """Линейная интерполяция, как np.percentile по умолчанию"""
+    position = q * (len(sorted_values) - 1)
+    low = math.floor(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def _distribution(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {"min": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    ordered = sorted(values)
+    return {
+        "min": float(ordered[0]),
+        "p50": _percentile(ordered, 0.5),
+        "p90": _percentile(ordered, 0.9),
+        "p99": _percentile(ordered, 0.99),
+        "max": float(ordered[-1]),
+        "mean": statistics.fmean(ordered),
+    }
+
+
+def python_summarize(rows, today: int, days: int, top: int | None) -> dict[str, Any]:
+    """Та же сводка, что src.stats.summarize, одним проходом по строкам со словарем листов"""
+    start = today - days + 1
+    per_list: dict[int, list[int]] = {}
+    created_daily = [0] * days
+    completed_daily = [0] * days
+    completed = 0
+    for list_id, done, created_day, completed_day in rows:
+        counts = per_list.get(list_id)
+        if counts is None:
+            counts = per_list[list_id] = [0, 0]
+        counts[0] += 1
+        if 0 <= created_day - start < days:
+            created_daily[created_day - start] += 1
+        if done:
+            counts[1] += 1
+            completed += 1
+            if 0 <= completed_day - start < days:
+                completed_daily[completed_day - start] += 1
+
+    ids = sorted(per_list)
+    if top is not None and top < len(ids):
+        ids = sorted(ids, key=lambda list_id: (-per_list[list_id][0], list_id))[:top]
+    return {
+        "tasks": len(rows),
+        "completed": completed,
+        "completion_rate": completed / len(rows) if rows else 0.0,
+        "lists": len(per_list),
+        "tasks_per_list": _distribution([count for count, _ in per_list.values()]),
+        "completion_rate_per_list": _distribution([done / count for count, done in per_list.values()]),
+        "per_list": [
+            {"list_id": list_id, "tasks": per_list[list_id][0], "completed": per_list[list_id][1],
+             "completion_rate": per_list[list_id][1] / per_list[list_id][0]}
+            for list_id in ids
+        ],
+        "daily": [
+            {"day": date(1970, 1, 1) + timedelta(days=start + i), "created": created_daily[i],
+             "completed": completed_daily[i]}
+            for i in range(days)
+        ],
+    }
+
+
+def assert_same(expected: Any, actual: Any, path: str = "") -> None:
+    """Сводки совпадают; дробные - с точностью до погрешности суммирования"""
+    if isinstance(expected, dict):
+        assert expected.keys() == actual.keys(), f"{path}: {expected.keys()} != {actual.keys()}"
+        for key in expected:
+            assert_same(expected[key], actual[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(expected) == len(actual), f"{path}: {len(expected)} != {len(actual)}"
+        for i, (left, right) in enumerate(zip(expected, actual)):
+            assert_same(left, right, f"{path}[{i}]")
+    elif isinstance(expected, float):
+        assert math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-12), f"{path}: {expected} != {actual}"
+    else:
+        assert expected == actual, f"{path}: {expected} != {actual}"
+
+
+def measure(func: Callable[[], Any], repeat: int) -> dict:
+    values = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        values.append(time.perf_counter() - started)
+    return {"samples": values, "median": statistics.median(values), "min": min(values)}
+
+
+async def measure_async(func: Callable[[], Any], repeat: int) -> dict:
+    values = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        values.append(time.perf_counter() - started)
+    return {"samples": values, "median": statistics.median(values), "min": min(values)}
+
+
+def print_pair(name: str, python: dict, numpy: dict) -> None:
+    print(
+        f"{name:<28} python {python['median'] * 1000:>10.1f} ms   numpy {numpy['median'] * 1000:>8.1f} ms"
+        f"   x{python['median'] / numpy['median']:.1f}"
+    )
+
+
+def run_memory(rows, today: int, args) -> dict:
+    from src.stats import rows_to_array, summarize, to_columns
+
+    def numpy_summary():
+        chunks = [rows_to_array(rows[i:i + args.chunk]) for i in range(0, len(rows), args.chunk)]
+        return summarize(to_columns(chunks), today, args.days, args.top)
+
+    assert_same(python_summarize(rows, today, args.days, args.top), numpy_summary())
+
+    columns = to_columns([rows_to_array(rows)])
+    results = {
+        "python": measure(lambda: python_summarize(rows, today, args.days, args.top), args.repeat),
+        "numpy": measure(numpy_summary, args.repeat), # вместе с переводом строк в массивы
+        "numpy_aggregate": measure(lambda: summarize(columns, today, args.days, args.top), args.repeat),
+    }
+    print_pair("строки -> сводка", results["python"], results["numpy"])
+    print(f"{'  из них агрегаты NumPy':<28} {'':>21} {results['numpy_aggregate']['median'] * 1000:>8.1f} ms")
+    return results
+
+
+async def seed(rows, lists: int) -> None:
+    """Задачи вставляются напрямую пачками; даты - полдень дня из строки (created_at, updated_at выполненных)"""
+    from sqlalchemy import insert
+    from src.database.config import session_factory
+    from src.database.tables import ListsORM, TasksORM, UsersORM
+
+    async with session_factory() as session:
+        await session.execute(insert(UsersORM), [{
+            "id_user": 1, "name": "bench", "email": "stats@example.com", "hashed_password": b"-"}])
+        await session.execute(insert(ListsORM), [
+            {"id_list": i, "title": f"list {i}", "description": "bench", "user_id": 1} for i in range(1, lists + 1)])
+        noon = timedelta(hours=12)
+        for i in range(0, len(rows), 50_000):
+            await session.execute(insert(TasksORM), [
+                {
+                    "task_name": "bench task",
+                    "list_id": list_id,
+                    "completed": bool(done),
+                    "created_at": EPOCH + timedelta(days=created_day) + noon,
+                    "updated_at": EPOCH + timedelta(days=completed_day if done else created_day) + noon,
+                }
+                for list_id, done, created_day, completed_day in rows[i:i + 50_000]
+            ])
+        await session.commit()
+
+
+async def run_db(rows, today: int, args) -> dict:
+    from sqlalchemy import select
+    from src.database.config import (
+        create_schema,
+        dispose_engine,
+        init_engine,
+        session_factory,
+    )
+    from src.database.crud import stats as stats_crud
+    from src.database.tables import TasksORM
+    from src.stats import summarize
+
+    # только схема и движок: фоновые задачи приложения не должны делить с замером SQLite
+    await create_schema()
+    init_engine()
+    try:
+        started = time.perf_counter()
+        await seed(rows, args.lists)
+        print(f"База заполнена за {time.perf_counter() - started:.1f} s")
+
+        async def orm_summary():
+            # то, что заменяет src/stats.py: ORM-объекты и цикл по ним
+            async with session_factory() as session:
+                tasks = (await session.execute(select(TasksORM))).scalars().all()
+            return python_summarize([
+                (task.list_id, task.completed, (task.created_at - EPOCH).days,
+                 (task.updated_at - EPOCH).days if task.completed else -1)
+                for task in tasks
+            ], today, args.days, args.top)
+
+        async def numpy_summary():
+            return summarize(await stats_crud.get_task_columns(), today, args.days, args.top)
+
+        assert_same(await orm_summary(), await numpy_summary())
+        results = {
+            "python": await measure_async(orm_summary, args.repeat),
+            "numpy": await measure_async(numpy_summary, args.repeat),
+        }
+    finally:
+        await dispose_engine()
+    print_pair("база -> сводка", **results)
+    return results
+
+
+def parse_args(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Статистика задач: NumPy против чистого Python")
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--lists", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=30, help="длина ряда по дням")
+    parser.add_argument("--top", type=int, default=20, help="крупнейших листов в per_list")
+    parser.add_argument("--chunk", type=int, default=50_000, help="строк в порции (как FETCH_CHUNK)")
+    parser.add_argument("--repeat", type=int, default=5, help="замеров на способ")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", action="store_true", help="также полный путь из базы (заполнение занимает время)")
+    parser.add_argument("--db-url", help="база для --db, по умолчанию временный SQLite")
+    parser.add_argument("--output", type=Path, help="записать результаты в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    prepare_environment(args.db_url)
+
+    today = (date.today() - date(1970, 1, 1)).days
+    rows = generate_rows(args.tasks, args.lists, today, args.seed)
+    print(f"{args.tasks} задач в {args.lists} листах, ряд {args.days} дней, медиана {args.repeat} замеров")
+
+    results = {"memory": run_memory(rows, today, args)}
+    if args.db:
+        results["db"] = asyncio.run(run_db(rows, today, args))
+
+    if args.output:
+        report = {"meta": {**environment_meta(), "tasks": args.tasks, "lists": args.lists}, "benchmarks": results}
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Результаты записаны в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
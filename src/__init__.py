@@ -0,0 +1,3 @@
+import time
+
+STARTED_AT = time.perf_counter() # начало импорта приложения, от него считается бюджет старта (lifespan); src.server сдвигает на момент форка
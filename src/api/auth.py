@@ -16,8 +16,9 @@ from src.auth.schemas import (
 )
 from src.database.config import session_factory  #, get_session
 from src.database.tables import UsersORM
+from src.monitoring.timing import TimedRoute
 
-router = APIRouter(prefix="/auth", tags=["Авторизация"])
+router = APIRouter(prefix="/auth", tags=["Авторизация"], route_class=TimedRoute)
 
 @router.post(
     "/register",
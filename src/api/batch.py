@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from src.auth.dependencies import get_user_status_by_token
+from src.auth.schemas import UserReadSchema
+from src.database.crud import batch as batch_crud
+from src.models.schemas import BatchRequestSchema, BatchResponseSchema
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["Пакетные операции"], route_class=TimedRoute)
+
+
+@router.post(
+    "/batch",
+    summary="Несколько операций с листами и задачами в одной транзакции",
+    status_code=status.HTTP_200_OK,
+    response_model=BatchResponseSchema,
+)
+async def run_batch(
+    batch: BatchRequestSchema,
+    user: UserReadSchema = Depends(get_user_status_by_token), # одна аутентификация на весь батч
+):
+    try:
+        results = await batch_crud.run_batch(
+            id_user=user.id_user,
+            operations=batch.operations,
+        )
+    except batch_crud.BatchOperationError as error: # ничего не применено
+        raise HTTPException(
+            status_code=error.status_code,
+            detail={
+                "index": error.index,
+                "op": error.op,
+                "detail": error.detail,
+            },
+        )
+    return {"results": results}
@@ -0,0 +1,89 @@
+import asyncio
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+
+from src.auth.dependencies import get_user_status_by_token, get_user_status_by_ws_token
+from src.auth.schemas import UserReadSchema
+from src.config import settings
+from src.events.broker import broker
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["События в реальном времени"], route_class=TimedRoute)
+
+
+@router.get(
+    "/events",
+    summary="Поток изменений листов и задач (Server-Sent Events)",
+    response_class=StreamingResponse,
+)
+async def stream_events(
+    request: Request,
+    last_event_id: int | None = Header(None, alias="Last-Event-ID"), # браузер сам присылает при переподключении
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    user_id = user.id_user
+
+    async def event_stream():
+        # подписка внутри генератора, чтобы она точно закрылась вместе с ответом
+        with broker.subscribe(user_id, last_event_id) as subscription:
+            async for event in subscription.events(heartbeat=settings.events.HEARTBEAT_SECONDS):
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n" if event is None else event.to_sse()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no", # nginx не должен буферизовать поток
+        },
+    )
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    """Читает входящие кадры, пока клиент не закроет соединение"""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.websocket("/events/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    last_event_id: int | None = Query(None),
+    user: UserReadSchema = Depends(get_user_status_by_ws_token),
+):
+    """
+    То же, что /me/events, но через WebSocket.
+    Каждое событие - JSON-сообщение {id, user_id, type, data}.
+    """
+    await websocket.accept()
+    receiver = asyncio.create_task(_wait_disconnect(websocket))
+
+    try:
+        with broker.subscribe(user.id_user, last_event_id) as subscription:
+            async for event in subscription.events(heartbeat=settings.events.HEARTBEAT_SECONDS):
+                if receiver.done(): # клиент ушел
+                    return
+                if event is not None: # пинги в сокете делает сам сервер (uvicorn)
+                    await websocket.send_text(event.model_dump_json())
+
+        # очередь переполнилась - просим клиента переподключиться с last_event_id
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
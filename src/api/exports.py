@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, StreamingResponse
+
+from src.auth.dependencies import get_user_status_by_token
+from src.auth.schemas import UserReadSchema
+from src.database.crud import jobs as jobs_crud
+from src.jobs.exports import (
+    EXPORT_JOB,
+    MEDIA_TYPES,
+    ExportFormat,
+    export_path,
+    export_stream,
+)
+from src.jobs.queue import job_queue
+from src.models.schemas import JobSchema
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["Импорт и выгрузка"], route_class=TimedRoute)
+
+
+def _export_response(user_id: int, format: ExportFormat, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        export_stream(user_id, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
+
+
+@router.get(
+    "/export",
+    summary="Выгрузка всех листов и задач потоком (NDJSON или CSV)",
+    response_class=StreamingResponse,
+)
+async def export_data(
+    format: ExportFormat = Query("ndjson"),
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    return _export_response(user.id_user, format, "export")
+
+@router.post(
+    "/export",
+    summary="Выгрузка в сжатый файл фоновой задачей",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobSchema,
+)
+async def export_data_to_file(
+    format: ExportFormat = Query("ndjson"),
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    """Когда задача в статусе done, файл отдает GET /me/export/{id_job}"""
+    job = await job_queue.enqueue(EXPORT_JOB, {"format": format}, user_id=user.id_user)
+    return job
+
+@router.get(
+    "/export/{job_id}",
+    summary="Файл фоновой выгрузки (gzip)",
+    response_class=FileResponse,
+)
+async def get_export_file(
+    job_id: int,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    job = await jobs_crud.get_user_job(user_id=user.id_user, job_id=job_id)
+    if job is None or job.type != EXPORT_JOB:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job.status != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Export is not ready")
+    path = export_path(job.id_job, job.payload["format"])
+    if not path.exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export file expired")
+    return FileResponse(path, media_type="application/gzip", filename=path.name)
+
+
+# админские роуты
+admin = APIRouter(route_class=TimedRoute)
+
+
+@admin.get(
+    "/users/{user_id}/export",
+    tags=["Admin"],
+    summary="Выгрузка листов и задач пользователя потоком",
+    response_class=StreamingResponse,
+    )
+async def export_user_data(user_id: int, format: ExportFormat = Query("ndjson")):
+    return _export_response(user_id, format, f"user-{user_id}")
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, Query, Request, status
+
+from src.auth.dependencies import get_user_status_by_token
+from src.auth.schemas import UserReadSchema
+from src.jobs.imports import IMPORT_JOB, ImportFormat, save_upload
+from src.jobs.queue import job_queue
+from src.models.schemas import JobSchema
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["Импорт и выгрузка"], route_class=TimedRoute)
+
+
+@router.post(
+    "/import",
+    summary="Массовый импорт листов и задач из CSV или NDJSON (тело запроса - файл)",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobSchema,
+)
+async def import_data(
+    request: Request,
+    format: ImportFormat = Query("ndjson"),
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    """Файл сохраняется в TRANSFER__DIR и импортируется фоновой задачей, прогресс - GET /me/jobs/{id_job}"""
+    path = await save_upload(request, format)
+    job = await job_queue.enqueue(IMPORT_JOB, {"path": str(path), "format": format}, user_id=user.id_user)
+    return job
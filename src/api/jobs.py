@@ -0,0 +1,53 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from src.auth.dependencies import get_user_status_by_token
+from src.auth.schemas import UserReadSchema
+from src.database.crud import jobs as jobs_crud
+from src.models.schemas import JobSchema
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["Фоновые задачи"], route_class=TimedRoute)
+
+
+@router.get(
+    "/jobs",
+    summary="Последние фоновые задачи пользователя",
+    status_code=status.HTTP_200_OK,
+    response_model=list[JobSchema],
+)
+async def get_my_jobs(user: UserReadSchema = Depends(get_user_status_by_token)):
+    jobs = await jobs_crud.get_user_jobs(user_id=user.id_user)
+    return jobs
+
+@router.get(
+    "/jobs/{job_id}",
+    summary="Состояние и прогресс фоновой задачи",
+    status_code=status.HTTP_200_OK,
+    response_model=JobSchema,
+)
+async def get_my_job(
+    job_id: int,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    job = await jobs_crud.get_user_job(user_id=user.id_user, job_id=job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+# админские роуты
+admin = APIRouter(route_class=TimedRoute)
+
+
+@admin.get(
+    "/jobs",
+    tags=["Admin"],
+    summary="Фоновые задачи всех пользователей",
+    status_code=status.HTTP_200_OK,
+    response_model=list[JobSchema],
+    )
+async def get_jobs(job_status: Literal["pending", "running", "done", "failed"] | None = None):
+    jobs = await jobs_crud.get_jobs(status=job_status)
+    return jobs
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.monitoring.metrics import registry
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(tags=["Мониторинг"], route_class=TimedRoute)
+
+
+@router.get(
+    "/metrics",
+    summary="Метрики в текстовом формате Prometheus",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def metrics():
+    text = await registry.render()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
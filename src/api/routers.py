@@ -1,14 +1,22 @@
 from fastapi import APIRouter
 
 from src.api.auth import router as auth_router_latest
+from src.api.batch import router as batch_router
+from src.api.events import router as events_router
+from src.api.exports import router as exports_router
+from src.api.imports import router as imports_router
+from src.api.jobs import router as jobs_router
+from src.api.metrics import router as metrics_router
+from src.api.stats import router as stats_router
+from src.api.sync import router as sync_router
+from src.api.tags import router as tags_router
 from src.api.tasks import admin as admin_tasks_router
 from src.api.tasks import router as tasks_router
 from src.api.todo_lists import admin as admin_lists_router
 from src.api.todo_lists import router as todo_list_router
 from src.api.users import admin as admin_users_router
 from src.api.users import router as user_router
-from src.demo_auth.views import router as demo_auth_router
-from src.demo_auth_advanced.demo_jwt_auth import router as demo_jwt_auth_router
+from src.config import settings
 
 all_router = APIRouter() # базовый роутер для всего АПИ
 
@@ -16,6 +24,21 @@ all_router = APIRouter() # базовый роутер для всего АПИ
 all_router.include_router(user_router)
 all_router.include_router(todo_list_router)
 all_router.include_router(tasks_router)
+all_router.include_router(tags_router)
+all_router.include_router(stats_router)
 all_router.include_router(auth_router_latest)
-# all_router.include_router(demo_jwt_auth_router)
-# all_router.include_router(demo_auth_router)
+all_router.include_router(events_router)
+all_router.include_router(sync_router)
+all_router.include_router(batch_router)
+all_router.include_router(metrics_router)
+all_router.include_router(jobs_router)
+all_router.include_router(imports_router)
+all_router.include_router(exports_router)
+
+# учебные роутеры: их модули при импорте читают ключи, поэтому импорт только по настройке
+if settings.app.DEMO_ROUTERS:
+    from src.demo_auth.views import router as demo_auth_router
+    from src.demo_auth_advanced.demo_jwt_auth import router as demo_jwt_auth_router
+
+    all_router.include_router(demo_jwt_auth_router)
+    all_router.include_router(demo_auth_router)
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query, status
+
+from src.auth.dependencies import get_user_status_by_token
+from src.auth.schemas import UserReadSchema
+from src.jobs.queue import utcnow
+from src.models.schemas import StatsSchema
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["Статистика"], route_class=TimedRoute)
+
+# src/stats.py и crud статистики импортируются в обработчиках: NumPy (~70 мс) грузится
+# при первом запросе статистики, а не при старте приложения
+
+
+def _today() -> int:
+    """Сегодня (UTC) днем от эпохи - в тех же единицах, что даты из базы"""
+    return (utcnow().date() - date(1970, 1, 1)).days
+
+
+@router.get(
+    "/stats",
+    summary="Доля выполненных задач, распределения по листам и ряд по дням (свои и совместные листы)",
+    status_code=status.HTTP_200_OK,
+    response_model=StatsSchema,
+)
+async def get_my_stats(
+    days: int = Query(30, ge=1, le=366, description="длина ряда по дням, включая сегодня (UTC)"),
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    from src.database.crud import stats as stats_crud
+    from src.stats import summarize
+
+    columns = await stats_crud.get_user_task_columns(id_user=user.id_user)
+    return await asyncio.to_thread(summarize, columns, _today(), days)
+
+
+# админские роуты
+admin = APIRouter(route_class=TimedRoute)
+
+
+@admin.get(
+    "/stats",
+    tags=["Admin"],
+    summary="Статистика по всем задачам; в per_list - только top крупнейших листов",
+    status_code=status.HTTP_200_OK,
+    response_model=StatsSchema,
+    )
+async def get_stats(
+    days: int = Query(30, ge=1, le=366),
+    top: int = Query(20, ge=1, le=1000),
+):
+    from src.database.crud import stats as stats_crud
+    from src.stats import summarize
+
+    columns = await stats_crud.get_task_columns()
+    # агрегаты по миллионам задач - в потоке, чтобы не держать цикл событий
+    return await asyncio.to_thread(summarize, columns, _today(), days, top)
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from src.auth.dependencies import get_user_status_by_token
+from src.auth.schemas import UserReadSchema
+from src.database.crud import sync as sync_crud
+from src.models.schemas import SyncResponseSchema
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["Синхронизация"], route_class=TimedRoute)
+
+
+@router.get(
+    "/sync",
+    summary="Изменения листов и задач после курсора (since=0 - все данные)",
+    status_code=status.HTTP_200_OK,
+    response_model=SyncResponseSchema,
+)
+async def sync_changes(
+    since: str = Query("0", max_length=4096, pattern=r"^\d+(,\d+:\d+)*$"), # cursor из предыдущего ответа
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    try:
+        result = await sync_crud.get_changes(
+            id_user=user.id_user,
+            since=since,
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="Invalid sync cursor")
+    return result
@@ -0,0 +1,85 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from src.auth.dependencies import get_user_status_by_token
+from src.auth.schemas import UserReadSchema
+from src.database.batcher import run_task_write
+from src.database.crud import tags as tags_crud
+from src.models.schemas import TagResponseSchema, TaskResponseSchema, TaskTagsSchema
+from src.monitoring.timing import TimedRoute
+
+router = APIRouter(prefix="/me", tags=["Теги задач"], route_class=TimedRoute)
+
+
+@router.get(
+    "/tags",
+    summary="Теги пользователя и число задач с каждым",
+    status_code=status.HTTP_200_OK,
+    response_model=list[TagResponseSchema],
+)
+async def get_my_tags(user: UserReadSchema = Depends(get_user_status_by_token)):
+    return await tags_crud.get_tags(id_user=user.id_user)
+
+@router.get(
+    "/tasks",
+    summary="Задачи всех листов с тегами (match=all - все теги, any - хотя бы один)",
+    status_code=status.HTTP_200_OK,
+    response_model=list[TaskResponseSchema],
+)
+async def get_tasks_by_tags(
+    tags: str = Query(..., description="теги через запятую: a,b"),
+    match: Literal["all", "any"] = "all",
+    after_id: int | None = Query(None, ge=1, description="id последней задачи предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000),
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    names = [name.strip() for name in tags.split(",") if name.strip()]
+    if not names:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="No tags given")
+    return await tags_crud.get_tasks_by_tags(
+        id_user=user.id_user,
+        names=names,
+        match=match,
+        after_id=after_id,
+        limit=limit,
+    )
+
+@router.get(
+    "/todo_lists/{id_list}/tasks/{id_task}/tags",
+    summary="Теги задачи",
+    status_code=status.HTTP_200_OK,
+    response_model=list[str],
+)
+async def get_task_tags(
+    id_list: int,
+    id_task: int,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    names = await tags_crud.get_task_tags(id_user=user.id_user, id_list=id_list, id_task=id_task)
+    if names is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return names
+
+@router.put(
+    "/todo_lists/{id_list}/tasks/{id_task}/tags",
+    summary="Заменить теги задачи (недостающие теги создаются)",
+    status_code=status.HTTP_200_OK,
+    response_model=list[str],
+)
+async def put_task_tags(
+    id_list: int,
+    id_task: int,
+    data: TaskTagsSchema,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    names = await run_task_write(
+        tags_crud.set_task_tags,
+        id_user=user.id_user,
+        id_list=id_list,
+        id_task=id_task,
+        names=data.tags,
+    )
+    if names is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return names
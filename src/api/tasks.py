@@ -1,19 +1,27 @@
+from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # from src.api.dependencies import SessionDep
 from src.auth.dependencies import get_user_status_by_token
 from src.auth.schemas import UserReadSchema
+from src.config import settings
+from src.database.batcher import run_task_write
 from src.database.crud import tasks as tasks_crud
+from src.jobs.positions import REBALANCE_JOB
+from src.jobs.queue import job_queue, utcnow
 from src.models.schemas import (
     TaskAddSchema,
+    TaskMoveSchema,
     TaskPatchSchema,
     TaskResponseSchema,
+    TaskTreeSchema,
     TaskUpdateSchema,
 )
+from src.monitoring.timing import TimedRoute
 
-router = APIRouter(prefix="/me", tags=["Работа с задачами внутри списков"])
+router = APIRouter(prefix="/me", tags=["Работа с задачами внутри списков"], route_class=TimedRoute)
 
 
 @router.post(
@@ -27,7 +35,8 @@ async def create_task_in_lst(
     task: TaskAddSchema,
     user: UserReadSchema = Depends(get_user_status_by_token),
 ):
-    new_tsk = await tasks_crud.add_task(
+    new_tsk = await run_task_write(
+        tasks_crud.add_task,
         id_user=user.id_user,
         id_list=id_list,
         tsk=task,
@@ -47,11 +56,51 @@ async def create_task_in_lst(
     )
 async def get_tasks_from_list(
     id_list: int,
+    include_archived: bool = Query(False, description="добавить задачи из архива (archived_tasks)"),
     user: UserReadSchema = Depends(get_user_status_by_token),
 ):
     result = await tasks_crud.get_all_tasks(
         id_user=user.id_user,
         id_list=id_list,
+        include_archived=include_archived,
+    )
+    return result
+
+@router.get(
+    "/todo_lists/{id_list}/tasks/tree",
+    summary="Задачи листа деревом с подзадачами (или поддерево root_id)",
+    status_code=status.HTTP_200_OK,
+    response_model=list[TaskTreeSchema],
+    )
+async def get_task_tree_from_list(
+    id_list: int,
+    root_id: int | None = None,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    result = await tasks_crud.get_task_tree(
+        id_user=user.id_user,
+        id_list=id_list,
+        root_id=root_id,
+    )
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    return result
+
+@router.get(
+    "/tasks/due",
+    summary="Просроченные задачи и задачи со сроком в ближайшие hours часов по всем листам",
+    status_code=status.HTTP_200_OK,
+    response_model=list[TaskResponseSchema],
+    )
+async def get_due_tasks(
+    hours: float = Query(24, ge=0, le=24 * 366),
+    limit: int = Query(500, ge=1, le=1000),
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    result = await tasks_crud.get_due_tasks(
+        id_user=user.id_user,
+        until=utcnow() + timedelta(hours=hours),
+        limit=limit,
     )
     return result
 
@@ -67,7 +116,8 @@ async def edit_task_in_lst(
     data: TaskPatchSchema,
     user: UserReadSchema= Depends(get_user_status_by_token)
 ):
-    edited_task = await tasks_crud.patch_task(
+    edited_task = await run_task_write(
+        tasks_crud.patch_task,
         id_task=id_task,
         id_user=user.id_user,
         id_list=id_list,
@@ -78,6 +128,57 @@ async def edit_task_in_lst(
 
     return edited_task
 
+@router.post(
+    "/todo_lists/{id_list}/tasks/{id_task}/move",
+    summary="Переставить задачу после другой (или в начало)",
+    status_code=status.HTTP_200_OK,
+    response_model=TaskResponseSchema,
+    )
+async def move_task_in_lst(
+    id_task: int,
+    id_list: int,
+    data: TaskMoveSchema,
+    user: UserReadSchema = Depends(get_user_status_by_token)
+):
+    try:
+        moved_task = await run_task_write(
+            tasks_crud.move_task,
+            id_task=id_task,
+            id_user=user.id_user,
+            id_list=id_list,
+            data=data,
+        )
+    except ValueError as error: # перенос в собственное поддерево
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+    if moved_task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+
+    if len(moved_task.position) > settings.db.POSITION_REBALANCE_LENGTH:
+        await job_queue.enqueue(REBALANCE_JOB, {"list_id": id_list}, user_id=user.id_user)
+
+    return moved_task
+
+@router.post(
+    "/todo_lists/{id_list}/tasks/{id_task}/restore",
+    summary="Вернуть задачу из архива",
+    status_code=status.HTTP_200_OK,
+    response_model=TaskResponseSchema,
+    )
+async def restore_task_in_lst(
+    id_task: int,
+    id_list: int,
+    user: UserReadSchema = Depends(get_user_status_by_token)
+):
+    restored_task = await tasks_crud.restore_task(
+        id_task=id_task,
+        id_user=user.id_user,
+        id_list=id_list,
+    )
+    if restored_task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Archived task not found")
+
+    return restored_task
+
 @router.delete(
     "/todo_lists/{id_list}/tasks/{id_task}",
     summary="Удалить задачу по айди",
@@ -87,7 +188,8 @@ async def delete_task_from_lst(
     id_list: int,
     user: UserReadSchema = Depends(get_user_status_by_token)
 ):
-    task_to_delete = await tasks_crud.delete_task(
+    task_to_delete = await run_task_write(
+        tasks_crud.delete_task,
         id_task=id_task,
         id_user=user.id_user,
         id_list=id_list,
@@ -100,7 +202,7 @@ async def delete_task_from_lst(
 
 
 # админские роуты
-admin = APIRouter()
+admin = APIRouter(route_class=TimedRoute)
 
 @admin.post(
     "/users/{id_user}/todo_lists/{id_list}/tasks",
@@ -131,10 +233,12 @@ async def add_task(
 async def get_all_tasks(
     id_user: int,
     id_list: int,
+    include_archived: bool = False,
 ):
     result = await tasks_crud.get_all_tasks(
         id_user=id_user,
         id_list=id_list,
+        include_archived=include_archived,
     )
     return result
 
@@ -10,12 +10,15 @@ from src.database.crud import todo_lists
 from src.database.crud import todo_lists as todo_lists_crud
 from src.models.schemas import (
     ListAddSchema,
+    ListMemberAddSchema,
+    ListMemberResponseSchema,
     ListPatchSchema,
     ListResponseSchema,
     ListUpdateSchema,
 )
+from src.monitoring.timing import TimedRoute
 
-router = APIRouter(prefix="/me", tags=["Работа с листами задач"])
+router = APIRouter(prefix="/me", tags=["Работа с листами задач"], route_class=TimedRoute)
 
 # ссылкается на схему в которой обязательно надо указывать айди юзера
 # надо исправить схему или добавить отдельную
@@ -105,8 +108,69 @@ async def delete_list(
     return None
 
 
+@router.get(
+    "/to-do-lists/{list_id}/members",
+    summary="Участники листа задач",
+    status_code=status.HTTP_200_OK,
+    response_model=list[ListMemberResponseSchema],
+)
+async def get_list_members(
+    list_id: int,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    members = await todo_lists_crud.get_members(
+        id_user=user.id_user,
+        id_list=list_id,
+    )
+    if members is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="List not found")
+    return members
+
+@router.put(
+    "/to-do-lists/{list_id}/members",
+    summary="Поделиться листом с пользователем или поменять его роль (viewer, editor)",
+    status_code=status.HTTP_200_OK,
+    response_model=ListMemberResponseSchema,
+)
+async def put_list_member(
+    list_id: int,
+    data: ListMemberAddSchema,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    try:
+        member = await todo_lists_crud.put_member(
+            id_user=user.id_user,
+            id_list=list_id,
+            data=data,
+        )
+    except ValueError as error:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(error))
+    if member is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="List or user not found")
+    return member
+
+@router.delete(
+    "/to-do-lists/{list_id}/members/{id_user}",
+    summary="Убрать участника листа (участник может убрать себя сам)",
+    status_code=status.HTTP_204_NO_CONTENT,
+)
+async def delete_list_member(
+    list_id: int,
+    id_user: int,
+    user: UserReadSchema = Depends(get_user_status_by_token),
+):
+    deleted = await todo_lists_crud.delete_member(
+        id_user=user.id_user,
+        id_list=list_id,
+        id_member=id_user,
+    )
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="List or member not found")
+    return None
+
+
 # админские роуты
-admin = APIRouter(tags=["Admin"])
+admin = APIRouter(tags=["Admin"], route_class=TimedRoute)
 
 
 @admin.post(
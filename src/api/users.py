@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import delete, select
 
 # from src.api.dependencies import SessionDep
@@ -6,14 +6,18 @@ from src.auth.dependencies import get_user_status_by_token
 from src.auth.exceptions import AlreadyRegisteredException, UserNotFoundException
 from src.auth.schemas import UserReadSchema
 from src.database.crud import users as users_crud
+from src.jobs.queue import job_queue
 from src.models.schemas import (
+    JobSchema,
     UserAddSchema,
+    UserPageSchema,
     UserPatchSchema,
     UserResponseSchema,
     UserUpdateSchema,
 )
+from src.monitoring.timing import TimedRoute
 
-router = APIRouter(prefix="/me", tags=["Личный кабинет"])
+router = APIRouter(prefix="/me", tags=["Личный кабинет"], route_class=TimedRoute)
 
 
 @router.patch(
@@ -41,19 +45,21 @@ async def patch_me(
 @router.delete(
     "/profile",
     summary="Удалить аккаунт",
-    status_code=status.HTTP_204_NO_CONTENT,
-)
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobSchema,
+) # аккаунт сразу недоступен, листы и задачи удаляет фоновая задача
 async def delete_me(user: UserReadSchema = Depends(get_user_status_by_token)):
-    result = await users_crud.delete_user(
+    job = await users_crud.delete_user(
         user_id=user.id_user,
     )
-    if result is None:
+    if job is None:
         raise UserNotFoundException()
-    return result
+    job_queue.wake()
+    return job
 
 
 # админские роуты
-admin = APIRouter()
+admin = APIRouter(route_class=TimedRoute)
 
 
 @admin.post(
@@ -72,13 +78,36 @@ async def create_user(
 @admin.get(
     "/users",
     tags=["Admin"],
-    summary="Вывести всех пользователей",
+    summary="Поиск пользователей по префиксу почты и подстроке имени, постранично",
     status_code=status.HTTP_200_OK,
-    response_model=list[UserResponseSchema] # лист потому что вывод на несколько юзеров
+    response_model=UserPageSchema,
+    )
+async def get_users(
+    email: str | None = Query(None, max_length=32, description="начало почты, без учета регистра"),
+    name: str | None = Query(None, max_length=32, description="часть имени, без учета регистра"),
+    after_id: int | None = Query(None, ge=1, description="next_after_id предыдущей страницы"),
+    after_email: str | None = Query(None, max_length=320, description="next_after_email предыдущей страницы (с email)"),
+    limit: int = Query(50, ge=1, le=500),
+    count: bool = Query(True, description="считать total (точно до ADMIN__EXACT_COUNT_LIMIT, дальше оценка)"),
+):
+    if email and after_id is not None and after_email is None:
+        # при поиске по почте страницы идут по (почта, id): одного id для продолжения мало
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="after_email is required with email and after_id")
+    users = await users_crud.get_users(
+        email=email, name=name, after_id=after_id, after_email=after_email, limit=limit + 1) # +1 - есть ли еще
+    total, estimated = None, False
+    if count:
+        total, estimated = await users_crud.count_users(email=email, name=name)
+    last = users[limit - 1] if len(users) > limit else None
+    return UserPageSchema(
+        items=users[:limit],
+        next_after_id=last.id_user if last is not None else None,
+        next_after_email=last.email.lower() if last is not None and email else None,
+        total=total,
+        total_is_estimate=estimated,
     )
-async def get_users():
-    users = await users_crud.get_users()
-    return users
 
 @admin.patch(
     "/users/{user_id}",
@@ -101,10 +130,14 @@ async def patch_user(
     "/users/{user_id}",
     tags=["Admin"],
     summary="Удалить пользователя",
-    status_code=status.HTTP_204_NO_CONTENT,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobSchema,
 )
 async def delete_user(user_id: int):
-    result = await users_crud.delete_user(
+    job = await users_crud.delete_user(
         user_id=user_id,
     )
-    return result
+    if job is None:
+        raise UserNotFoundException()
+    job_queue.wake()
+    return job
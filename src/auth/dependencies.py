@@ -1,5 +1,13 @@
 import jwt  # используется pyjwt (см uv.lock)
-from fastapi import Depends, Form, HTTPException, status
+from fastapi import (
+    Depends,
+    Form,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketException,
+    status,
+)
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import EmailStr
 from sqlalchemy import select
@@ -8,6 +16,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.auth import utils as auth_utils
 from src.auth.exceptions import (
     AlreadyRegisteredException,
+    AuthException,
     InvalidCredentialsException,
     TokenExpiredException,
     TokenInvalidException,
@@ -18,6 +27,8 @@ from src.auth.schemas import UserRegisterSchema
 from src.database.config import session_factory  #get_session
 from src.database.crud import auth as auth_crud
 from src.database.tables import UsersORM
+from src.monitoring.metrics import record_auth_failure
+from src.monitoring.timing import phase
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -31,11 +42,12 @@ async def register_user(
     Проверяет в базе дублирование почты.
     Хеширует полученный пароль и вносит его с данными в базу.
     """
-    user = await auth_crud.get_user_by_email(user_data.email)
+    user = await auth_crud.get_user_by_email(user_data.email, include_deleted=True) # почта удаленного занята до очистки
     if user:
         raise AlreadyRegisteredException()
 
-    hashed_password_bytes = auth_utils.hash_password(user_data.password)
+    with phase("bcrypt"):
+        hashed_password_bytes = await auth_utils.hash_password_async(user_data.password)
 
     new_user = await auth_crud.create_user(
         name=user_data.name,
@@ -60,10 +72,12 @@ async def validate_credentials(
     if not user:
         raise InvalidCredentialsException()
 
-    if not auth_utils.validate_password(
-        password=password,
-        hashed_password=user.hashed_password
-    ):
+    with phase("bcrypt"):
+        password_valid = await auth_utils.validate_password_async(
+            password=password,
+            hashed_password=user.hashed_password
+        )
+    if not password_valid:
         raise InvalidCredentialsException()
 
     return user
@@ -77,11 +91,12 @@ async def get_token_payload(
     Данные проверяются сразу и используются при необходимости без обращения в БД.
     """
     try:
-        payload = auth_utils.decode_jwt_token(
-            encoded_token=token,
-            public_key=auth_utils.PUBLIC_KEY,
-            algorithm=auth_utils.ALGORITHM
-        )
+        with phase("jwt"):
+            payload = auth_utils.decode_jwt_token(
+                encoded_token=token,
+                public_key=auth_utils.get_public_key(),
+                algorithm=auth_utils.ALGORITHM
+            )
         return payload
     except jwt.ExpiredSignatureError:
         raise TokenExpiredException()
@@ -101,8 +116,32 @@ async def get_user_status_by_token(
     if not email:
         raise TokenMissingSubException()
 
-    user = await auth_crud.get_user_by_email(email=email)
+    with phase("principal"):
+        user = await auth_crud.get_user_by_email(email=email)
     if user is None:
         raise TokenUserNotFoundException()
 
     return user
+
+
+async def get_user_status_by_ws_token(
+    websocket: WebSocket,
+    token: str | None = Query(None),
+) -> UsersORM:
+    """
+    Аналог get_user_status_by_token для WebSocket.
+    Браузер не может передать заголовок Authorization при открытии сокета,
+    поэтому токен принимается и из query-параметра token.
+    При ошибке соединение закрывается с кодом 1008.
+    """
+    if token is None:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+
+    try:
+        payload = await get_token_payload(token)
+        return await get_user_status_by_token(payload)
+    except AuthException as error:
+        record_auth_failure(error)
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=error.detail)
@@ -62,3 +62,10 @@ class UserNotFoundException(BaseAppException):
 
     def __init__(self):
         super().__init__()
+
+class ListAccessDeniedException(BaseAppException):
+    status_code = status.HTTP_403_FORBIDDEN
+    detail = "Недостаточно прав на лист"
+
+    def __init__(self):
+        super().__init__()
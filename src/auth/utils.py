@@ -1,18 +1,49 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import bcrypt
 import jwt
+from jwt.algorithms import get_default_algorithms
 
 from src.config import settings
+from src.monitoring.metrics import registry
 
 # BASE_DIR = Path(__file__).resolve().parent.parent.parent
 # PRIVATE_KEY_PATH = BASE_DIR / "certs" / "jwt-private-key.pem"
 # PUBLIC_KEY_PATH = BASE_DIR / "certs" / "jwt-public-key.pem"
 
-PRIVATE_KEY = settings.auth.JWT_PRIVATE_KEY_PATH.read_text()
-PUBLIC_KEY = settings.auth.JWT_PUBLIC_KEY_PATH.read_text()
 ALGORITHM = settings.auth.ALGORITHM
 
+
+def _prepare_key(path):
+    """
+    Читает PEM и разбирает его в объект ключа cryptography.
+    PyJWT принимает готовый объект и не разбирает PEM заново на каждом encode/decode.
+    """
+    algorithm = get_default_algorithms()[settings.auth.ALGORITHM]
+    return algorithm.prepare_key(path.read_text())
+
+@functools.cache
+def get_private_key():
+    """Ключ подписи, читается при первом обращении (или в load_keys при старте)"""
+    return _prepare_key(settings.auth.JWT_PRIVATE_KEY_PATH)
+
+@functools.cache
+def get_public_key():
+    """Ключ проверки подписи, читается при первом обращении (или в load_keys при старте)"""
+    return _prepare_key(settings.auth.JWT_PUBLIC_KEY_PATH)
+
+def load_keys() -> None:
+    """
+    Загружает оба ключа заранее: вызывается из lifespan, чтобы отсутствие certs/
+    обнаружилось при старте, а не на первом логине.
+    """
+    get_private_key()
+    get_public_key()
+
+
 def hash_password(
     password: str,
 ) -> bytes:
@@ -40,9 +71,55 @@ def validate_password(
         hashed_password=hashed_password,
     )
 
+class BcryptExecutor:
+    """
+    Пул потоков для bcrypt: 14 раундов - это сотни миллисекунд CPU,
+    в цикле событий они останавливали бы все остальные запросы.
+    bcrypt отпускает GIL, поэтому потоки работают параллельно.
+    Счетчик ожидающих меняется только из цикла событий.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.submitted = 0 # отправлено в пул и еще не завершено
+
+    async def run(self, func, *args):
+        self.submitted += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.submitted -= 1
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self.submitted - self.workers, 0)
+
+
+bcrypt_executor = BcryptExecutor(settings.auth.BCRYPT_WORKERS)
+
+BCRYPT_QUEUE_DEPTH = registry.gauge("bcrypt_executor_queue_depth", "Задачи bcrypt, ждущие свободного потока")
+BCRYPT_ACTIVE = registry.gauge("bcrypt_executor_active", "Задачи bcrypt, выполняющиеся в потоках")
+
+
+def _collect_bcrypt() -> None:
+    BCRYPT_QUEUE_DEPTH.set(value=bcrypt_executor.queue_depth)
+    BCRYPT_ACTIVE.set(value=min(bcrypt_executor.submitted, bcrypt_executor.workers))
+
+
+registry.register_collector("bcrypt", _collect_bcrypt)
+
+async def hash_password_async(password: str) -> bytes:
+    """hash_password в пуле bcrypt_executor"""
+    return await bcrypt_executor.run(hash_password, password)
+
+async def validate_password_async(password: str, hashed_password: bytes) -> bool:
+    """validate_password в пуле bcrypt_executor"""
+    return await bcrypt_executor.run(validate_password, password, hashed_password)
+
 def encode_jwt_token(
     payload: dict,
-    private_key: str = PRIVATE_KEY,
+    private_key=None, # по умолчанию get_private_key()
     algorithm: str = ALGORITHM,
     expire_minutes: int = settings.auth.ACCESS_TOKEN_EXPIRE_MINUTES,
     expire_time_delta: timedelta | None = None,
@@ -66,7 +143,7 @@ def encode_jwt_token(
 
     token = jwt.encode(
         encoded_payload,
-        private_key,
+        private_key or get_private_key(),
         algorithm,
     )
     return token
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import zlib
+
+from src.config import settings
+from src.monitoring.metrics import registry
+from src.monitoring.timing import phase
+
+# опциональные зависимости: uv sync --extra compression
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_BYTES = registry.counter(
+    "http_compression_input_bytes_total", "Байт ответов до сжатия", ("encoding",))
+COMPRESSED_BYTES = registry.counter(
+    "http_compression_output_bytes_total", "Байт ответов после сжатия", ("encoding",))
+
+THREAD_MIN_SIZE = 256 * 1024 # тело больше этого сжимается в потоке, чтобы не держать цикл событий
+SKIP_CONTENT_TYPES = (
+    b"text/event-stream", # SSE: события должны уходить сразу, без буфера компрессора
+    b"application/gzip", # уже сжатые файлы (выгрузки) повторно не сжимаются
+)
+
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # 16 - формат gzip
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encoders() -> dict:
+    """Content-Encoding -> фабрика кодировщика, в порядке предпочтения из настроек"""
+    config = settings.compression
+    factories = {
+        "gzip": lambda: GzipEncoder(config.GZIP_LEVEL),
+        "br": (lambda: BrotliEncoder(config.BROTLI_QUALITY)) if brotli is not None else None,
+        "zstd": (lambda: ZstdEncoder(config.ZSTD_LEVEL)) if zstandard is not None else None,
+    }
+    return {name: factories[name] for name in config.ENCODINGS if factories[name] is not None}
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """'gzip;q=0.8, br, *;q=0' -> {'gzip': 0.8, 'br': 1.0, '*': 0.0}"""
+    weights = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights
+
+
+def choose_encoding(header: str, encoders) -> str | None:
+    """
+    Кодировка с наибольшим q клиента, при равных - по порядку encoders.
+    Неупомянутые кодировки получают q от '*', если он есть, иначе не подходят.
+    """
+    weights = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for name in encoders:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _header(headers: list, name: bytes) -> bytes | None:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _compress_all(encoder, body: bytes) -> bytes:
+    return encoder.compress(body) + encoder.finish()
+
+
+class CompressionMiddleware:
+    """
+    ASGI-middleware: сжимает ответы кодировкой, выбранной по Accept-Encoding (zstd, br, gzip).
+
+    - ответы меньше COMPRESSION__MIN_SIZE уходят как есть;
+    - потоковые ответы (StreamingResponse) сжимаются по частям, без буферизации всего тела;
+    - ответы, у которых уже есть Content-Encoding (заранее сжатые тела), и SSE не трогаются;
+    - к сжимаемым ответам добавляется Vary: Accept-Encoding, чтобы прокси не отдали сжатое не тому клиенту.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.config = settings.compression
+        self.encoders = available_encoders()
+        missing = [name for name in self.config.ENCODINGS if name not in self.encoders]
+        if missing:
+            logger.info("Сжатие %s недоступно: не установлены модули (uv sync --extra compression)", ", ".join(missing))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.config.ENABLED or not self.encoders:
+            await self.app(scope, receive, send)
+            return
+
+        accept = _header(scope["headers"], b"accept-encoding")
+        encoding = choose_encoding(accept.decode("latin-1"), self.encoders) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None # создается, когда решено сжимать
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = _header(headers, b"content-type") or b""
+                if (
+                    _header(headers, b"content-encoding") is not None
+                    or content_type.startswith(SKIP_CONTENT_TYPES)
+                    or message["status"] in (204, 304)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message # заголовки зависят от тела: ждем первую часть
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = [(key, value) for key, value in start["headers"] if key.lower() != b"vary"]
+                vary = _header(start["headers"], b"vary")
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+
+                declared_length = _header(start["headers"], b"content-length")
+                size = int(declared_length) if declared_length is not None else None
+                if not more_body:
+                    size = len(body)
+                if size is not None and size < self.config.MIN_SIZE:
+                    passthrough = True
+                    await send({**start, "headers": headers})
+                    await send(message)
+                    return
+
+                encoder = self.encoders[encoding]()
+                headers = [(key, value) for key, value in headers if key.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                if not more_body:
+                    with phase("compress"):
+                        if len(body) >= THREAD_MIN_SIZE:
+                            compressed = await asyncio.to_thread(_compress_all, encoder, body)
+                        else:
+                            compressed = _compress_all(encoder, body)
+                    RESPONSE_BYTES.inc(encoding, amount=len(body))
+                    COMPRESSED_BYTES.inc(encoding, amount=len(compressed))
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": headers}) # длина потока заранее неизвестна
+
+            # потоковое тело: каждая часть сжимается по мере поступления
+            with phase("compress"):
+                chunk = encoder.compress(body)
+                if not more_body:
+                    chunk += encoder.finish()
+            RESPONSE_BYTES.inc(encoding, amount=len(body))
+            COMPRESSED_BYTES.inc(encoding, amount=len(chunk))
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,225 @@
+import time
+from collections import OrderedDict
+from typing import Any, Literal, NamedTuple
+
+from sqlalchemy import and_, select
+from sqlalchemy import event as sa_event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from src.auth.exceptions import ListAccessDeniedException
+from src.config import settings
+from src.database.tables import ListMembersORM, ListsORM
+from src.events.broker import Event, broker, stage_event
+from src.monitoring.metrics import record_cache
+
+# Права на листы: владелец (lists.user_id) и участники (list_members) с ролью viewer или editor.
+# CRUD листов и задач проверяет доступ через authorize_list, а не джоином с lists по user_id.
+# Ответ (владелец, роль) запоминается в сессии - одна транзакция видит одни права - и в процессе
+# на SHARING__CACHE_TTL_SECONDS, поэтому операция с задачей при попадании в кеш не делает лишних запросов.
+# События об изменениях в листе получают владелец и все участники; их множество кешируется по листу так же.
+# Изменение участников и удаление листа сбрасывают кеши: в своем процессе - сразу после коммита,
+# в остальных - по событиям list.* (нужен EVENTS__BACKEND=postgres); TTL ограничивает устаревание,
+# если событие не дошло.
+
+Role = Literal["viewer", "editor", "owner"]
+ROLE_RANK = {"viewer": 1, "editor": 2, "owner": 3}
+
+SESSION_KEY = "list_access" # ключ в session.info: права, уже проверенные в этой транзакции
+PENDING_KEY = "list_access_invalidate" # листы, кеш которых сбросить после коммита
+INVALIDATING_EVENTS = {"list.created", "list.deleted", "list.member_added", "list.member_removed"}
+
+_MISSING = object()
+
+
+class ListAccess(NamedTuple):
+    owner_id: int
+    role: Role
+
+
+class ListAccessCache:
+    """
+    (пользователь, лист) -> ListAccess или None (доступа нет) с TTL, LRU до SHARING__CACHE_SIZE.
+    generation растет с каждым сбросом: ответ запроса, начатого до сброса, в кеш не кладется.
+    """
+
+    def __init__(self):
+        self.entries: OrderedDict[tuple[int, int], tuple[float, ListAccess | None]] = OrderedDict()
+        self.users_by_list: dict[int, set[int]] = {} # для сброса всех записей листа
+        self.generation = 0
+
+    def get(self, user_id: int, list_id: int) -> Any:
+        key = (user_id, list_id)
+        entry = self.entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, access = entry
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return _MISSING
+        self.entries.move_to_end(key)
+        return access
+
+    def put(self, user_id: int, list_id: int, access: ListAccess | None, generation: int) -> None:
+        if generation != self.generation:
+            return
+        key = (user_id, list_id)
+        self.entries[key] = (time.monotonic() + settings.sharing.CACHE_TTL_SECONDS, access)
+        self.entries.move_to_end(key)
+        self.users_by_list.setdefault(list_id, set()).add(user_id)
+        while len(self.entries) > settings.sharing.CACHE_SIZE:
+            self._drop(next(iter(self.entries)))
+
+    def _drop(self, key: tuple[int, int]) -> None:
+        self.entries.pop(key, None)
+        users = self.users_by_list.get(key[1])
+        if users is not None:
+            users.discard(key[0])
+            if not users:
+                del self.users_by_list[key[1]]
+
+    def invalidate(self, list_id: int) -> None:
+        self.generation += 1
+        for user_id in self.users_by_list.pop(list_id, ()):
+            self.entries.pop((user_id, list_id), None)
+
+
+class ListMembersCache:
+    """Лист -> id участников (без владельца) с TTL, LRU до SHARING__MEMBERS_CACHE_SIZE листов; generation - как у ListAccessCache"""
+
+    def __init__(self):
+        self.entries: OrderedDict[int, tuple[float, frozenset[int]]] = OrderedDict()
+        self.generation = 0
+
+    def get(self, list_id: int) -> frozenset[int] | None:
+        entry = self.entries.get(list_id)
+        if entry is None:
+            return None
+        expires_at, members = entry
+        if expires_at < time.monotonic():
+            del self.entries[list_id]
+            return None
+        self.entries.move_to_end(list_id)
+        return members
+
+    def put(self, list_id: int, members: frozenset[int], generation: int) -> None:
+        if generation != self.generation:
+            return
+        self.entries[list_id] = (time.monotonic() + settings.sharing.CACHE_TTL_SECONDS, members)
+        self.entries.move_to_end(list_id)
+        while len(self.entries) > settings.sharing.MEMBERS_CACHE_SIZE:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, list_id: int) -> None:
+        self.generation += 1
+        self.entries.pop(list_id, None)
+
+
+list_access_cache = ListAccessCache()
+list_members_cache = ListMembersCache()
+
+
+def _invalidate(id_list: int) -> None:
+    list_access_cache.invalidate(id_list)
+    list_members_cache.invalidate(id_list)
+
+
+async def authorize_list(
+    session: AsyncSession,
+    id_user: int,
+    id_list: int,
+    need: Role = "viewer",
+) -> ListAccess | None:
+    """
+    Права id_user на лист. None - листа нет или он недоступен (для клиента - 404, существование не раскрывается),
+    ListAccessDeniedException (403) - лист доступен, но роль ниже need.
+    """
+    known = session.info.setdefault(SESSION_KEY, {})
+    access = known.get((id_user, id_list), _MISSING)
+    if access is _MISSING:
+        access = list_access_cache.get(id_user, id_list)
+        record_cache("list_access", hit=access is not _MISSING)
+        if access is _MISSING:
+            generation = list_access_cache.generation
+            row = (await session.execute(
+                select(ListsORM.user_id, ListMembersORM.role)
+                .outerjoin(ListMembersORM, and_(
+                    ListMembersORM.list_id == ListsORM.id_list,
+                    ListMembersORM.user_id == id_user))
+                .where(ListsORM.id_list == id_list)
+            )).one_or_none()
+            access = None
+            if row is not None and row.user_id == id_user:
+                access = ListAccess(row.user_id, "owner")
+            elif row is not None and row.role is not None:
+                access = ListAccess(row.user_id, row.role)
+            list_access_cache.put(id_user, id_list, access, generation)
+        known[(id_user, id_list)] = access
+
+    if access is None:
+        return None
+    if ROLE_RANK[access.role] < ROLE_RANK[need]:
+        raise ListAccessDeniedException()
+    return access
+
+
+def forget_list(session: AsyncSession | Session, id_list: int) -> None:
+    """Права на лист меняются в этой транзакции: кеш процесса сбросится после коммита"""
+    session.info.setdefault(PENDING_KEY, set()).add(id_list)
+    known = session.info.get(SESSION_KEY)
+    if known:
+        for key in [key for key in known if key[1] == id_list]:
+            del known[key]
+
+
+async def list_members(session: AsyncSession, id_list: int) -> frozenset[int]:
+    """Участники листа (без владельца) - получатели событий о нем"""
+    query = select(ListMembersORM.user_id).where(ListMembersORM.list_id == id_list)
+    if id_list in session.info.get(PENDING_KEY, ()):
+        # участники меняются в этой транзакции: кеш процесса их еще не знает
+        return frozenset((await session.execute(query)).scalars())
+
+    members = list_members_cache.get(id_list)
+    record_cache("list_members", hit=members is not None)
+    if members is None:
+        generation = list_members_cache.generation
+        members = frozenset((await session.execute(query)).scalars())
+        list_members_cache.put(id_list, members, generation)
+    return members
+
+
+async def stage_list_event(
+    session: AsyncSession,
+    id_list: int,
+    access: ListAccess,
+    id_user: int,
+    type: str,
+    data: dict[str, Any],
+) -> None:
+    """Событие об изменении в листе - владельцу, всем участникам и автору изменения"""
+    recipients = {access.owner_id, id_user} | await list_members(session, id_list)
+    for user_id in sorted(recipients):
+        stage_event(session, user_id, type, data)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    session.info.pop(SESSION_KEY, None) # следующая транзакция сессии проверяет права заново
+    for id_list in session.info.pop(PENDING_KEY, ()):
+        _invalidate(id_list)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _invalidate_rolled_back(session: Session):
+    # права, прочитанные внутри откаченной транзакции (например, на созданный в ней лист), тоже недействительны
+    session.info.pop(SESSION_KEY, None)
+    for id_list in session.info.pop(PENDING_KEY, ()):
+        _invalidate(id_list)
+
+
+def _on_event(event: Event) -> None:
+    """Изменения прав, закоммиченные другими процессами"""
+    if event.type in INVALIDATING_EVENTS:
+        _invalidate(event.data["id_list"])
+
+
+broker.listen(_on_event)
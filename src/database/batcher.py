@@ -0,0 +1,165 @@
+import asyncio
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from src.config import settings
+from src.database.config import session_factory
+from src.monitoring.metrics import registry
+from src.monitoring.timing import phase
+
+logger = logging.getLogger(__name__)
+
+WriteFunc = Callable[..., Awaitable[Any]] # CRUD-функция с параметром session
+
+
+class PendingWrite:
+    __slots__ = ("func", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, func: WriteFunc, kwargs: dict, future: asyncio.Future):
+        self.func = func
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+    def resolve(self, result: Any = None, error: BaseException | None = None) -> None:
+        if self.future.done(): # вызывающий уже ушел (отмена запроса)
+            return
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+
+class BatcherStats:
+    """Накопленные счетчики батчей; распределения размеров и ожиданий - в гистограммах ниже"""
+
+    def __init__(self):
+        self.batches = 0
+        self.writes = 0
+        self.fallbacks = 0 # батчи, разобранные на отдельные транзакции из-за ошибки
+        self.wait_seconds_total = 0.0 # суммарное время в очереди до начала транзакции
+
+    def record(self, size: int, waits: list[float]) -> None:
+        self.batches += 1
+        self.writes += size
+        self.wait_seconds_total += sum(waits)
+        GROUP_COMMIT_BATCH_SIZE.observe(value=size)
+        for wait in waits:
+            GROUP_COMMIT_WAIT_SECONDS.observe(value=wait)
+
+
+class GroupCommitBatcher:
+    """
+    Групповой коммит записей задач.
+    Одновременные записи копятся window_ms миллисекунд (или до max_size штук)
+    и выполняются одной транзакцией: один COMMIT и один fsync на весь батч.
+    Каждая запись идет через свою CRUD-функцию, поэтому проверка владельца
+    остается у каждого вызывающего, и каждый получает свой результат.
+    Если транзакция батча падает, записи повторяются по одной,
+    чтобы ошибка досталась только своему вызывающему.
+    """
+
+    def __init__(self, window_ms: float, max_size: int):
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self.pending: list[PendingWrite] = []
+        self.timer: asyncio.TimerHandle | None = None
+        self.running: set[asyncio.Task] = set()
+        self.stats = BatcherStats()
+
+    async def submit(self, func: WriteFunc, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        write = PendingWrite(func, kwargs, loop.create_future())
+        self.pending.append(write)
+
+        if len(self.pending) >= self.max_size:
+            self._flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self._flush)
+
+        with phase("db"): # ожидание батча и его транзакция - время базы для этого запроса
+            return await write.future
+
+    def _flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, []
+        # пустой контекст: иначе задача унаследует замеры запроса, открывшего окно
+        task = asyncio.create_task(self._run(batch), context=contextvars.Context())
+        self.running.add(task)
+        task.add_done_callback(self.running.discard)
+
+    async def _run(self, batch: list[PendingWrite]) -> None:
+        started = time.perf_counter()
+        waits = [started - write.enqueued_at for write in batch]
+
+        try:
+            async with session_factory() as session:
+                results = [
+                    await write.func(**write.kwargs, session=session)
+                    for write in batch
+                ]
+                await session.commit()
+        except Exception:
+            self.stats.fallbacks += 1
+            for write in batch:
+                try:
+                    write.resolve(await write.func(**write.kwargs))
+                except Exception as error:
+                    write.resolve(error=error)
+        else:
+            for write, result in zip(batch, results):
+                write.resolve(result)
+
+        self.stats.record(len(batch), waits)
+        logger.debug(
+            "group commit: %d writes, max wait %.2f ms, transaction %.2f ms",
+            len(batch), max(waits) * 1000, (time.perf_counter() - started) * 1000,
+        )
+
+    async def close(self) -> None:
+        """Дописывает накопленное при остановке приложения"""
+        self._flush()
+        if self.running:
+            await asyncio.gather(*self.running, return_exceptions=True)
+
+
+task_write_batcher = GroupCommitBatcher(
+    window_ms=settings.db.GROUP_COMMIT_WINDOW_MS,
+    max_size=settings.db.GROUP_COMMIT_MAX_SIZE,
+)
+
+GROUP_COMMIT_BATCHES = registry.counter("group_commit_batches_total", "Батчи группового коммита")
+GROUP_COMMIT_WRITES = registry.counter("group_commit_writes_total", "Записи, прошедшие через групповой коммит")
+GROUP_COMMIT_FALLBACKS = registry.counter("group_commit_fallbacks_total", "Батчи, повторенные по одной записи из-за ошибки")
+GROUP_COMMIT_WAIT = registry.counter("group_commit_wait_seconds_total", "Суммарное ожидание записей в очереди батча")
+GROUP_COMMIT_BATCH_SIZE = registry.histogram(
+    "group_commit_batch_size", "Размер батча группового коммита",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+GROUP_COMMIT_WAIT_SECONDS = registry.histogram(
+    "group_commit_wait_seconds", "Ожидание записи в очереди до начала транзакции батча",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+
+def _collect_batcher_stats() -> None:
+    stats = task_write_batcher.stats
+    GROUP_COMMIT_BATCHES.set(value=stats.batches)
+    GROUP_COMMIT_WRITES.set(value=stats.writes)
+    GROUP_COMMIT_FALLBACKS.set(value=stats.fallbacks)
+    GROUP_COMMIT_WAIT.set(value=stats.wait_seconds_total)
+
+
+registry.register_collector("group_commit", _collect_batcher_stats)
+
+
+async def run_task_write(func: WriteFunc, **kwargs) -> Any:
+    """Запись задачи: через групповой коммит, если он включен, иначе отдельной транзакцией"""
+    if settings.db.GROUP_COMMIT:
+        return await task_write_batcher.submit(func, **kwargs)
+    return await func(**kwargs)
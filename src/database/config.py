@@ -1,12 +1,22 @@
+from contextlib import asynccontextmanager
+
 from sqlalchemy import event
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
 from src.config import settings
+from src.monitoring.timing import phase
 
 # engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG)
 
 # postgres
-engine = create_async_engine(settings.db.URL)
+# движок создается в lifespan (init_engine): импорт драйвера и пула не замедляет импорт приложения,
+# а в предфорк-режиме каждый воркер получает свои соединения
+engine: AsyncEngine | None = None
 
 # Этот блок — КЛЮЧЕВОЙ для каскадного удаления в SQLite
 # @event.listens_for(engine.sync_engine, "connect")
@@ -15,11 +25,62 @@ engine = create_async_engine(settings.db.URL)
 #     cursor.execute("PRAGMA foreign_keys=ON")
 #     cursor.close()
 
-session_factory = async_sessionmaker(engine, expire_on_commit=False) # фабрика сессий на основе движка
+session_factory = async_sessionmaker(expire_on_commit=False) # фабрика сессий, движок привязывает init_engine
+
+
+def init_engine(url: str | None = None) -> AsyncEngine:
+    """Создает движок (один раз на процесс) и привязывает к нему session_factory"""
+    global engine
+    if engine is None:
+        engine = create_async_engine(url or settings.db.URL)
+        session_factory.configure(bind=engine)
+    return engine
+
+
+async def create_schema(url: str | None = None) -> None:
+    """
+    create_all отдельным движком, который сразу закрывается.
+    Мастер src.server вызывает его до форка, чтобы воркеры не создавали таблицы наперегонки
+    и не унаследовали открытые соединения.
+    """
+    schema_engine = create_async_engine(url or settings.db.URL)
+    try:
+        async with schema_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    finally:
+        await schema_engine.dispose()
+
+
+async def dispose_engine() -> None:
+    """Закрывает соединения движка, следующий init_engine создаст новый"""
+    global engine
+    if engine is not None:
+        await engine.dispose()
+        engine = None
 
 # async def get_session():
 #     async with session_factory() as session:
 #         yield session
 
+@asynccontextmanager
+async def session_scope(session: AsyncSession | None = None):
+    """
+    Сессия для CRUD-функции.
+    Без аргумента - открывает свою сессию и коммитит при успешном выходе.
+    С переданной сессией - работает внутри чужой транзакции (батч),
+    изменения только сбрасываются в базу, коммит делает владелец сессии.
+    При исключении коммита нет, транзакция откатывается при закрытии сессии.
+    Время внутри попадает в фазу db заголовка Server-Timing.
+    """
+    with phase("db"):
+        if session is not None:
+            yield session
+            await session.flush()
+            return
+
+        async with session_factory() as own_session:
+            yield own_session
+            await own_session.commit()
+
 class Base(DeclarativeBase):
     pass
@@ -3,12 +3,16 @@ from src.database.config import session_factory
 from src.database.tables import UsersORM
 
 
-async def get_user_by_email(email: str) -> UsersORM | None:
+async def get_user_by_email(email: str, include_deleted: bool = False) -> UsersORM | None:
     """
     Проверить наличие юзера по мейлу в базе.
+    Удаленные (deleted_at) не находятся, пока не передан include_deleted:
+    их почта занята до конца фоновой очистки.
     """
     async with session_factory() as session:
         query = select(UsersORM).where(UsersORM.email == email)
+        if not include_deleted:
+            query = query.where(UsersORM.deleted_at.is_(None))
         result = await session.execute(query)
         user = result.scalar_one_or_none() # проверка почты на уникальность в БД
 
@@ -0,0 +1,134 @@
+from fastapi import status
+from src.auth.exceptions import ListAccessDeniedException
+from src.database.config import session_factory
+from src.database.crud import tasks as tasks_crud
+from src.database.crud import todo_lists as todo_lists_crud
+from src.models.schemas import (
+    BatchListCreate,
+    BatchListDelete,
+    BatchListPatch,
+    BatchOperation,
+    BatchTaskCreate,
+    BatchTaskDelete,
+    BatchTaskPatch,
+    IdOrRef,
+    ListResponseSchema,
+    TaskResponseSchema,
+)
+
+
+class BatchOperationError(Exception):
+    """Операция батча не выполнена, вся транзакция откатывается"""
+
+    def __init__(self, index: int, op: str, status_code: int, detail: str):
+        super().__init__(detail)
+        self.index = index
+        self.op = op
+        self.status_code = status_code
+        self.detail = detail
+
+
+async def run_batch(
+    id_user: int,
+    operations: list[BatchOperation],
+) -> list[dict]:
+    """
+    Выполняет операции по порядку в одной транзакции через обычные CRUD-функции
+    (проверки владельца остаются те же). Первая неудачная операция откатывает все.
+    Ссылки "$ref" подставляются айди объектов, созданных ранее в этом же батче.
+    События и коммит - один раз в конце.
+    """
+    refs: dict[str, int] = {}
+    results = []
+
+    async with session_factory() as session:
+        for index, operation in enumerate(operations):
+
+            def resolve(value: IdOrRef) -> int:
+                if isinstance(value, int):
+                    return value
+                if value[1:] not in refs:
+                    raise BatchOperationError(
+                        index, operation.op, status.HTTP_422_UNPROCESSABLE_CONTENT,
+                        f"Unknown reference {value}",
+                    )
+                return refs[value[1:]]
+
+            result = None
+            status_code = status.HTTP_200_OK
+
+            try:
+                match operation:
+                    case BatchListCreate():
+                        result = await todo_lists_crud.add_todo_lists(
+                            id_user=id_user,
+                            lst=operation.data,
+                            session=session,
+                        )
+                        status_code = status.HTTP_201_CREATED
+                    case BatchListPatch():
+                        result = await todo_lists_crud.patch_list(
+                            id_user=id_user,
+                            id_list=resolve(operation.id_list),
+                            data=operation.data,
+                            session=session,
+                        )
+                    case BatchListDelete():
+                        result = await todo_lists_crud.delete_list(
+                            id_user=id_user,
+                            id_list=resolve(operation.id_list),
+                            session=session,
+                        ) or None
+                        status_code = status.HTTP_204_NO_CONTENT
+                    case BatchTaskCreate():
+                        result = await tasks_crud.add_task(
+                            id_user=id_user,
+                            id_list=resolve(operation.id_list),
+                            tsk=operation.data,
+                            session=session,
+                        )
+                        status_code = status.HTTP_201_CREATED
+                    case BatchTaskPatch():
+                        result = await tasks_crud.patch_task(
+                            id_task=resolve(operation.id_task),
+                            id_user=id_user,
+                            id_list=resolve(operation.id_list),
+                            data=operation.data,
+                            session=session,
+                        )
+                    case BatchTaskDelete():
+                        result = await tasks_crud.delete_task(
+                            id_task=resolve(operation.id_task),
+                            id_user=id_user,
+                            id_list=resolve(operation.id_list),
+                            session=session,
+                        ) or None
+                        status_code = status.HTTP_204_NO_CONTENT
+            except ListAccessDeniedException as error: # лист доступен только для чтения
+                raise BatchOperationError(index, operation.op, error.status_code, error.detail)
+
+            if result is None: # CRUD вернул None/False - объект не найден или чужой
+                raise BatchOperationError(
+                    index, operation.op, status.HTTP_404_NOT_FOUND,
+                    "List or task not found",
+                )
+
+            if status_code == status.HTTP_204_NO_CONTENT:
+                results.append({"index": index, "op": operation.op, "status_code": status_code, "result": None})
+                continue
+
+            if operation.op.startswith("list."):
+                data = ListResponseSchema.model_validate(result).model_dump()
+                new_id = result.id_list
+            else:
+                data = TaskResponseSchema.model_validate(result).model_dump()
+                new_id = result.id_task
+
+            if getattr(operation, "ref", None):
+                refs[operation.ref] = new_id
+
+            results.append({"index": index, "op": operation.op, "status_code": status_code, "result": data})
+
+        await session.commit()
+
+    return results
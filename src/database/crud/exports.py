@@ -0,0 +1,128 @@
+from typing import AsyncIterator, Sequence
+
+from sqlalchemy import Row, func, literal, null, select, tuple_
+from src.database.config import session_factory
+from src.database.tables import ArchivedTasksORM, ListsORM, TasksORM
+
+
+def _all_tasks():
+    """Живые и архивные задачи одним набором; archived - задача из архива"""
+    live = select(
+        TasksORM.list_id, TasksORM.id_task, TasksORM.task_name, TasksORM.completed,
+        literal(False).label("archived"), TasksORM.position,
+    )
+    cold = select(
+        ArchivedTasksORM.list_id, ArchivedTasksORM.id_task, ArchivedTasksORM.task_name, literal(True),
+        literal(True), null(),
+    )
+    return live.union_all(cold).subquery("all_tasks")
+
+
+def _user_rows_query(user_id: int):
+    # внешнее соединение: пустой лист дает одну строку с задачей None
+    tasks = _all_tasks()
+    return (
+        select(
+            ListsORM.id_list, ListsORM.title, ListsORM.description,
+            tasks.c.id_task, tasks.c.task_name, tasks.c.completed, tasks.c.archived,
+        )
+        .select_from(ListsORM)
+        .outerjoin(tasks, tasks.c.list_id == ListsORM.id_list)
+        .where(ListsORM.user_id == user_id)
+        .order_by(ListsORM.id_list, tasks.c.archived, tasks.c.position, tasks.c.id_task) # как iter_user_rows
+    )
+
+async def stream_user_rows(user_id: int, batch_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+    """
+    Все листы пользователя с задачами порциями по batch_size строк: листы по id, в листе задачи по порядку, затем архивные.
+    Серверный курсор (session.stream): в памяти только текущая порция, сколько бы задач ни было.
+    Соединение занято, пока поток не дочитан.
+    """
+    async with session_factory() as session:
+        result = await session.stream(_user_rows_query(user_id).execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+async def _list_tasks(id_list: int, batch_size: int) -> AsyncIterator[list[tuple]]:
+    """
+    Задачи одного листа порциями: живые - по ключу (position, id_task) индекса ix_tasks_list_id_position,
+    затем архивные - по id. Каждая порция продолжает с ключа прошлой и читается своей короткой транзакцией.
+    """
+    after = None
+    while True:
+        query = select(
+            TasksORM.id_task, TasksORM.task_name, TasksORM.completed, literal(False), TasksORM.position,
+        ).where(TasksORM.list_id == id_list)
+        if after is not None:
+            query = query.where(tuple_(TasksORM.position, TasksORM.id_task) > after)
+        async with session_factory() as session:
+            page = (await session.execute(query.order_by(TasksORM.position, TasksORM.id_task).limit(batch_size))).all()
+        if page:
+            yield [tuple(row[:4]) for row in page]
+        if len(page) < batch_size:
+            break
+        after = (page[-1].position, page[-1].id_task)
+
+    after_task = 0
+    while True:
+        query = (
+            select(ArchivedTasksORM.id_task, ArchivedTasksORM.task_name, literal(True), literal(True))
+            .where(ArchivedTasksORM.list_id == id_list, ArchivedTasksORM.id_task > after_task)
+            .order_by(ArchivedTasksORM.id_task)
+            .limit(batch_size)
+        )
+        async with session_factory() as session:
+            page = (await session.execute(query)).all()
+        if page:
+            yield [tuple(row) for row in page]
+        if len(page) < batch_size:
+            break
+        after_task = page[-1].id_task
+
+
+async def iter_user_rows(user_id: int, batch_size: int) -> AsyncIterator[list[tuple]]:
+    """
+    Те же строки, что stream_user_rows, порциями до batch_size - для фоновой выгрузки.
+    Обход по листам: листы по id, задачи каждого листа - диапазонами индекса (_list_tasks), поэтому
+    порция не пересортировывает остаток соединения листов с задачами и выгрузка линейна по размеру аккаунта.
+    Каждый запрос - своя короткая транзакция: долгая выгрузка не держит снимок базы
+    и не блокирует запись (на SQLite открытый курсор не дает записать даже прогресс задачи).
+    """
+    rows = []
+    after_list = 0
+    while True:
+        query = (
+            select(ListsORM.id_list, ListsORM.title, ListsORM.description)
+            .where(ListsORM.user_id == user_id, ListsORM.id_list > after_list)
+            .order_by(ListsORM.id_list)
+            .limit(batch_size)
+        )
+        async with session_factory() as session:
+            lists = (await session.execute(query)).all()
+        if not lists:
+            break
+        for lst in lists:
+            head = tuple(lst)
+            empty = True
+            async for tasks in _list_tasks(lst.id_list, batch_size):
+                empty = False
+                rows.extend(head + task for task in tasks)
+                if len(rows) >= batch_size:
+                    yield rows
+                    rows = []
+            if empty:
+                rows.append(head + (None, None, None, None)) # пустой лист - одна строка без задачи
+        after_list = lists[-1].id_list
+    if rows:
+        yield rows
+
+async def count_user_rows(user_id: int) -> int:
+    """
+    Листы плюс задачи пользователя (живые и архивные) - знаменатель прогресса фоновой выгрузки.
+    """
+    async with session_factory() as session:
+        lists = await session.scalar(select(func.count()).where(ListsORM.user_id == user_id))
+        user_lists = select(ListsORM.id_list).where(ListsORM.user_id == user_id)
+        tasks = await session.scalar(select(func.count()).where(TasksORM.list_id.in_(user_lists)))
+        archived = await session.scalar(select(func.count()).where(ArchivedTasksORM.list_id.in_(user_lists)))
+        return lists + tasks + archived
@@ -0,0 +1,38 @@
+from sqlalchemy import select
+from src.database.config import session_factory
+from src.database.tables import JobsORM
+
+
+async def get_user_job(user_id: int, job_id: int) -> JobsORM | None:
+    """
+    Фоновая задача пользователя; чужая не находится.
+    """
+    async with session_factory() as session:
+        query = select(JobsORM).where(JobsORM.id_job == job_id, JobsORM.user_id == user_id)
+        result = await session.execute(query)
+        return result.scalar_one_or_none()
+
+async def get_user_jobs(user_id: int, limit: int = 50) -> list[JobsORM]:
+    """
+    Последние фоновые задачи пользователя, новые первыми.
+    """
+    async with session_factory() as session:
+        query = (
+            select(JobsORM)
+            .where(JobsORM.user_id == user_id)
+            .order_by(JobsORM.id_job.desc())
+            .limit(limit)
+        )
+        result = await session.execute(query)
+        return result.scalars().all()
+
+async def get_jobs(status: str | None = None, limit: int = 100) -> list[JobsORM]:
+    """
+    Админская функция: последние фоновые задачи всех пользователей.
+    """
+    async with session_factory() as session:
+        query = select(JobsORM).order_by(JobsORM.id_job.desc()).limit(limit)
+        if status is not None:
+            query = query.where(JobsORM.status == status)
+        result = await session.execute(query)
+        return result.scalars().all()
@@ -0,0 +1,62 @@
+from sqlalchemy import BigInteger, Integer, case, cast, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.config import session_scope
+from src.database.tables import ArchivedTasksORM, ListMembersORM, ListsORM, TasksORM
+from src.stats import TaskColumns, rows_to_array, to_columns
+
+FETCH_CHUNK = 50_000 # строк в порции серверного курсора: в памяти Python-объекты только одной порции
+
+
+def _epoch_day(session: AsyncSession, column):
+    """День от 1970-01-01 считается в базе: из курсора приходят целые, а не datetime"""
+    if session.get_bind().dialect.name == "postgresql":
+        return cast(func.floor(func.extract("epoch", column) / 86400), BigInteger)
+    return cast(func.julianday(column) - 2440587.5, Integer) # SQLite: 2440587.5 - юлианский день эпохи; julianday дешевле strftime('%s')
+
+
+def _columns_query(session: AsyncSession, list_ids=None):
+    """
+    Живые и архивные задачи одним потоком (list_id, completed, created_day, completed_day).
+    Время выполнения - updated_at выполненной задачи (как completed_at при архивации), у архивной - completed_at.
+    """
+    live = select(
+        TasksORM.list_id,
+        cast(TasksORM.completed, Integer),
+        _epoch_day(session, func.coalesce(TasksORM.created_at, TasksORM.updated_at)),
+        case((TasksORM.completed, _epoch_day(session, TasksORM.updated_at)), else_=-1),
+    )
+    archived = select(
+        ArchivedTasksORM.list_id,
+        literal(1),
+        _epoch_day(session, func.coalesce(ArchivedTasksORM.created_at, ArchivedTasksORM.completed_at)),
+        _epoch_day(session, ArchivedTasksORM.completed_at),
+    )
+    if list_ids is not None:
+        live = live.where(TasksORM.list_id.in_(list_ids))
+        archived = archived.where(ArchivedTasksORM.list_id.in_(list_ids))
+    return live.union_all(archived)
+
+
+async def _fetch_columns(session: AsyncSession, list_ids=None) -> TaskColumns:
+    query = _columns_query(session, list_ids).execution_options(yield_per=FETCH_CHUNK)
+    result = await session.stream(query)
+    return to_columns([rows_to_array(rows) async for rows in result.partitions()])
+
+
+async def get_user_task_columns(
+    id_user: int,
+    session: AsyncSession | None = None,
+) -> TaskColumns:
+    """Столбцы задач своих и совместных листов пользователя"""
+    async with session_scope(session) as session:
+        lists = select(ListsORM.id_list).where(ListsORM.user_id == id_user).union_all(
+            select(ListMembersORM.list_id).where(ListMembersORM.user_id == id_user))
+        return await _fetch_columns(session, lists)
+
+
+async def get_task_columns(
+    session: AsyncSession | None = None,
+) -> TaskColumns:
+    """Столбцы всех задач (админская статистика)"""
+    async with session_scope(session) as session:
+        return await _fetch_columns(session)
@@ -0,0 +1,140 @@
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database.config import session_factory
+from src.database.tables import ListMembersORM, ListsORM, SyncTombstonesORM, TasksORM
+from src.database.versioning import SyncCounterORM
+
+
+def add_tombstone(
+    session: AsyncSession,
+    id_user: int,
+    entity: str,
+    entity_id: int,
+    id_list: int | None = None,
+) -> None:
+    """
+    Записывает надгробие удаленного листа или задачи в ту же транзакцию, что и удаление.
+    Номер изменения проставит before_flush.
+    """
+    session.add(SyncTombstonesORM(
+        user_id=id_user,
+        entity=entity,
+        entity_id=entity_id,
+        list_id=id_list,
+    ))
+
+
+def parse_cursor(cursor: str) -> tuple[int, dict[int, int]]:
+    """
+    Курсор "свой[,лист:номер...]": номер изменения своих листов и номера совместных листов по одному.
+    Номера совместного листа - из счетчика его владельца, поэтому у каждого такого листа свой курсор.
+    ValueError - курсор испорчен.
+    """
+    own, *shared = cursor.split(",")
+    positions = {}
+    for item in shared:
+        id_list, version = item.split(":")
+        positions[int(id_list)] = int(version)
+    return int(own), positions
+
+
+def format_cursor(own: int, shared: dict[int, int]) -> str:
+    return ",".join([str(own), *(f"{id_list}:{version}" for id_list, version in sorted(shared.items()))])
+
+
+async def get_changes(
+    id_user: int,
+    since: str,
+):
+    """
+    Все листы и задачи пользователя (свои и совместные), созданные или измененные после курсора,
+    и надгробия удаленных. Каждый запрос идет по индексу (..., version),
+    поэтому объем работы зависит от количества изменений, а не от размера аккаунта.
+
+    Курсор - закоммиченные значения счетчиков владельцев, прочитанные до выборки изменений.
+    Номера владельца выдаются в порядке коммитов, поэтому все изменения до курсора уже видны
+    следующим запросам; более новые (закоммиченные между запросами) отсекаются по version <= курсора
+    и придут в следующей синхронизации целиком.
+    Совместный лист, которого нет в курсоре (клиента только что добавили), отдается целиком;
+    лист из курсора, к которому больше нет доступа (участника убрали или лист удален), - надгробием.
+    """
+    own_since, shared_since = parse_cursor(since)
+    async with session_factory() as session:
+        shared_owners = dict((await session.execute(
+            select(ListMembersORM.list_id, ListsORM.user_id)
+            .join(ListsORM, ListsORM.id_list == ListMembersORM.list_id)
+            .where(ListMembersORM.user_id == id_user)
+        )).tuples().all())
+        counters = dict((await session.execute(
+            select(SyncCounterORM.user_id, SyncCounterORM.value)
+            .where(SyncCounterORM.user_id.in_({id_user, *shared_owners.values()}))
+        )).tuples().all())
+        cursor = counters.get(id_user, 0)
+        shared_cursor = {id_list: counters.get(owner_id, 0) for id_list, owner_id in shared_owners.items()}
+
+        # по совместному листу: (лист, после какого номера, до какого номера включительно)
+        shared_ranges = [
+            (id_list, shared_since.get(id_list, 0), shared_cursor[id_list]) for id_list in shared_owners]
+
+        lists_query = (
+            select(ListsORM)
+            .where(or_(
+                and_(
+                    ListsORM.user_id == id_user,
+                    ListsORM.version > own_since,
+                    ListsORM.version <= cursor),
+                *(and_(ListsORM.id_list == id_list, ListsORM.version > low, ListsORM.version <= high)
+                  for id_list, low, high in shared_ranges),
+            ))
+            .order_by(ListsORM.version)
+        )
+        own_tasks = (
+            select(TasksORM.id_task)
+            .join(ListsORM) # у задачи нет юзера, он берется через лист
+            .where(
+                ListsORM.user_id == id_user,
+                TasksORM.version > own_since,
+                TasksORM.version <= cursor)
+        )
+        # каждый совместный лист - отдельный диапазон индекса (list_id, version)
+        shared_tasks = [
+            select(TasksORM.id_task).where(
+                TasksORM.list_id == id_list, TasksORM.version > low, TasksORM.version <= high)
+            for id_list, low, high in shared_ranges
+        ]
+        tasks_query = (
+            select(TasksORM)
+            .where(TasksORM.id_task.in_(own_tasks.union_all(*shared_tasks) if shared_tasks else own_tasks))
+            .order_by(TasksORM.version)
+        )
+        tombstones_query = (
+            select(SyncTombstonesORM)
+            .where(or_(
+                and_(
+                    SyncTombstonesORM.user_id == id_user,
+                    SyncTombstonesORM.version > own_since,
+                    SyncTombstonesORM.version <= cursor),
+                # удаленные задачи совместного листа - в надгробиях его владельца
+                *(and_(
+                    SyncTombstonesORM.user_id == shared_owners[id_list],
+                    SyncTombstonesORM.list_id == id_list,
+                    SyncTombstonesORM.version > low,
+                    SyncTombstonesORM.version <= high)
+                  for id_list, low, high in shared_ranges),
+            ))
+            .order_by(SyncTombstonesORM.version)
+        )
+
+        lists = (await session.execute(lists_query)).scalars().all()
+        tasks = (await session.execute(tasks_query)).scalars().all()
+        deleted = list((await session.execute(tombstones_query)).scalars().all())
+        for id_list in sorted(shared_since.keys() - shared_owners.keys()):
+            # доступа к листу больше нет - клиент удаляет его вместе с задачами
+            deleted.append({"entity": "list", "entity_id": id_list, "list_id": None, "version": shared_since[id_list]})
+
+        return {
+            "cursor": format_cursor(cursor, shared_cursor),
+            "lists": lists,
+            "tasks": tasks,
+            "deleted": deleted,
+        }
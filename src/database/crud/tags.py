@@ -0,0 +1,197 @@
+from typing import Literal
+
+from sqlalchemy import Select, delete, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from src.database.acl import authorize_list
+from src.database.config import session_scope
+from src.database.tables import ListMembersORM, ListsORM, TagsORM, TasksORM, TaskTagsORM
+
+
+def _insert(session: AsyncSession, entity):
+    """INSERT диалекта базы - с ON CONFLICT"""
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(entity)
+
+
+async def untag_tasks(session: AsyncSession, task_ids: list[int] | Select) -> None:
+    """
+    Убирает связи задач с тегами и уменьшает счетчики тегов - до удаления или переноса задач в архив.
+    task_ids - список или запрос айди; запрос выполняется дважды, поэтому должен давать тот же набор (без LIMIT).
+    """
+    counts = (
+        select(TaskTagsORM.tag_id, func.count().label("tasks"))
+        .where(TaskTagsORM.task_id.in_(task_ids))
+        .group_by(TaskTagsORM.tag_id)
+        .subquery()
+    )
+    await session.execute(
+        update(TagsORM)
+        .where(TagsORM.id_tag == counts.c.tag_id) # UPDATE ... FROM: Postgres и SQLite 3.33+
+        .values(task_count=TagsORM.task_count - counts.c.tasks),
+        execution_options={"synchronize_session": False},
+    )
+    await session.execute(
+        delete(TaskTagsORM).where(TaskTagsORM.task_id.in_(task_ids)),
+        execution_options={"synchronize_session": False},
+    )
+
+
+async def get_tags(
+    id_user: int,
+    session: AsyncSession | None = None,
+):
+    """Теги пользователя со счетчиками задач - из самой таблицы тегов, без подсчета связей"""
+    async with session_scope(session) as session:
+        query = select(TagsORM).where(TagsORM.user_id == id_user).order_by(TagsORM.name)
+        result = await session.execute(query)
+        return result.scalars().all()
+
+
+async def get_task_tags(
+    id_user: int,
+    id_list: int,
+    id_task: int,
+    session: AsyncSession | None = None,
+) -> None | list[str]:
+    async with session_scope(session) as session:
+        if await authorize_list(session, id_user, id_list) is None:
+            return None
+        if await session.scalar(
+            select(TasksORM.id_task).where(TasksORM.id_task == id_task, TasksORM.list_id == id_list)
+        ) is None:
+            return None
+        query = (
+            select(TagsORM.name)
+            .join(TaskTagsORM, TaskTagsORM.tag_id == TagsORM.id_tag)
+            .where(TaskTagsORM.task_id == id_task, TagsORM.user_id == id_user)
+            .order_by(TagsORM.name)
+        )
+        result = await session.execute(query)
+        return list(result.scalars().all())
+
+
+async def set_task_tags(
+    id_user: int,
+    id_list: int,
+    id_task: int,
+    names: list[str],
+    session: AsyncSession | None = None,
+) -> None | list[str]:
+    """
+    Заменяет теги пользователя на задаче; недостающие теги создаются.
+    Счетчики меняются только у добавленных и снятых тегов. None - нет задачи или листа.
+    """
+    names = sorted(set(names))
+    async with session_scope(session) as session:
+        if await authorize_list(session, id_user, id_list, "editor") is None:
+            return None
+        # строка задачи под блокировкой: параллельная замена тегов той же задачи ждет коммита (Postgres)
+        if await session.scalar(
+            select(TasksORM.id_task).where(TasksORM.id_task == id_task, TasksORM.list_id == id_list).with_for_update()
+        ) is None:
+            return None
+
+        tags = {}
+        if names:
+            query = select(TagsORM.name, TagsORM.id_tag).where(TagsORM.user_id == id_user, TagsORM.name.in_(names))
+            tags = dict((await session.execute(query)).all())
+            missing = [name for name in names if name not in tags]
+            if missing:
+                # тот же новый тег может создавать параллельный запрос: вставка без ошибки, id - повторной выборкой
+                await session.execute(
+                    _insert(session, TagsORM).on_conflict_do_nothing(index_elements=["user_id", "name"]),
+                    [{"user_id": id_user, "name": name, "task_count": 0} for name in missing],
+                )
+                tags = dict((await session.execute(query)).all())
+
+        query = (
+            select(TaskTagsORM.tag_id)
+            .join(TagsORM, TagsORM.id_tag == TaskTagsORM.tag_id)
+            .where(TaskTagsORM.task_id == id_task, TagsORM.user_id == id_user)
+        )
+        current = set((await session.execute(query)).scalars().all())
+        wanted = set(tags.values())
+        added, removed = wanted - current, current - wanted
+
+        # счетчики меняются только по реально вставленным и удаленным связям (RETURNING):
+        # без блокировки (SQLite) связь мог уже добавить или снять параллельный запрос
+        if added:
+            inserted = await session.execute(
+                _insert(session, TaskTagsORM).on_conflict_do_nothing().returning(TaskTagsORM.tag_id),
+                [{"tag_id": id_tag, "task_id": id_task} for id_tag in added],
+            )
+            added = set(inserted.scalars().all())
+        if added:
+            await session.execute(
+                update(TagsORM).where(TagsORM.id_tag.in_(added)).values(task_count=TagsORM.task_count + 1),
+                execution_options={"synchronize_session": False},
+            )
+        if removed:
+            deleted = await session.execute(
+                delete(TaskTagsORM)
+                .where(TaskTagsORM.task_id == id_task, TaskTagsORM.tag_id.in_(removed))
+                .returning(TaskTagsORM.tag_id),
+                execution_options={"synchronize_session": False},
+            )
+            removed = set(deleted.scalars().all())
+        if removed:
+            await session.execute(
+                update(TagsORM).where(TagsORM.id_tag.in_(removed)).values(task_count=TagsORM.task_count - 1),
+                execution_options={"synchronize_session": False},
+            )
+
+        return names
+
+
+async def get_tasks_by_tags(
+    id_user: int,
+    names: list[str],
+    match: Literal["all", "any"] = "all",
+    after_id: int | None = None,
+    limit: int = 100,
+    session: AsyncSession | None = None,
+):
+    """
+    Задачи всех доступных листов с тегами пользователя, по возрастанию id (after_id - следующая страница).
+
+    all: обход задач самого редкого тега (по счетчику) диапазоном первичного ключа (tag_id, task_id),
+    остальные теги проверяются точечным поиском по тому же ключу - стоимость растет с размером
+    самого редкого тега, а не всех, и LIMIT останавливает обход на первой странице.
+    any: объединение диапазонов ключа по каждому тегу.
+    """
+    async with session_scope(session) as session:
+        query = select(TagsORM.id_tag, TagsORM.task_count).where(
+            TagsORM.user_id == id_user, TagsORM.name.in_(set(names)))
+        tags = sorted((await session.execute(query)).all(), key=lambda tag: tag.task_count)
+        if not tags or (match == "all" and len(tags) < len(set(names))):
+            return []
+
+        # теги личные, а доступ к листу мог пропасть - задачи только своих и совместных листов
+        lists = select(ListsORM.id_list).where(ListsORM.user_id == id_user).union_all(
+            select(ListMembersORM.list_id).where(ListMembersORM.user_id == id_user))
+
+        if match == "all":
+            driver = aliased(TaskTagsORM)
+            query = (
+                select(TasksORM)
+                .join(driver, driver.task_id == TasksORM.id_task)
+                .where(driver.tag_id == tags[0].id_tag)
+            )
+            for tag in tags[1:]:
+                other = aliased(TaskTagsORM)
+                query = query.where(exists().where(other.tag_id == tag.id_tag, other.task_id == driver.task_id))
+            order_key = driver.task_id # порядок ключа (tag_id, task_id) - без сортировки
+        else:
+            tagged = select(TaskTagsORM.task_id).where(TaskTagsORM.tag_id.in_([tag.id_tag for tag in tags]))
+            query = select(TasksORM).where(TasksORM.id_task.in_(tagged))
+            order_key = TasksORM.id_task
+
+        if after_id is not None:
+            query = query.where(order_key > after_id)
+        query = query.where(TasksORM.list_id.in_(lists)).order_by(order_key).limit(limit)
+        result = await session.execute(query)
+        return result.scalars().all()
@@ -1,11 +1,34 @@
+from datetime import datetime
 
 from fastapi import APIRouter, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import (
+    and_,
+    bindparam,
+    delete,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.config import session_factory
-from src.database.tables import ListsORM, TasksORM, UsersORM
+from src.database.acl import authorize_list, stage_list_event
+from src.database.config import session_scope
+from src.database.crud.sync import add_tombstone
+from src.database.crud.tags import untag_tasks
+from src.database.positions import key_between, keys_after
+from src.database.tables import (
+    ArchivedTasksORM,
+    ListMembersORM,
+    ListsORM,
+    TasksORM,
+    UsersORM,
+)
+from src.database.versioning import next_change_seq
 from src.models.schemas import (
     TaskAddSchema,
+    TaskMoveSchema,
     TaskPatchSchema,
     TaskResponseSchema,
     TaskUpdateSchema,
@@ -14,22 +37,55 @@ from src.models.schemas import (
 router = APIRouter()
 
 
+def _task_event_data(tsk: TasksORM) -> dict:
+    return TaskResponseSchema.model_validate(tsk).model_dump(mode="json")
+
+
+def subtree_prefix(tsk: TasksORM) -> str:
+    """Путь, с которого начинаются пути всех потомков задачи"""
+    return f"{tsk.path}{tsk.id_task}/"
+
+
+def in_subtree(prefix: str):
+    """
+    Потомки - диапазон путей [prefix, prefix с последним "/" -> "0"): "/" и "0" соседние символы,
+    а пути состоят из цифр и "/". Диапазон, в отличие от LIKE с параметром, идет по индексу
+    (list_id, path) и в подготовленных запросах.
+    """
+    return and_(TasksORM.path >= prefix, TasksORM.path < prefix[:-1] + "0")
+
+
+async def last_position(session: AsyncSession, id_list: int) -> str | None:
+    """
+    Ключ последней задачи листа - по индексу (list_id, position), без чтения листа.
+    Одновременные добавления в один лист могут получить одинаковый ключ - порядок между ними
+    решает id_task, а перенос к такой паре сначала перенумерует лист.
+    """
+    query = select(func.max(TasksORM.position)).where(TasksORM.list_id == id_list)
+    return await session.scalar(query)
+
+
 async def add_task(
     id_user: int,
     id_list: int,
     tsk: TaskAddSchema,
-    # session: AsyncSession,
+    session: AsyncSession | None = None,
 ) -> None | TasksORM:
-    async with session_factory() as session:
-        query = select(ListsORM).where(
-            ListsORM.user_id == id_user,
-            ListsORM.id_list == id_list,
-        )
-        result = await session.execute(query)
-        lst = result.scalar_one_or_none()
-        if lst is None:
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "editor")
+        if access is None:
             return None
 
+        path = ""
+        if tsk.parent_id is not None:
+            # путь родителя не должен поменяться переносом до коммита
+            await session.execute(select(ListsORM.id_list).where(ListsORM.id_list == id_list).with_for_update())
+            query = select(TasksORM).where(TasksORM.id_task == tsk.parent_id, TasksORM.list_id == id_list)
+            parent = (await session.execute(query)).scalar_one_or_none()
+            if parent is None:
+                return None
+            path = subtree_prefix(parent)
+
         # можно сделать распаковкой и через model_dump
         # new_tsk = TasksORM(
         # **tsk.model_dump(),
@@ -39,11 +95,16 @@ async def add_task(
             task_name = tsk.task_name,
             completed = tsk.completed,
             list_id = id_list, # привязка по URL-идентификатору (если юзер не даст, возьмет из УРЛ)
+            parent_id = tsk.parent_id,
+            path = path,
+            position = key_between(await last_position(session, id_list), None), # в конец листа
+            due_at = tsk.due_at,
         )
 
         session.add(new_tsk)
-        await session.commit()
+        await session.flush() # получить айди задачи для события
         await session.refresh(new_tsk)
+        await stage_list_event(session, id_list, access, id_user, "task.created", _task_event_data(new_tsk))
 
         return new_tsk
 
@@ -51,20 +112,30 @@ async def add_task(
 async def get_all_tasks(
     id_user: int,
     id_list: int,
-    # session: AsyncSession
+    include_archived: bool = False,
+    session: AsyncSession | None = None,
 ):
-    async with session_factory() as session:
+    async with session_scope(session) as session:
+        if await authorize_list(session, id_user, id_list) is None:
+            return []
         query = (
             select(TasksORM)
-            .join(ListsORM) # джоин для проверки и юзера и листа, тк юзера нет в тасках
-            .where(
-                TasksORM.list_id == id_list,
-                ListsORM.user_id == id_user)
+            .where(TasksORM.list_id == id_list)
+            .order_by(TasksORM.position, TasksORM.id_task) # порядок индекса ix_tasks_list_id_position
         )
 
         result = await session.execute(query)
         tsks = result.scalars().all()
 
+        if include_archived: # архив читается только по явной просьбе
+            query = (
+                select(ArchivedTasksORM)
+                .where(ArchivedTasksORM.list_id == id_list)
+                .order_by(ArchivedTasksORM.id_task)
+            )
+            result = await session.execute(query)
+            tsks = [*tsks, *result.scalars().all()]
+
         return tsks
 
 
@@ -97,34 +168,97 @@ async def get_all_tasks(
 #     return tsk
 
 
-async def patch_task(
-    id_task: int,
+async def get_task_tree(
     id_user: int,
     id_list: int,
-    data: TaskPatchSchema,
-    # session: AsyncSession,
-) -> None | TasksORM:
-    async with session_factory() as session:
+    root_id: int | None = None,
+    session: AsyncSession | None = None,
+) -> None | list[dict]:
+    """
+    Дерево задач листа (или поддерево root_id) одним запросом, вложенность собирается в памяти.
+    Лист читается по индексу (list_id, position), поддерево - по диапазону путей (list_id, path).
+    Порядок подзадач - порядок их ключей position. None - нет задачи root_id.
+    """
+    async with session_scope(session) as session:
+        if await authorize_list(session, id_user, id_list) is None:
+            return None if root_id is not None else []
+        query = (
+            select(TasksORM)
+            .where(TasksORM.list_id == id_list)
+            .order_by(TasksORM.position, TasksORM.id_task)
+        )
+        if root_id is not None:
+            root = (await session.execute(query.where(TasksORM.id_task == root_id))).scalar_one_or_none()
+            if root is None:
+                return None
+            query = query.where(or_(TasksORM.id_task == root_id, in_subtree(subtree_prefix(root))))
+
+        result = await session.execute(query)
+        tsks = result.scalars().all()
+
+        nodes = {tsk.id_task: {**_task_event_data(tsk), "subtasks": []} for tsk in tsks}
+        roots = []
+        for tsk in tsks:
+            parent = nodes.get(tsk.parent_id) if tsk.id_task != root_id else None
+            (parent["subtasks"] if parent is not None else roots).append(nodes[tsk.id_task])
+        return roots
+
+
+async def get_due_tasks(
+    id_user: int,
+    until: datetime,
+    limit: int = 500,
+    session: AsyncSession | None = None,
+):
+    """
+    Невыполненные задачи всех листов пользователя (своих и совместных) со сроком до until,
+    просроченные - первыми. Каждый лист читается диапазоном частичного индекса ix_tasks_list_id_due_at,
+    в него не попадают выполненные задачи и задачи без срока.
+    """
+    async with session_scope(session) as session:
+        lists = select(ListsORM.id_list).where(ListsORM.user_id == id_user).union_all(
+            select(ListMembersORM.list_id).where(ListMembersORM.user_id == id_user))
         query = (
             select(TasksORM)
-            .join(ListsORM)
             .where(
-                TasksORM.id_task == id_task,
-                ListsORM.id_list == id_list,
-                ListsORM.user_id == id_user)
+                TasksORM.list_id.in_(lists),
+                ~TasksORM.completed, # как в условии индекса: NOT completed (completed = 0 на SQLite)
+                TasksORM.due_at.is_not(None),
+                TasksORM.due_at <= until)
+            .order_by(TasksORM.due_at, TasksORM.id_task)
+            .limit(limit)
         )
         result = await session.execute(query)
+        return result.scalars().all()
+
+
+async def patch_task(
+    id_task: int,
+    id_user: int,
+    id_list: int,
+    data: TaskPatchSchema,
+    session: AsyncSession | None = None,
+) -> None | TasksORM:
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "editor")
+        if access is None:
+            return None
+        query = select(TasksORM).where(TasksORM.id_task == id_task, TasksORM.list_id == id_list)
+        result = await session.execute(query)
         tsk = result.scalar_one_or_none()
 
         if tsk is None:
             return None
 
         data_dict = data.model_dump(exclude_unset=True) # исключение неуказанных данных
+        if "due_at" in data_dict and data_dict["due_at"] != tsk.due_at:
+            tsk.reminded_at = None # новый срок - новое напоминание
         for field_name, new_value in data_dict.items():
             setattr(tsk, field_name, new_value)
 
-        await session.commit()
+        await session.flush()
         await session.refresh(tsk)
+        await stage_list_event(session, id_list, access, id_user, "task.patched", _task_event_data(tsk))
 
         return tsk
 
@@ -133,24 +267,214 @@ async def delete_task(
     id_task: int,
     id_user: int,
     id_list: int,
-    # session: AsyncSession
+    session: AsyncSession | None = None,
 ):
-    async with session_factory() as session:
-        query = (
-            select(TasksORM)
-            .join(ListsORM)
-            .where(
-                TasksORM.id_task == id_task,
-                ListsORM.id_list == id_list,
-                ListsORM.user_id == id_user)
-        )
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "editor")
+        if access is None:
+            return False
+        query = select(TasksORM).where(TasksORM.id_task == id_task, TasksORM.list_id == id_list)
         result = await session.execute(query)
         tsk = result.scalar_one_or_none()
 
         if tsk is None:
             return False
 
-        await session.delete(tsk)
-        await session.commit()
+        # задача вместе с поддеревом - одним DELETE по диапазону путей
+        subtree = and_(TasksORM.list_id == id_list, or_(TasksORM.id_task == id_task, in_subtree(subtree_prefix(tsk))))
+        await untag_tasks(session, select(TasksORM.id_task).where(subtree))
+        result = await session.execute(
+            delete(TasksORM)
+            .where(subtree)
+            .returning(TasksORM.id_task),
+            execution_options={"synchronize_session": False},
+        )
+        for id_deleted in result.scalars().all():
+            add_tombstone(session, access.owner_id, "task", id_deleted, id_list) # синхронизация - по листам владельца
+            await stage_list_event(session, id_list, access, id_user, "task.deleted", {"id_task": id_deleted, "list_id": id_list})
 
         return True
+
+
+async def restore_task(
+    id_task: int,
+    id_user: int,
+    id_list: int,
+    session: AsyncSession | None = None,
+) -> None | TasksORM:
+    """
+    Возвращает задачу из archived_tasks в tasks с тем же id.
+    Новый updated_at не даст архивации сразу забрать ее обратно.
+    """
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "editor")
+        if access is None:
+            return None
+        query = select(ArchivedTasksORM).where(
+            ArchivedTasksORM.id_task == id_task,
+            ArchivedTasksORM.list_id == id_list,
+        )
+        result = await session.execute(query)
+        archived = result.scalar_one_or_none()
+
+        if archived is None:
+            return None
+
+        # SQLite может отдать id последней удаленной строки новой задаче - тогда восстановится с новым id
+        id_free = await session.get(TasksORM, id_task) is None
+        tsk = TasksORM(
+            id_task=id_task if id_free else None,
+            task_name=archived.task_name,
+            completed=True,
+            list_id=id_list,
+            position=key_between(await last_position(session, id_list), None),
+            created_at=archived.created_at or archived.completed_at,
+        )
+        # по id, а не session.delete: на SQLite completed_at из func.now() хранится без микросекунд
+        # и не совпадает с тем же значением, записанным обратно в формате SQLAlchemy
+        await session.execute(
+            delete(ArchivedTasksORM).where(
+                ArchivedTasksORM.id_task == id_task, ArchivedTasksORM.list_id == id_list),
+            execution_options={"synchronize_session": False},
+        )
+        session.add(tsk)
+        await session.flush()
+        await session.refresh(tsk)
+        await stage_list_event(session, id_list, access, id_user, "task.restored", _task_event_data(tsk))
+
+        return tsk
+
+
+async def rebalance_list(id_list: int, session: AsyncSession) -> int:
+    """
+    Перенумеровывает задачи листа короткими ключами a0, a1, ... в текущем порядке.
+    Все строки получают один номер изменения - клиенты синхронизации заберут новые ключи;
+    updated_at не меняется, перенумерация - не правка пользователя.
+    """
+    # строка листа под блокировкой: перенос в этом листе дождется конца перенумерации (Postgres)
+    owner_id = await session.scalar(select(ListsORM.user_id).where(ListsORM.id_list == id_list).with_for_update())
+    query = (
+        select(TasksORM.id_task)
+        .where(TasksORM.list_id == id_list)
+        .order_by(TasksORM.position, TasksORM.id_task)
+    )
+    ids = (await session.execute(query)).scalars().all()
+    if not ids:
+        return 0
+
+    version = await session.run_sync(next_change_seq, owner_id)
+    table = TasksORM.__table__ # Core executemany: одна подготовленная команда на все строки
+    await session.execute(
+        update(table)
+        .where(table.c.id_task == bindparam("b_id_task"))
+        .values(position=bindparam("b_position"), version=version, updated_at=table.c.updated_at),
+        [
+            {"b_id_task": id_task, "b_position": position}
+            for id_task, position in zip(ids, keys_after(None, len(ids)))
+        ],
+    )
+    return len(ids)
+
+
+async def _neighbours(session: AsyncSession, tsk: TasksORM, id_list: int, after_id: int | None):
+    """Ключи задач, между которыми встанет tsk; None - нет соседа с этой стороны, False - нет задачи after_id"""
+    others = select(TasksORM.position).where(TasksORM.list_id == id_list, TasksORM.id_task != tsk.id_task)
+    if after_id is None:
+        query = others.order_by(TasksORM.position, TasksORM.id_task).limit(1)
+        return None, await session.scalar(query)
+
+    after = (await session.execute(
+        select(TasksORM.position, TasksORM.id_task).where(
+            TasksORM.id_task == after_id, TasksORM.list_id == id_list, TasksORM.id_task != tsk.id_task)
+    )).one_or_none()
+    if after is None:
+        return False, None
+    query = (
+        others
+        .where(tuple_(TasksORM.position, TasksORM.id_task) > tuple_(after.position, after.id_task))
+        .order_by(TasksORM.position, TasksORM.id_task)
+        .limit(1)
+    )
+    return after.position, await session.scalar(query)
+
+
+async def _reparent(session: AsyncSession, tsk: TasksORM, id_list: int, parent_id: int | None) -> bool:
+    """
+    Переносит задачу с поддеревом под parent_id: пути потомков меняются одним UPDATE
+    (замена префикса), их version и updated_at не трогаются - путь клиентам не отдается.
+    False - нет такого родителя; ValueError - родитель внутри поддерева задачи.
+    """
+    old_prefix = subtree_prefix(tsk)
+    new_path = ""
+    if parent_id is not None:
+        query = select(TasksORM).where(TasksORM.id_task == parent_id, TasksORM.list_id == id_list)
+        parent = (await session.execute(query)).scalar_one_or_none()
+        if parent is None:
+            return False
+        if parent.id_task == tsk.id_task or parent.path.startswith(old_prefix):
+            raise ValueError("Задачу нельзя перенести в ее же поддерево")
+        new_path = subtree_prefix(parent)
+
+    if new_path != tsk.path:
+        table = TasksORM.__table__
+        await session.execute(
+            update(table)
+            .where(table.c.list_id == id_list, in_subtree(old_prefix))
+            .values(
+                path=literal(f"{new_path}{tsk.id_task}/").concat(func.substr(table.c.path, len(old_prefix) + 1)),
+                updated_at=table.c.updated_at,
+            )
+        )
+    tsk.parent_id = parent_id
+    tsk.path = new_path
+    return True
+
+
+async def move_task(
+    id_task: int,
+    id_user: int,
+    id_list: int,
+    data: TaskMoveSchema,
+    session: AsyncSession | None = None,
+) -> None | TasksORM:
+    """
+    Ставит задачу сразу после after_id (None - в начало): меняется одна строка, ключ между соседями.
+    С parent_id задача переезжает под другого родителя вместе с поддеревом;
+    первой подзадачей ее делает after_id самого родителя.
+    Соседи с одинаковыми ключами (строки, созданные до колонки position) - лист сначала перенумеровывается.
+    Строка листа блокируется до коммита: переносы в одном листе и перенумерация идут по очереди,
+    и ключ не считается от соседей, которые уже поменялись (Postgres; SQLite блокировок строк не знает).
+    """
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "editor")
+        if access is None:
+            return None
+        await session.execute(select(ListsORM.id_list).where(ListsORM.id_list == id_list).with_for_update())
+        query = select(TasksORM).where(TasksORM.id_task == id_task, TasksORM.list_id == id_list)
+        result = await session.execute(query)
+        tsk = result.scalar_one_or_none()
+
+        if tsk is None:
+            return None
+
+        if "parent_id" in data.model_fields_set and not await _reparent(session, tsk, id_list, data.parent_id):
+            return None
+
+        after_id = data.after_id
+        before, after = await _neighbours(session, tsk, id_list, after_id)
+        if before is False:
+            return None
+        try:
+            position = key_between(before, after)
+        except ValueError:
+            await rebalance_list(id_list, session)
+            await session.refresh(tsk)
+            before, after = await _neighbours(session, tsk, id_list, after_id)
+            position = key_between(before, after)
+
+        tsk.position = position
+        await session.flush()
+        await session.refresh(tsk)
+        await stage_list_event(session, id_list, access, id_user, "task.moved", _task_event_data(tsk))
+
+        return tsk
@@ -1,11 +1,21 @@
 
 from fastapi import APIRouter, HTTPException, status
-from sqlalchemy import delete, select
+from sqlalchemy import delete, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.config import session_factory
-from src.database.tables import ListsORM, UsersORM
+from src.database.acl import (
+    authorize_list,
+    forget_list,
+    list_members,
+    stage_list_event,
+)
+from src.database.config import session_scope
+from src.database.crud.sync import add_tombstone
+from src.database.crud.tags import untag_tasks
+from src.database.tables import ListMembersORM, ListsORM, TasksORM, UsersORM
+from src.events.broker import stage_event
 from src.models.schemas import (
     ListAddSchema,
+    ListMemberAddSchema,
     ListPatchSchema,
     ListResponseSchema,
     ListUpdateSchema,
@@ -14,12 +24,16 @@ from src.models.schemas import (
 router = APIRouter()
 
 
+def _list_event_data(lst: ListsORM) -> dict:
+    return ListResponseSchema.model_validate(lst).model_dump(mode="json")
+
+
 async def add_todo_lists(
     id_user: int,
     lst: ListAddSchema,
-    # session: AsyncSession,
+    session: AsyncSession | None = None,
 ) -> None | ListsORM:
-    async with session_factory() as session:
+    async with session_scope(session) as session:
         user = await session.get(UsersORM, id_user)
         if user is None: # если нет юзера
             return None
@@ -31,8 +45,10 @@ async def add_todo_lists(
         )
 
         session.add(new_lst)
-        await session.commit()
+        await session.flush() # получить айди листа для события
         await session.refresh(new_lst)
+        forget_list(session, new_lst.id_list) # айди мог проверяться раньше, когда листа не было
+        stage_event(session, id_user, "list.created", _list_event_data(new_lst))
 
         return new_lst
 
@@ -46,10 +62,12 @@ async def add_todo_lists(
 
 async def get_lists(
     id_user: int,
-    # session: AsyncSession,
+    session: AsyncSession | None = None,
 ):
-    async with session_factory() as session:
-        query = select(ListsORM).where(ListsORM.user_id == id_user)
+    """Свои листы и листы, которыми поделились с пользователем (у чужих user_id - владелец)"""
+    async with session_scope(session) as session:
+        shared = select(ListMembersORM.list_id).where(ListMembersORM.user_id == id_user)
+        query = select(ListsORM).where(or_(ListsORM.user_id == id_user, ListsORM.id_list.in_(shared)))
         result = await session.execute(query)
         lists = result.scalars().all() # достаем список ORM-объектов
         return lists # преобразует ORM → Pydantic
@@ -95,16 +113,13 @@ async def patch_list(
     id_user: int,
     id_list: int,
     data: ListPatchSchema,
-    # session: AsyncSession,
+    session: AsyncSession | None = None,
 ) -> ListsORM | None:
-    async with session_factory() as session:
-        query = select(ListsORM).where(
-            ListsORM.id_list == id_list,
-            ListsORM.user_id == id_user,
-        )
-        result = await session.execute(query)
-        lst = result.scalar_one_or_none()
-
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "editor")
+        if access is None:
+            return None
+        lst = await session.get(ListsORM, id_list)
         if lst is None:
             return None
 
@@ -112,8 +127,9 @@ async def patch_list(
         for field_name, new_value in data_dict.items():
             setattr(lst, field_name, new_value)
 
-        await session.commit()
+        await session.flush()
         await session.refresh(lst)
+        await stage_list_event(session, id_list, access, id_user, "list.patched", _list_event_data(lst))
 
         return lst
 
@@ -121,7 +137,7 @@ async def patch_list(
 async def delete_list(
     id_user: int,
     id_list: int,
-    # session:AsyncSession,
+    session: AsyncSession | None = None,
 ):
     # query = select(ListsORM).where(
     #     ListsORM.id_list == id_list,
@@ -137,12 +153,14 @@ async def delete_list(
 
     # await session.delete(lst)
 
-    async with session_factory() as session:
+    async with session_scope(session) as session:
+        if await authorize_list(session, id_user, id_list, "owner") is None:
+            return False
+        members = await list_members(session, id_list) # до удаления: на Postgres участники уйдут каскадом
+        await untag_tasks(session, select(TasksORM.id_task).where(TasksORM.list_id == id_list)) # счетчики тегов
         query = (
             delete(ListsORM)
-            .where(
-                ListsORM.id_list == id_list,
-                ListsORM.user_id == id_user)
+            .where(ListsORM.id_list == id_list)
             .returning(ListsORM.id_list)
         )
         result = await session.execute(query)
@@ -151,6 +169,95 @@ async def delete_list(
         if deleted_id_list is None:
             return False
 
-        await session.commit()
+        # участники удаляются и каскадом, но SQLite без PRAGMA foreign_keys каскад не выполняет,
+        # а айди листа может достаться новому листу
+        await session.execute(delete(ListMembersORM).where(ListMembersORM.list_id == deleted_id_list))
+        forget_list(session, deleted_id_list)
+        add_tombstone(session, id_user, "list", deleted_id_list)
+        for user_id in sorted({id_user, *members}):
+            stage_event(session, user_id, "list.deleted", {"id_list": deleted_id_list})
+
+        return True
+
+
+async def get_members(
+    id_user: int,
+    id_list: int,
+    session: AsyncSession | None = None,
+) -> None | list[dict]:
+    """Участники листа - видны всем, у кого есть доступ к нему. None - лист недоступен"""
+    async with session_scope(session) as session:
+        if await authorize_list(session, id_user, id_list) is None:
+            return None
+        query = (
+            select(UsersORM.id_user, UsersORM.name, UsersORM.email, ListMembersORM.role)
+            .join(ListMembersORM, ListMembersORM.user_id == UsersORM.id_user)
+            .where(ListMembersORM.list_id == id_list)
+            .order_by(ListMembersORM.created_at, UsersORM.id_user)
+        )
+        result = await session.execute(query)
+        return [row._asdict() for row in result.all()]
+
+
+async def put_member(
+    id_user: int,
+    id_list: int,
+    data: ListMemberAddSchema,
+    session: AsyncSession | None = None,
+) -> None | dict:
+    """
+    Делится листом с пользователем по почте или меняет его роль; только владелец.
+    None - нет листа или пользователя, ValueError - владелец добавляет сам себя.
+    """
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "owner")
+        if access is None:
+            return None
+        query = select(UsersORM).where(UsersORM.email == data.email, UsersORM.deleted_at.is_(None))
+        user = (await session.execute(query)).scalar_one_or_none()
+        if user is None:
+            return None
+        if user.id_user == id_user:
+            raise ValueError("Владелец уже имеет полный доступ к листу")
+
+        member = await session.get(ListMembersORM, (id_list, user.id_user))
+        if member is None:
+            member = ListMembersORM(list_id=id_list, user_id=user.id_user, role=data.role)
+            session.add(member)
+        else:
+            member.role = data.role
+        await session.flush()
+
+        forget_list(session, id_list)
+        event_data = {"id_list": id_list, "id_user": user.id_user, "role": data.role}
+        # всем участникам, включая нового - у него лист появился
+        await stage_list_event(session, id_list, access, id_user, "list.member_added", event_data)
+
+        return {"id_user": user.id_user, "name": user.name, "email": user.email, "role": data.role}
+
+
+async def delete_member(
+    id_user: int,
+    id_list: int,
+    id_member: int,
+    session: AsyncSession | None = None,
+) -> bool:
+    """Убирает участника: владелец - любого, участник - только себя (выйти из листа)"""
+    async with session_scope(session) as session:
+        access = await authorize_list(session, id_user, id_list, "owner" if id_member != id_user else "viewer")
+        if access is None:
+            return False
+        query = (
+            delete(ListMembersORM)
+            .where(ListMembersORM.list_id == id_list, ListMembersORM.user_id == id_member)
+            .returning(ListMembersORM.user_id)
+        )
+        if (await session.execute(query)).scalar_one_or_none() is None:
+            return False
+
+        forget_list(session, id_list)
+        event_data = {"id_list": id_list, "id_user": id_member}
+        # оставшимся участникам и убранному - у него лист пропал
+        await stage_list_event(session, id_list, access, id_member, "list.member_removed", event_data)
 
         return True
@@ -1,9 +1,14 @@
+import json
+
 from fastapi import APIRouter, HTTPException, status
 from pydantic import EmailStr
-from sqlalchemy import delete, select
+from sqlalchemy import func, select, text, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database.config import Base, engine, session_factory
+from src.config import settings
+from src.database.config import Base, session_factory
 from src.database.tables import UsersORM
+from src.jobs.purge import PURGE_JOB
+from src.jobs.queue import job_queue
 from src.models.schemas import (
     UserAddSchema,
     UserPatchSchema,
@@ -55,18 +60,105 @@ await session.refresh(new_user) делает микрозапрос на обн
 """
 
 
-async def get_users(): #(session: AsyncSession):
+def _like_escape(value: str) -> str:
+    """Символы шаблона LIKE из ввода - буквально (ESCAPE '/')"""
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+def _email_key(session: AsyncSession):
+    """lower(email) в порядке индекса ix_users_email_lower: на Postgres побайтовом (COLLATE "C"), как BINARY в SQLite"""
+    key = func.lower(UsersORM.email)
+    if session.get_bind().dialect.name == "postgresql":
+        key = key.collate("C")
+    return key
+
+
+def _users_query(session: AsyncSession, email: str | None, name: str | None):
     """
-    Админская функция, не используется пользователями
+    Живые пользователи с префиксом почты email и подстрокой name (без учета регистра).
+    Условия записаны так, чтобы шли по индексам из UsersORM.__table_args__.
+    """
+    query = select(UsersORM).where(UsersORM.deleted_at.is_(None)) # удаленные ждут очистки, их не показываем
+    if email:
+        email = email.lower()
+        # префикс - диапазон [email, следующий префикс) по индексу: в побайтовом порядке это ровно LIKE 'email%'
+        query = query.where(
+            _email_key(session) >= email,
+            _email_key(session) < email[:-1] + chr(ord(email[-1]) + 1),
+        )
+    if name:
+        query = query.where(UsersORM.name.ilike("%" + _like_escape(name) + "%", escape="/"))
+    return query
+
+
+async def get_users(
+    email: str | None = None,
+    name: str | None = None,
+    after_id: int | None = None,
+    after_email: str | None = None,
+    limit: int = 50,
+): #(session: AsyncSession):
+    """
+    Админская функция, не используется пользователями.
+    Поиск по префиксу почты и подстроке имени без OFFSET, любая страница - один проход индекса.
+    С префиксом почты страницы идут в порядке индекса (lower(email), id_user), курсор - оба значения
+    последнего пользователя предыдущей страницы; без него - по возрастанию id, курсор - after_id.
     """
     async with session_factory() as session:
-        query = select(UsersORM)
+        query = _users_query(session, email, name)
+        if email:
+            key = _email_key(session)
+            if after_id is not None and after_email is not None:
+                query = query.where(tuple_(key, UsersORM.id_user) > tuple_(after_email, after_id))
+            query = query.order_by(key, UsersORM.id_user).limit(limit)
+        else:
+            if after_id is not None:
+                query = query.where(UsersORM.id_user > after_id)
+            query = query.order_by(UsersORM.id_user).limit(limit)
         result = await session.execute(query)
 
         users = result.scalars().all() # scalars() распаковывает кортежи для удобства чтения и доступа через срезы
         return users
 
 
+async def _estimate_rows(session: AsyncSession, query, filtered: bool) -> int:
+    """Оценка планировщика Postgres: reltuples таблицы без фильтров, иначе строки из EXPLAIN"""
+    if not filtered:
+        estimate = await session.scalar(text("SELECT reltuples::bigint FROM pg_class WHERE oid = 'users'::regclass"))
+        if estimate is not None and estimate >= 0: # -1 - таблицу еще не анализировали
+            return estimate
+    # значения подставляются в текст (экранирует SQLAlchemy): EXPLAIN не принимает параметры через драйвер
+    sql = query.compile(dialect=session.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    connection = await session.connection()
+    plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_users(
+    email: str | None = None,
+    name: str | None = None,
+) -> tuple[int, bool]:
+    """
+    (число, оценка ли это) для поиска get_users.
+    Точно считаются только первые ADMIN__EXACT_COUNT_LIMIT + 1 строк: COUNT(*) по миллионам пользователей
+    читал бы их все. Если найдено больше - на Postgres оценка планировщика (не меньше порога),
+    на SQLite оценок нет - нижняя граница.
+    """
+    limit = settings.admin.EXACT_COUNT_LIMIT
+    async with session_factory() as session:
+        query = _users_query(session, email, name)
+        bounded = query.with_only_columns(UsersORM.id_user).limit(limit + 1).subquery()
+        exact = (await session.execute(select(func.count()).select_from(bounded))).scalar_one()
+        if exact <= limit:
+            return exact, False
+        if session.get_bind().dialect.name != "postgresql":
+            return exact, True
+        estimate = await _estimate_rows(session, query, filtered=bool(email or name))
+        return max(estimate, exact), True
+
+
 # @router.put("/users/{user_id}", tags=["Пользователи"], summary="Обновить все данные пользователя", status_code=status.HTTP_200_OK) # заменяет все свойства
 # async def update_user(user_id_for_update: int, data: UserUpdateSchema, session: SessionDep):
 #     """
@@ -152,18 +244,26 @@ async def delete_user(
     #         detail="User not found") # ошибка 404 если запрос вернул ничего
     # await session.delete(user)
 
+    # каскадное удаление всех листов и задач одной транзакцией держало блокировки секундами,
+    # теперь пользователь только помечается, а данные удаляет фоновая задача (src/jobs/purge.py)
     async with session_factory() as session:
         query = (
-            delete(UsersORM)
-            .where(UsersORM.id_user == user_id)
+            update(UsersORM)
+            .where(UsersORM.id_user == user_id, UsersORM.deleted_at.is_(None))
+            .values(deleted_at=func.now())
             .returning(UsersORM.id_user) # возврат удаленного айди
-        ) # прямой запрос на удаление пользователя
+        ) # мягкое удаление: пользователь сразу не находится по почте и токену
 
         result = await session.execute(query)
         deleted_user_id = result.scalar_one_or_none() # проверка - вернулся ли удаленный айди?
 
-        if deleted_user_id is None: # если айди не вернулся, значит пользователя нет и удаления не выполнено
+        if deleted_user_id is None: # если айди не вернулся, значит пользователя нет (или он уже удален)
             return None
 
+        # объем аккаунта считает сама очистка: в запросе - только пометка и постановка задачи
+        payload = {"user_id": user_id}
+        # задача ставится в той же транзакции: пометка и очистка появляются только вместе
+        job = await job_queue.enqueue(PURGE_JOB, payload, user_id=user_id, session=session)
         await session.commit()
-        return True
+        await session.refresh(job) # created_at заполняет база
+        return job
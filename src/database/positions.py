@@ -0,0 +1,134 @@
+from typing import Iterator
+
+# Ключи порядка задач (tasks.position): строки, которые сравниваются побайтно.
+# Перенос задачи между соседями - новый ключ строго между их ключами, остальные строки не трогаются.
+#
+# Ключ = целая часть + дробная. Первый символ целой части задает ее длину
+# (a - 2 символа, b - 3, ...; A..Z - отрицательные числа), поэтому добавление в конец
+# увеличивает целую часть, и ключи растут на символ только раз в десятки тысяч вставок.
+# Вставка между соседями делит пополам дробную часть - при частых вставках в одно место
+# она удлиняется, такие листы перенумеровывает задача tasks.rebalance.
+# Алгоритм - fractional indexing (как в Figma и rocicorp/fractional-indexing), алфавит base62.
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+SMALLEST_INTEGER = "A" + "0" * 26
+FIRST_KEY = "a0"
+
+
+def _midpoint(a: str, b: str | None) -> str:
+    """Дробная часть строго между a и b (b None - без верхней границы); обе не кончаются на 0"""
+    if b is not None:
+        n = 0 # общий префикс
+        while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Неверный ключ порядка: {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Неверный ключ порядка: {key!r}")
+    return key[:length]
+
+
+def _increment_integer(integer: str) -> str | None:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[i]) + 1
+        if digit < len(DIGITS):
+            digits[i] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = "0"
+    # перенос в старший разряд - целая часть длиннее на символ
+    if head == "Z":
+        return "a0"
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append("0")
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> str | None:
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[i]) - 1
+        if digit >= 0:
+            digits[i] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: str | None, b: str | None) -> str:
+    """
+    Ключ строго между a и b: a None - перед b (в начало), b None - после a (в конец).
+    ValueError, если a >= b - соседи с одинаковыми ключами, лист нужно перенумеровать.
+    """
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"Ключи порядка не возрастают: {a!r} >= {b!r}")
+
+    if a is None:
+        if b is None:
+            return FIRST_KEY
+        integer_b = _integer_part(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", b[len(integer_b):])
+        if integer_b < b:
+            return integer_b
+        decremented = _decrement_integer(integer_b)
+        if decremented is None:
+            raise ValueError("Ключи порядка исчерпаны")
+        return decremented
+
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a):]
+    if b is None:
+        incremented = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if incremented is None else incremented
+
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, b[len(integer_b):])
+    incremented = _increment_integer(integer_a)
+    if incremented is None:
+        raise ValueError("Ключи порядка исчерпаны")
+    if incremented < b:
+        return incremented
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_after(a: str | None, count: int) -> Iterator[str]:
+    """count возрастающих ключей после a - для добавления пачки в конец и перенумерации"""
+    for _ in range(count):
+        a = key_between(a, None)
+        yield a
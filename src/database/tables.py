@@ -1,27 +1,53 @@
+from datetime import datetime
 from typing import Annotated
 
-from sqlalchemy import ForeignKey, String
+from sqlalchemy import DDL, JSON, ForeignKey, Index, String, event, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from src.database.config import Base
+from src.database.positions import FIRST_KEY
+from src.database.versioning import ChangeVersionMixin, VersionedMixin
 
 intpk = Annotated[int, mapped_column(primary_key=True)] # переменная для всех PK
 
 class UsersORM(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # поиск админки (src/database/crud/users.py): префикс почты без учета регистра.
+        # префикс почты - диапазоном по индексу, страницы - в его порядке (lower(email), id_user);
+        # на Postgres порядок побайтовый (COLLATE "C"): от локали не зависит, как BINARY в SQLite
+        Index("ix_users_email_lower", text('lower(email) COLLATE "C"'), "id_user").ddl_if(dialect="postgresql"),
+        Index("ix_users_email_lower", text("lower(email)"), "id_user").ddl_if(dialect="sqlite"),
+        Index( # подстрока имени (ILIKE '%abc%') - триграммы pg_trgm
+            "ix_users_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id_user: Mapped[intpk] # тип столбца через алиас-переменную
     name: Mapped[str] = mapped_column(String(32)) # валидация длины
     email:Mapped[str] = mapped_column(String(32), unique=True, nullable=False) # уникальность емейла
     # email: Mapped[str | None] = mapped_column(String(32), nullable=True) #EmailStr | None # валидация эмейла или пусто - НЕВЕРНО, ВАЛИДАЦИЯ ЧЕРЕЗ ПАЙДЕНТИК ТОЛЬКО В СХЕМАХ АПИ
     hashed_password: Mapped[bytes] = mapped_column(nullable=False) # поле для хранения хеша пароля
+    deleted_at: Mapped[datetime | None] = mapped_column(default=None) # мягкое удаление: строка живет до конца очистки
 
     user_lists: Mapped[list["ListsORM"]] = relationship(back_populates="user") # НЕ КОЛОНКА, А СВЯЗЬ!
     # связь: один пользователь -> много списков (поэтому принимает список)
 
     # model_config = ConfigDict(extra="forbid") запрет на лишние данные - не работает в алхимии, только в пайдентик
 
-class ListsORM(Base):
+# gin_trgm_ops для ix_users_name_trgm
+event.listen(
+    UsersORM.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
+class ListsORM(VersionedMixin, Base):
     __tablename__ = "lists"
+    __table_args__ = (
+        Index("ix_lists_user_id_version", "user_id", "version"), # изменения пользователя после курсора
+    )
 
     id_list: Mapped[intpk]
     title: Mapped[str]
@@ -37,12 +63,56 @@ class ListsORM(Base):
     all_tasks: Mapped[list["TasksORM"]] = relationship(back_populates="todo_list")
     # связь (НЕ КОЛОНКА): один лист -> много задач (поэтому принимает список)
 
-class TasksORM(Base):
+class ListMembersORM(Base):
+    """Совместный доступ к листу: участники с ролью viewer или editor (владелец - lists.user_id, здесь его нет)"""
+    __tablename__ = "list_members"
+    __table_args__ = (
+        Index("ix_list_members_user_id", "user_id"), # листы, которыми поделились с пользователем
+    )
+
+    list_id: Mapped[int] = mapped_column(ForeignKey("lists.id_list", ondelete="CASCADE"), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id_user", ondelete="CASCADE"), primary_key=True)
+    role: Mapped[str] = mapped_column(String(16)) # viewer - только чтение, editor - задачи и сам лист
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+class TasksORM(VersionedMixin, Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index("ix_tasks_list_id_version", "list_id", "version"), # изменения по каждому листу после курсора
+        Index("ix_tasks_list_id_position", "list_id", "position", "id_task"), # задачи листа по порядку без сортировки
+        Index("ix_tasks_list_id_path", "list_id", "path"), # поддерево задачи - диапазон путей
+        Index("ix_tasks_parent_id", "parent_id"),
+        Index( # кандидаты в архив; частичный индекс - только выполненные задачи
+            "ix_tasks_completed_updated_at", "updated_at",
+            postgresql_where=text("completed"), sqlite_where=text("completed = 1"),
+        ),
+        Index( # сроки задач пользователя по листам: только невыполненные со сроком
+            "ix_tasks_list_id_due_at", "list_id", "due_at",
+            postgresql_where=text("NOT completed AND due_at IS NOT NULL"),
+            sqlite_where=text("completed = 0 AND due_at IS NOT NULL"),
+        ),
+        Index( # очередь напоминаний (src/reminders): еще не напомненные, по сроку
+            "ix_tasks_due_at_unreminded", "due_at",
+            postgresql_where=text("NOT completed AND reminded_at IS NULL AND due_at IS NOT NULL"),
+            sqlite_where=text("completed = 0 AND reminded_at IS NULL AND due_at IS NOT NULL"),
+        ),
+    )
 
     id_task: Mapped[intpk]
     task_name: Mapped[str] = mapped_column(String(64))
     completed: Mapped[bool] = mapped_column(default=False) # добавлен дефолт иначе база будет требовать её при каждом сохранении, если вы забудете её передать.
+    position: Mapped[str] = mapped_column( # ключ порядка в листе (src/database/positions.py)
+        String(255).with_variant(String(255, collation="C"), "postgresql"), # побайтное сравнение, не по локали
+        server_default=FIRST_KEY,
+    )
+    parent_id: Mapped[int | None] = mapped_column(ForeignKey("tasks.id_task", ondelete="CASCADE")) # подзадача
+    path: Mapped[str] = mapped_column( # материализованный путь: id предков через "/", у корневой задачи пусто
+        String(512).with_variant(String(512, collation="C"), "postgresql"),
+        server_default="",
+    )
+    due_at: Mapped[datetime | None] # срок, UTC
+    reminded_at: Mapped[datetime | None] # напоминание отправлено; заодно захват, чтобы его отправил один процесс
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now()) # для статистики (src/stats.py)
 
     list_id: Mapped[int] = mapped_column(ForeignKey("lists.id_list", ondelete="CASCADE"))
     # столбец для хранение айди листа, связан как внешний ключ с таблицей листов
@@ -50,3 +120,94 @@ class TasksORM(Base):
 
     todo_list: Mapped["ListsORM"] = relationship(back_populates="all_tasks")
     # обратная связь много задач -> один лист
+
+class ArchivedTasksORM(Base):
+    """
+    Холодные задачи: выполненные и не менявшиеся дольше ARCHIVE__AFTER_DAYS, их переносит src/jobs/archive.py.
+    На Postgres таблица секционирована по месяцам completed_at, секции создает задача архивации.
+    """
+    __tablename__ = "archived_tasks"
+    __table_args__ = (
+        Index("ix_archived_tasks_list_id", "list_id"),
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
+
+    id_task: Mapped[int] = mapped_column(primary_key=True, autoincrement=False) # id из tasks, с ним задача и восстанавливается
+    completed_at: Mapped[datetime] = mapped_column(primary_key=True) # updated_at задачи; ключ секции входит в первичный ключ
+    task_name: Mapped[str] = mapped_column(String(64))
+    list_id: Mapped[int] = mapped_column(ForeignKey("lists.id_list", ondelete="CASCADE"))
+    archived_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    created_at: Mapped[datetime | None] # created_at задачи; у задач, архивированных до появления колонки, пусто
+
+    completed = True # в архив попадают только выполненные, для схемы ответа
+    archived = True
+
+class TagsORM(Base):
+    """
+    Теги пользователя. task_count - сколько живых задач с тегом: меняется вместе со связями
+    (src/database/crud/tags.py), поэтому счетчики не требуют просмотра task_tags.
+    """
+    __tablename__ = "tags"
+    __table_args__ = (
+        Index("ix_tags_user_id_name", "user_id", "name", unique=True),
+    )
+
+    id_tag: Mapped[intpk]
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id_user", ondelete="CASCADE"))
+    name: Mapped[str] = mapped_column(String(32))
+    task_count: Mapped[int] = mapped_column(default=0, server_default="0")
+
+class TaskTagsORM(Base):
+    """
+    Связь задач и тегов. Первичный ключ (tag_id, task_id) - задачи тега по возрастанию id:
+    пересечение тегов идет от самого редкого тега с проверкой остальных точечным поиском по этому ключу.
+    """
+    __tablename__ = "task_tags"
+    __table_args__ = (
+        Index("ix_task_tags_task_id", "task_id"), # теги задачи и удаление связей вместе с задачами
+    )
+
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tags.id_tag", ondelete="CASCADE"), primary_key=True)
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.id_task", ondelete="CASCADE"), primary_key=True)
+
+class SyncTombstonesORM(ChangeVersionMixin, Base):
+    """
+    Надгробия удаленных листов и задач для дельта-синхронизации.
+    Надгробие листа покрывает и все его задачи (они удаляются каскадом).
+    """
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_id_version", "user_id", "version"),
+    )
+
+    id_tombstone: Mapped[intpk]
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id_user", ondelete="CASCADE"))
+    entity: Mapped[str] = mapped_column(String(8)) # "list" или "task"
+    entity_id: Mapped[int]
+    list_id: Mapped[int | None] # для задачи - лист, в котором она была
+    deleted_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+class JobsORM(Base):
+    """
+    Фоновая задача (src/jobs/queue.py): очередь живет в той же базе, без внешнего брокера.
+    Без внешнего ключа на users - задача очистки переживает удаление своего пользователя.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"), # поиск готовых к запуску
+    )
+
+    id_job: Mapped[intpk]
+    type: Mapped[str] = mapped_column(String(32))
+    user_id: Mapped[int | None] = mapped_column(index=True) # владелец, видит задачу в /me/jobs/{id}
+    status: Mapped[str] = mapped_column(String(16), default="pending") # pending, running, done, failed
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    result: Mapped[dict | None] = mapped_column(JSON) # итог или промежуточные счетчики
+    progress: Mapped[float] = mapped_column(default=0.0) # 0..1
+    attempts: Mapped[int] = mapped_column(default=0)
+    max_attempts: Mapped[int] = mapped_column(default=5)
+    run_at: Mapped[datetime] # не раньше этого времени (UTC), сдвигается при повторе
+    heartbeat_at: Mapped[datetime | None] # последний признак жизни; по нему подхватывается задача упавшего воркера
+    error: Mapped[str | None] = mapped_column(String(512))
+    created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+    finished_at: Mapped[datetime | None]
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, ForeignKey, event, func, select
+from sqlalchemy.orm import Mapped, Session, mapped_column
+from src.database.config import Base
+
+# Монотонная последовательность изменений для дельта-синхронизации - своя у каждого владельца данных.
+# Транзакция, которая создает или меняет версионируемые строки владельца, берет следующий номер
+# из его строки sync_counters и записывает этот номер в их колонку version.
+# Клиент хранит номер, до которого он все получил (курсор), и просит только то, что новее.
+#
+# Строка счетчика остается заблокированной до конца транзакции, поэтому следующий номер владельца
+# выдается только после коммита (или отката) предыдущего: номера идут в порядке коммитов.
+# Закоммиченное значение счетчика - граница, до которой все изменения владельца уже видны читателю.
+
+SESSION_KEY = "change_versions" # ключ в session.info: номер изменения транзакции по владельцам
+
+
+class SyncCounterORM(Base):
+    """Последний выданный номер изменения владельца"""
+    __tablename__ = "sync_counters"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id_user", ondelete="CASCADE"), primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class ChangeVersionMixin:
+    """Номер изменения, в котором строка записана. Заполняется автоматически в before_flush."""
+    version: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class VersionedMixin(ChangeVersionMixin):
+    """Колонки для синхронизации: когда и в какой номер изменения строка менялась"""
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
+
+
+def next_change_seq(session: Session, owner_id: int) -> int:
+    """
+    Номер изменения этой транзакции для владельца (синхронная сессия, работает внутри событий ORM).
+    Первый вызов в транзакции увеличивает счетчик и блокирует его строку до коммита, следующие берут тот же номер.
+    """
+    versions = session.info.setdefault(SESSION_KEY, {})
+    if owner_id in versions:
+        return versions[owner_id]
+
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    query = (
+        insert(SyncCounterORM)
+        .values(user_id=owner_id, value=1)
+        .on_conflict_do_update(
+            index_elements=[SyncCounterORM.user_id],
+            set_={"value": SyncCounterORM.value + 1})
+        .returning(SyncCounterORM.value)
+    )
+    versions[owner_id] = session.execute(query).scalar_one()
+    return versions[owner_id]
+
+
+def _owners(session: Session, objects: list) -> dict[int, int]:
+    """
+    Владельцы листов, к которым относятся строки без user_id (задачи): из листов в сессии,
+    из прав, уже проверенных в транзакции (authorize_list), остальные - одним запросом.
+    """
+    from src.database.acl import SESSION_KEY as ACCESS_KEY
+    from src.database.tables import ListsORM
+
+    list_ids = {obj.list_id for obj in objects if not hasattr(obj, "user_id")}
+    if not list_ids:
+        return {}
+    owners = {}
+    for obj in session.identity_map.values():
+        if isinstance(obj, ListsORM) and obj.id_list in list_ids:
+            owners[obj.id_list] = obj.user_id
+    for (_, id_list), access in session.info.get(ACCESS_KEY, {}).items():
+        if access is not None and id_list in list_ids:
+            owners[id_list] = access.owner_id
+    missing = list_ids - owners.keys()
+    if missing:
+        query = select(ListsORM.id_list, ListsORM.user_id).where(ListsORM.id_list.in_(missing))
+        owners.update(session.execute(query).tuples().all())
+    return owners
+
+
+@event.listens_for(Session, "before_flush")
+def _assign_change_version(session: Session, flush_context, instances):
+    changed = [
+        obj for obj in session.new
+        if isinstance(obj, ChangeVersionMixin)
+    ] + [
+        obj for obj in session.dirty
+        if isinstance(obj, ChangeVersionMixin) and session.is_modified(obj)
+    ]
+    if not changed:
+        return
+
+    with session.no_autoflush:
+        list_owners = _owners(session, changed)
+        by_owner = {}
+        for obj in changed:
+            owner_id = obj.user_id if hasattr(obj, "user_id") else list_owners.get(obj.list_id)
+            if owner_id is not None: # лист задачи не найден - запись все равно упадет на внешнем ключе
+                by_owner.setdefault(owner_id, []).append(obj)
+        # счетчики - по возрастанию id владельца: две транзакции не возьмут блокировки в разном порядке
+        for owner_id in sorted(by_owner):
+            version = next_change_seq(session, owner_id)
+            for obj in by_owner[owner_id]:
+                obj.version = version
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset_change_versions(session: Session):
+    session.info.pop(SESSION_KEY, None) # блокировки счетчиков сняты, следующая транзакция берет новые номера
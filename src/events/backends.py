@@ -0,0 +1,124 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[str], None] # принимает сериализованное событие
+
+
+class BrokerBackend(ABC):
+    """
+    Способ раздачи событий между процессами.
+    publish не должен ждать сеть: он вызывается из after_commit.
+    """
+
+    async def start(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    @abstractmethod
+    def publish(self, payload: str) -> None:
+        ...
+
+    async def stop(self) -> None:
+        pass
+
+
+class MemoryBackend(BrokerBackend):
+    """Один процесс: событие сразу доставляется своим подписчикам"""
+
+    def __init__(self):
+        self.deliver: Deliver | None = None
+
+    def publish(self, payload: str) -> None:
+        if self.deliver is not None:
+            self.deliver(payload)
+
+
+class PostgresBackend(BrokerBackend):
+    """
+    Несколько воркеров: события ходят через LISTEN/NOTIFY той же базы.
+    Отдельное соединение asyncpg слушает канал, отправка идет через очередь,
+    так как asyncpg не разрешает параллельные запросы в одном соединении.
+    Воркер получает и свои же события, поэтому доставка только через канал.
+    Очередь отправки ограничена outbox_size: пока базы нет, новые события отбрасываются, а не копят память.
+    Оборванное соединение переоткрывается через reconnect_seconds, неотправленное событие уходит повторно.
+    """
+
+    def __init__(self, url: str, channel: str, outbox_size: int = 10_000, reconnect_seconds: float = 1.0):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.outbox: asyncio.Queue[str] = asyncio.Queue(maxsize=outbox_size)
+        self.dropped = 0 # отброшено с последней успешной отправки, в лог пишется только первое
+        self.connection = None
+        self.sender: asyncio.Task | None = None
+
+    async def start(self, deliver: Deliver) -> None:
+        await super().start(deliver)
+        await self._connect()
+        self.sender = asyncio.create_task(self._send_loop())
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        self.connection = await asyncpg.connect(self.dsn)
+        await self.connection.add_listener(self.channel, self._on_notify)
+
+    async def _close(self) -> None:
+        connection, self.connection = self.connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await connection.close(timeout=self.reconnect_seconds)
+            except Exception:
+                connection.terminate()
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self.deliver(payload)
+
+    def publish(self, payload: str) -> None:
+        try:
+            self.outbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            if not self.dropped:
+                logger.warning("Очередь NOTIFY переполнена (%d), события отбрасываются", self.outbox.maxsize)
+            self.dropped += 1
+
+    async def _send_loop(self) -> None:
+        payload = None
+        while True:
+            if payload is None:
+                try:
+                    # с таймаутом: оборванное слушающее соединение переоткрывается и без новых событий
+                    payload = await asyncio.wait_for(self.outbox.get(), self.reconnect_seconds)
+                except TimeoutError:
+                    pass
+            try:
+                if self.connection is None or self.connection.is_closed():
+                    await self._close()
+                    await self._connect()
+                    logger.info("Соединение LISTEN/NOTIFY восстановлено")
+                if payload is not None:
+                    await self.connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+            except Exception:
+                if self.connection is not None and not self.connection.is_closed():
+                    # соединение живо - ошибка в самом событии (например, больше 8000 байт), повтор не поможет
+                    logger.exception("Событие не отправлено в канал %s и отброшено", self.channel)
+                    payload = None
+                    continue
+                logger.exception("Нет соединения LISTEN/NOTIFY, повтор через %.1f s", self.reconnect_seconds)
+                await self._close()
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+            if payload is not None and self.dropped:
+                logger.warning("Отправка NOTIFY возобновлена, отброшено событий: %d", self.dropped)
+                self.dropped = 0
+            payload = None
+
+    async def stop(self) -> None:
+        if self.sender is not None:
+            self.sender.cancel()
+        await self._close()
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable
+
+from pydantic import BaseModel
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.events.backends import BrokerBackend, MemoryBackend, PostgresBackend
+from src.monitoring.metrics import record_cache
+
+PENDING_EVENTS_KEY = "pending_events" # ключ в session.info, куда CRUD складывает события до коммита
+
+
+class Event(BaseModel):
+    """
+    Событие изменения данных пользователя.
+    id - монотонный (в рамках процесса) номер, по нему клиент продолжает поток через Last-Event-ID.
+    type - вид события: list.created, list.patched, list.deleted, task.created и т.д.
+    """
+    id: int
+    user_id: int
+    type: str
+    data: dict[str, Any]
+
+    def to_sse(self) -> str:
+        """Кадр в формате text/event-stream"""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class Subscription:
+    """
+    Подписка одного клиента на события пользователя.
+    Очередь ограничена: если клиент не успевает читать, подписка закрывается
+    и клиент переподключается с Last-Event-ID (пропущенное отдается из истории).
+    """
+
+    def __init__(self, broker: "EventBroker", user_id: int, replay: list[Event]):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue: asyncio.Queue[Event | None] = asyncio.Queue(maxsize=settings.events.QUEUE_SIZE)
+        self.replay = replay
+        self.replayed_ids = {e.id for e in replay} # живые события, уже отданные из истории
+        self.closed = False
+
+    def push(self, event: Event) -> None:
+        """Вызывается брокером, никогда не ждет медленного клиента"""
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # клиент отстал - выбрасываем накопленное и сообщаем потребителю о закрытии
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def events(self, heartbeat: float | None = None) -> AsyncIterator[Event | None]:
+        """
+        Сначала отдает события из истории, затем живые.
+        None означает паузу дольше heartbeat (можно отправить пинг).
+        """
+        for event in self.replay:
+            yield event
+        self.replay = []
+
+        while not self.closed:
+            try:
+                event = await asyncio.wait_for(self.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            if event is None: # переполнение очереди
+                return
+            if event.id in self.replayed_ids: # уже отдано при повторе истории
+                self.replayed_ids.discard(event.id)
+                continue
+            yield event
+
+    def close(self) -> None:
+        self.closed = True
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventBroker:
+    """
+    Внутрипроцессный брокер событий.
+    CRUD публикует события после коммита, backend раздает их всем воркерам,
+    каждый воркер доставляет их своим подписчикам и хранит короткую историю для докачки.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[int, set[Subscription]] = {}
+        self.listeners: list[Callable[[Event], None]] = [] # внутренние потребители всех событий процесса
+        self.history: OrderedDict[int, deque[Event]] = OrderedDict()
+        self.backend: BrokerBackend = MemoryBackend()
+        self._last_id = 0
+        self._horizon = self._next_id() # события с меньшим id могли не попасть в историю (до старта или вытеснены)
+
+    def _next_id(self) -> int:
+        # микросекунды дают примерный порядок между воркерами, +1 - строгую монотонность в процессе
+        self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+        return self._last_id
+
+    async def start(self) -> None:
+        if settings.events.BACKEND == "postgres":
+            self.backend = PostgresBackend(
+                url=settings.db.URL,
+                channel=settings.events.CHANNEL,
+                outbox_size=settings.events.OUTBOX_SIZE,
+                reconnect_seconds=settings.events.RECONNECT_SECONDS,
+            )
+        await self.backend.start(self.deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def publish(self, user_id: int, type: str, data: dict[str, Any]) -> Event:
+        """Публикация без ожидания: вызывается из синхронного after_commit"""
+        new_event = Event(id=self._next_id(), user_id=user_id, type=type, data=data)
+        self.backend.publish(new_event.model_dump_json())
+        return new_event
+
+    def deliver(self, payload: str) -> None:
+        """Доставка события (своего или пришедшего от другого воркера) подписчикам"""
+        new_event = Event.model_validate_json(payload)
+        self._last_id = max(self._last_id, new_event.id)
+
+        user_history = self.history.get(new_event.user_id)
+        if user_history is None:
+            user_history = deque(maxlen=settings.events.HISTORY_SIZE)
+            self.history[new_event.user_id] = user_history
+            if len(self.history) > settings.events.HISTORY_USERS:
+                _, evicted = self.history.popitem(last=False)
+                self._horizon = max(self._horizon, evicted[-1].id)
+        else:
+            self.history.move_to_end(new_event.user_id)
+        user_history.append(new_event)
+
+        for subscription in self.subscribers.get(new_event.user_id, ()):
+            subscription.push(new_event)
+        for listener in self.listeners:
+            listener(new_event)
+
+    def listen(self, listener: Callable[[Event], None]) -> None:
+        """Получать все события всех пользователей (вызов синхронный, не должен ждать)"""
+        self.listeners.append(listener)
+
+    def subscribe(self, user_id: int, last_event_id: int | None = None) -> Subscription:
+        """
+        Регистрирует подписчика. Если передан last_event_id - подготавливает
+        повтор пропущенных событий. Если история уже не покрывает разрыв,
+        первым отдается событие resync (клиенту нужно перечитать данные целиком).
+        """
+        replay: list[Event] = []
+        if last_event_id is not None:
+            user_history = self.history.get(user_id, deque())
+            replay = [e for e in user_history if e.id > last_event_id]
+
+            horizon = self._horizon
+            if len(user_history) == user_history.maxlen: # история переполнялась, старые события потеряны
+                horizon = max(horizon, user_history[0].id)
+            if last_event_id < horizon:
+                replay.insert(0, Event(id=last_event_id, user_id=user_id, type="resync", data={}))
+            record_cache("event_history", hit=last_event_id >= horizon)
+
+        subscription = Subscription(self, user_id, replay)
+        self.subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        user_subscriptions = self.subscribers.get(subscription.user_id)
+        if user_subscriptions is None:
+            return
+        user_subscriptions.discard(subscription)
+        if not user_subscriptions:
+            del self.subscribers[subscription.user_id]
+
+
+broker = EventBroker()
+
+
+def stage_event(session: Session, user_id: int, type: str, data: dict[str, Any]) -> None:
+    """
+    Откладывает событие до коммита сессии.
+    При откате транзакции событие не уйдет клиентам.
+    session - AsyncSession или Session (у обоих общий info).
+    """
+    session.info.setdefault(PENDING_EVENTS_KEY, []).append((user_id, type, data))
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _publish_pending_events(session: Session):
+    for user_id, type, data in session.info.pop(PENDING_EVENTS_KEY, ()):
+        broker.publish(user_id, type, data)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _drop_pending_events(session: Session):
+    session.info.pop(PENDING_EVENTS_KEY, None)
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, exists, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from src.config import settings
+from src.database.config import session_factory
+from src.database.crud.tags import untag_tasks
+from src.database.tables import ArchivedTasksORM, TasksORM
+from src.jobs.queue import JobContext, job_queue, utcnow
+from src.monitoring.metrics import registry
+
+ARCHIVE_JOB = "tasks.archive"
+
+ARCHIVED_TASKS = registry.counter(
+    "tasks_archived_total", "Задачи, перенесенные в archived_tasks")
+
+_partitions: set[date] = set() # секции archived_tasks, уже созданные этим процессом
+
+
+def _month(value: datetime) -> date:
+    return value.date().replace(day=1)
+
+
+async def _ensure_partitions(session: AsyncSession, months: set[date]) -> None:
+    """Postgres: месячные секции archived_tasks по мере появления задач этих месяцев"""
+    for start in sorted(months - _partitions):
+        end = (start + timedelta(days=32)).replace(day=1)
+        await session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS archived_tasks_{start:%Y_%m} PARTITION OF archived_tasks "
+            f"FOR VALUES FROM ('{start}') TO ('{end}')"
+        ))
+        _partitions.add(start)
+
+
+async def archive_batch(cutoff: datetime, limit: int) -> int:
+    """
+    Одна транзакция: до limit выполненных задач с updated_at < cutoff без подзадач
+    копируются в archived_tasks и удаляются из tasks. На Postgres строки берутся FOR UPDATE SKIP LOCKED - правки пользователя
+    не ждут архивацию, а задача, которую сейчас меняют, попадет в следующий запуск.
+    """
+    subtask = aliased(TasksORM)
+    async with session_factory() as session:
+        rows = (await session.execute(
+            select(TasksORM.id_task, TasksORM.updated_at)
+            .where(
+                TasksORM.completed, # как в условии частичного индекса ix_tasks_completed_updated_at
+                TasksORM.updated_at < cutoff,
+                # сначала листья: удаление родителя из tasks каскадом удалило бы его подзадачи
+                ~exists().where(subtask.parent_id == TasksORM.id_task),
+            )
+            .order_by(TasksORM.updated_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not rows:
+            return 0
+
+        ids = [row.id_task for row in rows]
+        if session.get_bind().dialect.name == "postgresql":
+            await _ensure_partitions(session, {_month(row.updated_at) for row in rows})
+        await session.execute(
+            insert(ArchivedTasksORM).from_select(
+                ["id_task", "completed_at", "task_name", "list_id", "created_at"],
+                select(TasksORM.id_task, TasksORM.updated_at, TasksORM.task_name, TasksORM.list_id, TasksORM.created_at)
+                .where(TasksORM.id_task.in_(ids)),
+            )
+        )
+        await untag_tasks(session, ids) # в архив задача уходит без тегов, счетчики тегов - только живые задачи
+        await session.execute(
+            delete(TasksORM).where(TasksORM.id_task.in_(ids)),
+            execution_options={"synchronize_session": False},
+        )
+        await session.commit()
+    ARCHIVED_TASKS.inc(amount=len(ids))
+    return len(ids)
+
+
+@job_queue.handler(ARCHIVE_JOB, concurrency=1, max_attempts=3)
+async def archive_tasks(job: JobContext) -> dict:
+    """
+    Периодический перенос холодных задач порциями по ARCHIVE__BATCH_SIZE.
+    Клиентам синхронизации надгробия не пишутся: задача не удалена, ее видно с include_archived=true.
+    Следующий запуск ставится через ARCHIVE__INTERVAL_SECONDS, в том числе после ошибки.
+    """
+    config = settings.archive
+    cutoff = utcnow() - timedelta(days=config.AFTER_DAYS)
+    archived = 0
+    try:
+        while True:
+            moved = await archive_batch(cutoff, config.BATCH_SIZE)
+            archived += moved
+            await job.progress(tasks_archived=archived)
+            if moved < config.BATCH_SIZE:
+                break
+            await asyncio.sleep(config.PAUSE_MS / 1000) # не забирать базу целиком
+    except Exception:
+        await job_queue.ensure_scheduled(ARCHIVE_JOB, delay=config.INTERVAL_SECONDS)
+        raise
+    await job_queue.ensure_scheduled(ARCHIVE_JOB, delay=config.INTERVAL_SECONDS)
+    return {"tasks_archived": archived}
@@ -0,0 +1,126 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Literal, Sequence
+
+from sqlalchemy import Row
+
+from src.config import settings
+from src.database.crud import exports as exports_crud
+from src.jobs.queue import JobContext, job_queue
+from src.monitoring.metrics import registry
+
+# Выгрузка всех листов и задач пользователя в формате импорта (src/jobs/imports.py):
+# строка листа, затем строки его задач; ref листа - его id, поэтому выгрузку можно загрузить обратно.
+#
+#   GET /me/export?format=csv         -> поток прямо в ответ
+#   POST /me/export?format=ndjson     -> фоновая задача export.file, файл .gz в TRANSFER__DIR
+
+EXPORT_JOB = "export.file"
+
+ExportFormat = Literal["csv", "ndjson"]
+CSV_COLUMNS = ("type", "ref", "title", "description", "list", "id_task", "task_name", "completed", "archived")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+EXPORTED_ROWS = registry.counter(
+    "export_rows_total", "Строки выгрузки аккаунтов: stream - в ответ, file - в файл", ("target",))
+
+
+class RowEncoder:
+    """Порция строк (лист, задача) -> байты формата; помнит последний лист между порциями"""
+
+    def __init__(self, format: ExportFormat):
+        self.format = format
+        self.last_list: int | None = None
+        self.rows = 0
+
+    def header(self) -> bytes:
+        if self.format == "csv":
+            return (",".join(CSV_COLUMNS) + "\r\n").encode()
+        return b""
+
+    def _records(self, partition: Sequence[Row]):
+        for id_list, title, description, id_task, task_name, completed, archived in partition:
+            if id_list != self.last_list:
+                self.last_list = id_list
+                yield {"type": "list", "ref": id_list, "title": title, "description": description}
+            if id_task is not None:
+                yield {
+                    "type": "task", "list": id_list, "id_task": id_task, "task_name": task_name,
+                    "completed": bool(completed), "archived": bool(archived),
+                }
+
+    def encode(self, partition: Sequence[Row]) -> bytes:
+        records = list(self._records(partition))
+        self.rows += len(records)
+        if self.format == "ndjson":
+            return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode()
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, CSV_COLUMNS)
+        for record in records:
+            for key in ("completed", "archived"):
+                if key in record:
+                    record[key] = "true" if record[key] else "false"
+            writer.writerow(record)
+        return buffer.getvalue().encode()
+
+
+async def export_stream(user_id: int, format: ExportFormat) -> AsyncIterator[bytes]:
+    """Выгрузка кусками по TRANSFER__EXPORT_BATCH_SIZE строк базы - по мере чтения курсора"""
+    encoder = RowEncoder(format)
+    header = encoder.header()
+    if header:
+        yield header
+    async for partition in exports_crud.stream_user_rows(user_id, settings.transfer.EXPORT_BATCH_SIZE):
+        chunk = encoder.encode(partition)
+        EXPORTED_ROWS.inc("stream", amount=len(partition))
+        yield chunk
+
+
+def export_path(job_id: int, format: ExportFormat) -> Path:
+    return (settings.transfer.DIR / f"export-{job_id}.{format}.gz").resolve()
+
+
+def remove_expired_exports() -> None:
+    """Готовые файлы живут TRANSFER__EXPORT_KEEP_HOURS, потом удаляются следующей выгрузкой"""
+    deadline = time.time() - settings.transfer.EXPORT_KEEP_HOURS * 3600
+    for path in settings.transfer.DIR.glob("export-*.gz"):
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+@job_queue.handler(EXPORT_JOB, concurrency=2, max_attempts=3)
+async def export_file(job: JobContext) -> dict[str, Any]:
+    """
+    Выгрузка в gzip-файл без удержания HTTP-соединения.
+    Читает по листам порциями по ключу, а не одним курсором: каждая порция - короткая транзакция.
+    Пишется во временный файл, готовый появляется переименованием - повтор просто перезаписывает его.
+    """
+    format: ExportFormat = job.payload["format"]
+    settings.transfer.DIR.mkdir(parents=True, exist_ok=True)
+    await asyncio.to_thread(remove_expired_exports)
+
+    path = export_path(job.id, format)
+    partial = path.with_suffix(".partial")
+    total = await exports_crud.count_user_rows(job.user_id)
+    encoder = RowEncoder(format)
+    try:
+        with gzip.open(partial, "wb", compresslevel=6) as file:
+            await asyncio.to_thread(file.write, encoder.header())
+            async for partition in exports_crud.iter_user_rows(job.user_id, settings.transfer.EXPORT_BATCH_SIZE):
+                # сжатие и запись - в потоке, цикл событий обслуживает запросы
+                await asyncio.to_thread(file.write, encoder.encode(partition))
+                EXPORTED_ROWS.inc("file", amount=len(partition))
+                await job.progress(encoder.rows / total if total else None, rows_exported=encoder.rows)
+        partial.replace(path)
+    finally:
+        partial.unlink(missing_ok=True)
+    return {"rows_exported": encoder.rows, "file_bytes": path.stat().st_size}
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator, Literal
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database.config import session_factory
+from src.database.crud.tasks import last_position
+from src.database.positions import key_between
+from src.database.tables import ListsORM, TasksORM
+from src.database.versioning import next_change_seq
+from src.jobs.queue import JobContext, job_queue
+from src.models.schemas import ListAddSchema, TaskAddSchema
+from src.monitoring.metrics import registry
+
+# Массовый импорт листов и задач из CSV или NDJSON.
+# Строка - лист или задача:
+#   {"type": "list", "ref": "work", "title": "Работа", "description": "..."}
+#   {"type": "task", "list": "work", "task_name": "Отчет", "completed": false}
+#   {"type": "task", "list_id": 12, "task_name": "В существующий лист"}
+# CSV - те же поля колонками: type,ref,title,description,list,list_id,task_name,completed.
+# ref - имя листа внутри файла, задача ссылается на лист, объявленный выше (list), или на существующий (list_id).
+#
+#   POST /me/import?format=csv (тело - файл) -> фоновая задача import.data
+#   python -m src.jobs.imports tasks.csv --email user@example.com
+
+IMPORT_JOB = "import.data"
+
+ImportFormat = Literal["csv", "ndjson"]
+ProgressFunc = Callable[[float, dict[str, Any]], Awaitable[None]]
+
+IMPORTED_ROWS = registry.counter(
+    "import_rows_total", "Строки массового импорта: lists, tasks, invalid", ("kind",))
+
+
+class ImportState:
+    """Состояние одного импорта: ref -> id листа, проверенные листы пользователя, счетчики и ошибки"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.refs: dict[str, int] = {}
+        self.owned: set[int] = set() # id листов, принадлежность которых пользователю уже проверена
+        self.positions: dict[int, str | None] = {} # id листа -> ключ порядка последней задачи
+        self.lists = 0
+        self.tasks = 0
+        self.invalid = 0
+        self.errors: list[str] = []
+
+    def error(self, line: int, message: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < settings.transfer.IMPORT_MAX_ERRORS:
+            self.errors.append(f"строка {line}: {message}")
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "lists_imported": self.lists,
+            "tasks_imported": self.tasks,
+            "rows_invalid": self.invalid,
+            "errors": self.errors,
+        }
+
+
+class PreparedChunk:
+    """Провалидированная порция: (строка, ref, данные) листов и (строка, ref листа, list_id, данные) задач"""
+
+    __slots__ = ("lists", "tasks")
+
+    def __init__(self):
+        self.lists: list[tuple[int, str | None, ListAddSchema]] = []
+        self.tasks: list[tuple[int, str | None, Any, TaskAddSchema]] = []
+
+
+def read_rows(file, format: ImportFormat) -> Iterator[tuple[int, dict[str, Any]]]:
+    """
+    (номер строки, поля) по одной, файл читается построчно - память не зависит от его размера.
+    file - бинарный: его позиция дает прогресс.
+    """
+    lines = (line.decode("utf-8-sig" if number == 0 else "utf-8", errors="replace") for number, line in enumerate(file))
+    if format == "ndjson":
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                row = {"_error": f"невалидный JSON: {error}"}
+            if not isinstance(row, dict):
+                row = {"_error": "строка должна быть JSON-объектом"}
+            yield number, row
+        return
+
+    reader = csv.DictReader(lines) # поля в кавычках с переносами строк собираются в одну запись
+    for row in reader:
+        # пустые ячейки - как отсутствующие поля, лишние ячейки без заголовка (ключ None) отбрасываются
+        yield reader.line_num, {key: value for key, value in row.items() if key is not None and value not in ("", None)}
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc']))}: {item['msg']}" for item in error.errors())
+
+
+def prepare_chunk(rows: Iterator[tuple[int, dict]], size: int, state: ImportState) -> PreparedChunk | None:
+    """Чтение и валидация порции - без обращения к базе, выполняется в потоке. None - файл кончился."""
+    chunk = list(itertools.islice(rows, size))
+    if not chunk:
+        return None
+
+    prepared = PreparedChunk()
+    for line, row in chunk:
+        if "_error" in row:
+            state.error(line, row["_error"])
+            continue
+        try:
+            if row.get("type") == "list":
+                data = ListAddSchema.model_validate({key: row[key] for key in ("title", "description") if key in row})
+                prepared.lists.append((line, row.get("ref"), data))
+            elif row.get("type") == "task":
+                data = TaskAddSchema.model_validate({key: row[key] for key in ("task_name", "completed") if key in row})
+                prepared.tasks.append((line, row.get("list"), row.get("list_id"), data))
+            else:
+                state.error(line, "type должен быть list или task")
+        except ValidationError as error:
+            state.error(line, _validation_message(error))
+    return prepared
+
+
+async def _check_owned(session: AsyncSession, state: ImportState, ids: set[int]) -> None:
+    unknown = ids - state.owned
+    if unknown:
+        query = select(ListsORM.id_list).where(ListsORM.user_id == state.user_id, ListsORM.id_list.in_(unknown))
+        state.owned.update((await session.execute(query)).scalars())
+
+
+async def _insert_tasks(session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    """Postgres - COPY через asyncpg в транзакции сессии, остальные базы - executemany"""
+    if session.get_bind().dialect.name == "postgresql":
+        connection = await (await session.connection()).get_raw_connection()
+        columns = ("task_name", "completed", "list_id", "position", "version")
+        await connection.driver_connection.copy_records_to_table(
+            TasksORM.__tablename__,
+            records=[tuple(row[column] for column in columns) for row in rows],
+            columns=columns,
+        )
+    else:
+        await session.execute(insert(TasksORM.__table__), rows)
+
+
+async def write_chunk(prepared: PreparedChunk, state: ImportState) -> None:
+    """
+    Одна транзакция на порцию: листы с RETURNING (нужны id для ref), затем задачи пачкой.
+    Всем строкам порции - один номер изменения, чтобы /me/sync отдал импорт как обычные изменения.
+    """
+    if not prepared.lists and not prepared.tasks:
+        return
+
+    async with session_factory() as session:
+        version = await session.run_sync(next_change_seq, state.user_id)
+
+        if prepared.lists:
+            query = insert(ListsORM.__table__).returning(ListsORM.__table__.c.id_list, sort_by_parameter_order=True)
+            result = await session.execute(query, [
+                {"title": data.title, "description": data.description, "user_id": state.user_id, "version": version}
+                for _, _, data in prepared.lists
+            ])
+            for (_, ref, _), id_list in zip(prepared.lists, result.scalars()):
+                state.owned.add(id_list)
+                state.positions[id_list] = None
+                if ref is not None:
+                    state.refs[str(ref)] = id_list
+
+        explicit_ids = set()
+        for _, ref, list_id, _ in prepared.tasks:
+            if ref is None and isinstance(list_id, (int, str)) and str(list_id).isdigit():
+                explicit_ids.add(int(list_id))
+        await _check_owned(session, state, explicit_ids)
+
+        rows = []
+        for line, ref, list_id, data in prepared.tasks:
+            if ref is not None:
+                id_list = state.refs.get(str(ref))
+                if id_list is None:
+                    state.error(line, f"лист {ref!r} не объявлен выше в файле")
+                    continue
+            elif list_id is not None:
+                id_list = int(list_id) if str(list_id).isdigit() else None
+                if id_list not in state.owned:
+                    state.error(line, f"лист {list_id!r} не найден")
+                    continue
+            else:
+                state.error(line, "нужен list (ref листа из файла) или list_id")
+                continue
+            if id_list not in state.positions:
+                state.positions[id_list] = await last_position(session, id_list)
+            position = state.positions[id_list] = key_between(state.positions[id_list], None) # в конец листа
+            rows.append({
+                "task_name": data.task_name, "completed": data.completed,
+                "list_id": id_list, "position": position, "version": version,
+            })
+
+        if rows:
+            await _insert_tasks(session, rows)
+        await session.commit()
+
+    state.lists += len(prepared.lists)
+    state.tasks += len(rows)
+    IMPORTED_ROWS.inc("lists", amount=len(prepared.lists))
+    IMPORTED_ROWS.inc("tasks", amount=len(rows))
+
+
+async def import_file(path: Path, user_id: int, format: ImportFormat, on_progress: ProgressFunc) -> dict[str, Any]:
+    """Импорт файла порциями по TRANSFER__IMPORT_CHUNK_SIZE строк, прогресс - доля прочитанных байт"""
+    state = ImportState(user_id)
+    size = path.stat().st_size or 1
+    with path.open("rb") as file:
+        rows = read_rows(file, format)
+        while True:
+            invalid_before = state.invalid
+            prepared = await asyncio.to_thread(prepare_chunk, rows, settings.transfer.IMPORT_CHUNK_SIZE, state)
+            if prepared is None:
+                break
+            await write_chunk(prepared, state)
+            IMPORTED_ROWS.inc("invalid", amount=state.invalid - invalid_before)
+            await on_progress(min(file.tell() / size, 1.0), state.summary())
+    return state.summary()
+
+
+async def save_upload(request: Request, format: ImportFormat) -> Path:
+    """Тело запроса пишется в TRANSFER__DIR по частям, без загрузки в память целиком"""
+    directory = settings.transfer.DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    path = (directory / f"import-{uuid.uuid4().hex}.{format}").resolve()
+    limit = settings.transfer.IMPORT_MAX_SIZE_MB * 1024 * 1024
+    written = 0
+    try:
+        with path.open("wb") as file:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > limit:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                        detail=f"Файл больше {settings.transfer.IMPORT_MAX_SIZE_MB} МБ",
+                    )
+                await asyncio.to_thread(file.write, chunk) # запись на диск - вне цикла событий
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+@job_queue.handler(IMPORT_JOB, concurrency=2, max_attempts=1)
+async def import_job(job: JobContext) -> dict[str, Any]:
+    path = Path(job.payload["path"])
+    if job.result:
+        # порции прошлой попытки уже закоммичены, а соответствие ref -> id потеряно: повтор дал бы дубликаты
+        path.unlink(missing_ok=True)
+        raise RuntimeError(f"Импорт прерван остановкой процесса после {job.result.get('tasks_imported', 0)} задач")
+
+    async def report(progress: float, summary: dict[str, Any]) -> None:
+        await job.progress(progress, **summary)
+
+    try:
+        return await import_file(path, job.user_id, job.payload["format"], report)
+    finally:
+        path.unlink(missing_ok=True)
+
+
+async def _run_cli(args) -> int:
+    from src.database.config import dispose_engine, init_engine
+    from src.database.crud import auth as auth_crud
+
+    init_engine()
+    try:
+        user = await auth_crud.get_user_by_email(args.email)
+        if user is None:
+            print(f"Пользователь {args.email} не найден")
+            return 2
+
+        async def report(progress: float, summary: dict[str, Any]) -> None:
+            print(
+                f"\r{progress:7.1%}  листов {summary['lists_imported']}  задач {summary['tasks_imported']}"
+                f"  ошибок {summary['rows_invalid']}",
+                end="", flush=True,
+            )
+
+        started = time.perf_counter()
+        summary = await import_file(args.file, user.id_user, args.format, report)
+        elapsed = time.perf_counter() - started
+        print(f"\nГотово за {elapsed:.1f} s, {(summary['lists_imported'] + summary['tasks_imported']) / elapsed:.0f} строк/с")
+        for error in summary["errors"]:
+            print(f"  {error}")
+        return 0
+    finally:
+        await dispose_engine()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Массовый импорт листов и задач из CSV или NDJSON")
+    parser.add_argument("file", type=Path)
+    parser.add_argument("--email", required=True, help="пользователь, которому достанутся листы")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="по умолчанию - по расширению файла")
+    args = parser.parse_args(argv)
+    args.format = args.format or ("csv" if args.file.suffix.lower() == ".csv" else "ndjson")
+    return asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
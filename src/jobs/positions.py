@@ -0,0 +1,17 @@
+from src.database.config import session_factory
+from src.database.crud import tasks as tasks_crud
+from src.jobs.queue import JobContext, job_queue
+
+REBALANCE_JOB = "tasks.rebalance"
+
+
+@job_queue.handler(REBALANCE_JOB, concurrency=1, max_attempts=3)
+async def rebalance_positions(job: JobContext) -> dict:
+    """
+    Перенумерация листа, в котором ключ порядка вырос длиннее DB__POSITION_REBALANCE_LENGTH
+    (много переносов в одно и то же место). Одна транзакция, повтор безопасен.
+    """
+    async with session_factory() as session:
+        tasks = await tasks_crud.rebalance_list(job.payload["list_id"], session)
+        await session.commit()
+    return {"tasks_renumbered": tasks}
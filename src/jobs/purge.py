@@ -0,0 +1,138 @@
+import asyncio
+
+from sqlalchemy import delete, func, or_, select, tuple_
+
+from src.config import settings
+from src.database.config import session_factory
+from src.database.crud.tags import untag_tasks
+from src.database.tables import (
+    ArchivedTasksORM,
+    ListMembersORM,
+    ListsORM,
+    SyncTombstonesORM,
+    TagsORM,
+    TasksORM,
+    TaskTagsORM,
+    UsersORM,
+)
+from src.jobs.queue import JobContext, job_queue
+from src.monitoring.metrics import registry
+
+PURGE_JOB = "account.purge"
+
+PURGED_ROWS = registry.counter(
+    "account_purge_rows_total", "Строки, удаленные фоновой очисткой аккаунтов", ("table",))
+
+
+async def _delete_in_chunks(job: JobContext, statement, counter: str | None, table: str) -> None:
+    """
+    Повторяет DELETE порции, пока он удаляет полную порцию.
+    Каждая порция - своя короткая транзакция, после нее сохраняется прогресс.
+    """
+    chunk_size = settings.db.PURGE_CHUNK_SIZE
+    pause = settings.db.PURGE_PAUSE_MS / 1000
+    total = job.result.get("lists_total", 0) + job.result.get("tasks_total", 0)
+    while True:
+        async with session_factory() as session:
+            result = await session.execute(statement, execution_options={"synchronize_session": False})
+            await session.commit()
+        deleted = result.rowcount
+        PURGED_ROWS.inc(table, amount=deleted)
+
+        if counter is not None:
+            job.result[counter] = job.result.get(counter, 0) + deleted
+            done = job.result.get("lists_deleted", 0) + job.result.get("tasks_deleted", 0)
+            await job.progress(done / total if total else None)
+
+        if deleted < chunk_size:
+            return
+        await asyncio.sleep(pause) # чтобы очистка не забирала базу целиком
+
+
+@job_queue.handler(PURGE_JOB, concurrency=1, max_attempts=10)
+async def purge_account(job: JobContext) -> dict:
+    """
+    Очистка удаленного аккаунта (DELETE /me/profile): задачи (и архивные), участники листов, листы, теги, надгробия синхронизации
+    порциями по DB__PURGE_CHUNK_SIZE строк, затем сам пользователь.
+    Безопасна для повтора: каждая порция удаляет то, что еще осталось.
+    """
+    user_id = job.payload["user_id"]
+    chunk_size = settings.db.PURGE_CHUNK_SIZE
+
+    user_lists = select(ListsORM.id_list).where(ListsORM.user_id == user_id)
+    if "lists_total" not in job.result:
+        # знаменатель прогресса - один раз, в первой попытке: повтор считал бы уже остаток
+        async with session_factory() as session:
+            lists_total = await session.scalar(select(func.count()).where(ListsORM.user_id == user_id))
+            tasks_total = await session.scalar(select(func.count()).where(TasksORM.list_id.in_(user_lists)))
+        await job.progress(0.0, lists_total=lists_total, tasks_total=tasks_total)
+    # теги с задач аккаунта снимаются до удаления задач - счетчики тегов участников листов остаются верными
+    while True:
+        async with session_factory() as session:
+            tagged = (await session.execute(
+                select(TaskTagsORM.task_id)
+                .where(TaskTagsORM.task_id.in_(select(TasksORM.id_task).where(TasksORM.list_id.in_(user_lists))))
+                .distinct()
+                .limit(chunk_size)
+            )).scalars().all()
+            if tagged:
+                await untag_tasks(session, tagged)
+            await session.commit()
+        if len(tagged) < chunk_size:
+            break
+        await asyncio.sleep(settings.db.PURGE_PAUSE_MS / 1000)
+
+    await _delete_in_chunks(
+        job,
+        delete(TasksORM).where(TasksORM.id_task.in_(
+            select(TasksORM.id_task).where(TasksORM.list_id.in_(user_lists)).limit(chunk_size)
+        )),
+        "tasks_deleted", "tasks",
+    )
+    await _delete_in_chunks(
+        job,
+        delete(ArchivedTasksORM).where(ArchivedTasksORM.id_task.in_(
+            select(ArchivedTasksORM.id_task).where(ArchivedTasksORM.list_id.in_(user_lists)).limit(chunk_size)
+        )),
+        None, "archived_tasks",
+    )
+    await _delete_in_chunks(
+        job,
+        delete(ListMembersORM).where(tuple_(ListMembersORM.list_id, ListMembersORM.user_id).in_(
+            select(ListMembersORM.list_id, ListMembersORM.user_id).where(or_(
+                ListMembersORM.user_id == user_id, ListMembersORM.list_id.in_(user_lists))).limit(chunk_size)
+        )),
+        None, "list_members",
+    )
+    await _delete_in_chunks(
+        job,
+        delete(ListsORM).where(ListsORM.id_list.in_(user_lists.limit(chunk_size))),
+        "lists_deleted", "lists",
+    )
+    user_tags = select(TagsORM.id_tag).where(TagsORM.user_id == user_id)
+    await _delete_in_chunks(
+        job,
+        delete(TaskTagsORM).where(tuple_(TaskTagsORM.tag_id, TaskTagsORM.task_id).in_(
+            select(TaskTagsORM.tag_id, TaskTagsORM.task_id).where(TaskTagsORM.tag_id.in_(user_tags)).limit(chunk_size)
+        )),
+        None, "task_tags",
+    )
+    await _delete_in_chunks(
+        job,
+        delete(TagsORM).where(TagsORM.id_tag.in_(user_tags.limit(chunk_size))),
+        None, "tags",
+    )
+    await _delete_in_chunks(
+        job,
+        delete(SyncTombstonesORM).where(SyncTombstonesORM.id_tombstone.in_(
+            select(SyncTombstonesORM.id_tombstone).where(SyncTombstonesORM.user_id == user_id).limit(chunk_size)
+        )),
+        None, "sync_tombstones",
+    )
+
+    async with session_factory() as session:
+        await session.execute(
+            delete(UsersORM).where(UsersORM.id_user == user_id, UsersORM.deleted_at.is_not(None))
+        )
+        await session.commit()
+    return {"user_deleted": True}
@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import and_, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database.config import session_factory
+from src.database.tables import JobsORM
+from src.monitoring.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOB_ATTEMPTS = registry.counter(
+    "jobs_attempts_total", "Завершенные попытки фоновых задач (done, retry, failed)", ("type", "status"))
+JOB_DURATION = registry.histogram(
+    "job_duration_seconds", "Время одной попытки фоновой задачи", ("type",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 1800.0))
+JOBS_RUNNING = registry.gauge(
+    "jobs_running", "Фоновые задачи, выполняемые процессом", ("type",))
+
+
+def utcnow() -> datetime:
+    """Время очереди (run_at, heartbeat_at) считается на стороне приложения - одинаково для SQLite и Postgres"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobContext:
+    """Что получает обработчик: данные задачи и способ сообщить прогресс"""
+
+    def __init__(self, job: JobsORM):
+        self.id = job.id_job
+        self.type = job.type
+        self.user_id = job.user_id
+        self.payload: dict[str, Any] = job.payload or {}
+        self.attempt = job.attempts # 1 - первая попытка
+        self.result: dict[str, Any] = dict(job.result or {}) # счетчики прошлой попытки, чтобы продолжить с них
+
+    async def progress(self, value: float | None = None, **result) -> None:
+        """Сохраняет прогресс (0..1) и счетчики в result, заодно обновляет heartbeat"""
+        self.result.update(result)
+        values = {"heartbeat_at": utcnow(), "result": self.result}
+        if value is not None:
+            values["progress"] = min(max(value, 0.0), 1.0)
+        async with session_factory() as session:
+            await session.execute(
+                update(JobsORM)
+                .where(JobsORM.id_job == self.id, JobsORM.status == "running")
+                .values(**values)
+            )
+            await session.commit()
+
+
+JobFunc = Callable[[JobContext], Awaitable[dict[str, Any] | None]]
+
+
+class JobHandler:
+    __slots__ = ("func", "concurrency", "max_attempts")
+
+    def __init__(self, func: JobFunc, concurrency: int, max_attempts: int):
+        self.func = func
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач в таблице jobs, без внешнего брокера.
+
+    Задача ставится enqueue (можно в транзакции вызывающего - тогда она появится только с его коммитом),
+    выполняется одной из JOBS__WORKERS корутин любого процесса приложения.
+    Захват - UPDATE ... WHERE id_job = (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING:
+    на Postgres процессы не ждут чужих блокировок, на SQLite FOR UPDATE не нужен -
+    запись и так одна на всю базу, и UPDATE ... WHERE status = 'pending' берет задачу один раз.
+
+    Ошибка обработчика - повтор с экспоненциальной задержкой до max_attempts, затем failed.
+    Задача, у которой дольше JOBS__STALE_SECONDS нет heartbeat (процесс упал), возвращается в очередь.
+    Одновременно на процесс выполняется не больше concurrency задач одного типа.
+    """
+
+    def __init__(self):
+        self.handlers: dict[str, JobHandler] = {}
+        self.running: dict[str, int] = {} # тип -> выполняется сейчас в этом процессе
+        self.workers: list[asyncio.Task] = []
+        self.wakeup = asyncio.Event()
+        self.claim_lock = asyncio.Lock() # выбор типа со свободным местом и захват - без гонки между корутинами
+        self.reclaimed_at = 0.0
+
+    def handler(self, type: str, concurrency: int = 1, max_attempts: int = 5):
+        """Декоратор обработчика задач типа type"""
+        def register(func: JobFunc) -> JobFunc:
+            self.handlers[type] = JobHandler(func, concurrency, max_attempts)
+            return func
+        return register
+
+    def concurrency(self, type: str) -> int:
+        return settings.jobs.CONCURRENCY.get(type, self.handlers[type].concurrency)
+
+    async def enqueue(
+        self,
+        type: str,
+        payload: dict[str, Any] | None = None,
+        user_id: int | None = None,
+        session: AsyncSession | None = None,
+        delay: float = 0.0,
+    ) -> JobsORM:
+        """
+        Ставит задачу. С session - в транзакции вызывающего (коммит и wake() - за ним),
+        иначе - своей транзакцией.
+        """
+        job = JobsORM(
+            type=type,
+            user_id=user_id,
+            payload=payload or {},
+            max_attempts=self.handlers[type].max_attempts,
+            run_at=utcnow() + timedelta(seconds=delay),
+        )
+        if session is not None:
+            session.add(job)
+            await session.flush()
+            return job
+
+        async with session_factory() as own_session:
+            own_session.add(job)
+            await own_session.commit()
+            await own_session.refresh(job)
+        self.wake()
+        return job
+
+    async def ensure_scheduled(self, type: str, delay: float = 0.0) -> None:
+        """
+        Периодическая задача: ставит следующий запуск, если в очереди еще нет ожидающей задачи этого типа.
+        Процессы, стартовавшие одновременно, могут поставить по задаче - лишние не перезапланируются.
+        """
+        async with session_factory() as session:
+            pending = await session.scalar(
+                select(JobsORM.id_job).where(JobsORM.type == type, JobsORM.status == "pending").limit(1)
+            )
+        if pending is None:
+            await self.enqueue(type, delay=delay)
+
+    def wake(self) -> None:
+        """Сигнал корутинам этого процесса; другие процессы найдут задачу за JOBS__POLL_SECONDS"""
+        self.wakeup.set()
+
+    def start(self) -> None:
+        if self.workers:
+            return
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(settings.jobs.WORKERS)]
+
+    async def stop(self) -> None:
+        """Выполняемые задачи прерываются и возвращаются в очередь без траты попытки"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def _reclaim_stale(self) -> None:
+        """Задачи упавших процессов - обратно в очередь (или в failed, если попытки кончились)"""
+        config = settings.jobs
+        if time.monotonic() - self.reclaimed_at < config.STALE_SECONDS / 4:
+            return
+        self.reclaimed_at = time.monotonic()
+
+        now = utcnow()
+        stale = and_(
+            JobsORM.status == "running",
+            JobsORM.heartbeat_at < now - timedelta(seconds=config.STALE_SECONDS),
+        )
+        async with session_factory() as session:
+            failed = await session.execute(
+                update(JobsORM)
+                .where(stale, JobsORM.attempts >= JobsORM.max_attempts)
+                .values(status="failed", error="Процесс остановился во время выполнения", finished_at=now)
+            )
+            requeued = await session.execute(
+                update(JobsORM).where(stale).values(status="pending", run_at=now)
+            )
+            await session.commit()
+        if failed.rowcount or requeued.rowcount:
+            logger.warning("Брошенные задачи: %d в очередь, %d в failed", requeued.rowcount, failed.rowcount)
+
+    async def _claim(self) -> JobsORM | None:
+        async with self.claim_lock:
+            await self._reclaim_stale()
+            types = [type for type in self.handlers if self.running.get(type, 0) < self.concurrency(type)]
+            if not types:
+                return None
+
+            now = utcnow()
+            ready = (JobsORM.status == "pending", JobsORM.run_at <= now, JobsORM.type.in_(types))
+            candidate = (
+                select(JobsORM.id_job)
+                .where(*ready)
+                .order_by(JobsORM.run_at, JobsORM.id_job)
+                .limit(1)
+                .with_for_update(skip_locked=True) # Postgres; SQLite этот FOR UPDATE не рендерит
+                .scalar_subquery()
+            )
+            async with session_factory() as session:
+                # пустая очередь - частый случай опроса: дешевое чтение вместо UPDATE с блокировками
+                if await session.scalar(select(literal(1)).where(*ready).limit(1)) is None:
+                    return None
+                job = (await session.execute(
+                    update(JobsORM)
+                    .where(JobsORM.id_job == candidate, JobsORM.status == "pending")
+                    .values(status="running", attempts=JobsORM.attempts + 1, heartbeat_at=now)
+                    .returning(JobsORM),
+                    execution_options={"synchronize_session": False},
+                )).scalar_one_or_none()
+                await session.commit()
+
+            if job is not None:
+                self.running[job.type] = self.running.get(job.type, 0) + 1
+            return job
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await self._claim()
+            except Exception:
+                logger.exception("Ошибка захвата фоновой задачи")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), settings.jobs.POLL_SECONDS)
+                except TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+
+            await self._execute(job)
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Пока обработчик работает, задача не считается брошенной, даже если он не сообщает прогресс"""
+        while True:
+            await asyncio.sleep(settings.jobs.STALE_SECONDS / 3)
+            try:
+                async with session_factory() as session:
+                    await session.execute(
+                        update(JobsORM)
+                        .where(JobsORM.id_job == job_id, JobsORM.status == "running")
+                        .values(heartbeat_at=utcnow())
+                    )
+                    await session.commit()
+            except Exception: # сбой одного обновления не должен останавливать heartbeat до конца задачи
+                logger.exception("Ошибка heartbeat фоновой задачи %d", job_id)
+
+    async def _execute(self, job: JobsORM) -> None:
+        handler = self.handlers[job.type]
+        context = JobContext(job)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id_job))
+        JOBS_RUNNING.inc(job.type)
+        started = time.perf_counter()
+        try:
+            result = await handler.func(context)
+        except asyncio.CancelledError:
+            await self._finish(job.id_job, status="pending", attempts=JobsORM.attempts - 1, run_at=utcnow())
+            raise
+        except Exception as error:
+            await self._retry_or_fail(job, error)
+        else:
+            context.result.update(result or {})
+            await self._finish(
+                job.id_job, status="done", progress=1.0, result=context.result, finished_at=utcnow(), error=None)
+            JOB_ATTEMPTS.inc(job.type, "done")
+        finally:
+            heartbeat.cancel()
+            self.running[job.type] -= 1
+            JOBS_RUNNING.dec(job.type)
+            JOB_DURATION.observe(job.type, value=time.perf_counter() - started)
+
+    async def _retry_or_fail(self, job: JobsORM, error: Exception) -> None:
+        config = settings.jobs
+        message = repr(error)[:512]
+        if job.attempts >= job.max_attempts:
+            logger.exception("Задача %d (%s) провалена после %d попыток", job.id_job, job.type, job.attempts)
+            await self._finish(job.id_job, status="failed", error=message, finished_at=utcnow())
+            JOB_ATTEMPTS.inc(job.type, "failed")
+            return
+
+        delay = min(config.RETRY_BASE_SECONDS * 2 ** (job.attempts - 1), config.RETRY_MAX_SECONDS)
+        delay *= random.uniform(0.8, 1.2) # разброс, чтобы упавшие вместе задачи не повторялись вместе
+        logger.warning(
+            "Задача %d (%s), попытка %d: %r, повтор через %.1f s", job.id_job, job.type, job.attempts, error, delay)
+        await self._finish(
+            job.id_job, status="pending", error=message, run_at=utcnow() + timedelta(seconds=delay))
+        JOB_ATTEMPTS.inc(job.type, "retry")
+
+    async def _finish(self, job_id: int, **values) -> None:
+        # shield: при остановке процесса статус должен записаться и после отмены корутины
+        await asyncio.shield(self._update(job_id, values))
+
+    async def _update(self, job_id: int, values: dict) -> None:
+        async with session_factory() as session:
+            await session.execute(
+                update(JobsORM).where(JobsORM.id_job == job_id, JobsORM.status == "running").values(**values)
+            )
+            await session.commit()
+
+
+job_queue = JobQueue()
@@ -1,24 +1,81 @@
+import logging
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
+import src
 from src.api.routers import all_router
+from src.auth import utils as auth_utils
+from src.auth.exceptions import AuthException
+from src.compression import CompressionMiddleware
 from src.config import settings
-from src.database.config import Base, engine
+from src.database.batcher import task_write_batcher
+from src.database.config import Base, dispose_engine, init_engine
+from src.events.broker import broker
+from src.jobs.archive import ARCHIVE_JOB
+from src.jobs.queue import job_queue
+from src.monitoring.metrics import (
+    STARTUP_SECONDS,
+    MetricsMiddleware,
+    auth_exception_handler,
+    instrument_engine,
+    registry,
+)
+from src.monitoring.sql import instrument_sql
+from src.monitoring.timing import TimingMiddleware
+from src.reminders.scheduler import reminder_scheduler
+
+logger = logging.getLogger(__name__)
 
 
 # 1. Декоратор превращает функцию в "контекстный менеджер"
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- ЭТО БЛОК STARTUP (Выполняется один раз при старте) ---
-    async with engine.begin() as conn:
-        # await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+    logger.info("DEBUG MODE IS: %s", settings.app.DEBUG)
+    logger.info("DATABASE URL IS: %s", settings.db.URL)
+    logger.info("TITLE IS: %s", settings.app.TITLE)
+
+    auth_utils.load_keys() # ключи JWT читаются здесь, а не при импорте
+
+    engine = init_engine()
+    instrument_engine(engine) # метрики пула соединений
+    instrument_sql(engine) # время SQL на запрос, медленные запросы, N+1
+
+    if settings.db.CREATE_ALL:
+        async with engine.begin() as conn:
+            # await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    await broker.start() # раздача событий изменений подписчикам SSE/WebSocket
+    registry.start() # снимки метрик для /metrics в режиме нескольких воркеров
+    job_queue.start() # исполнители фоновых задач (таблица jobs)
+    if settings.archive.ENABLED:
+        await job_queue.ensure_scheduled(ARCHIVE_JOB) # перенос выполненных задач в archived_tasks
+    if settings.reminders.ENABLED:
+        reminder_scheduler.start() # напоминания о сроках задач
+
+    if not STARTUP_SECONDS.values: # бюджет - только для первого старта процесса
+        startup = time.perf_counter() - src.STARTED_AT # импорт приложения (или форк воркера) + старт
+        STARTUP_SECONDS.set(value=startup)
+        if startup > settings.app.STARTUP_BUDGET_SECONDS:
+            logger.warning(
+                "Старт занял %.2f s при бюджете %.2f s, см. make import-time",
+                startup, settings.app.STARTUP_BUDGET_SECONDS,
+            )
+        else:
+            logger.info("Старт за %.2f s", startup)
 
     yield # Разделитель. В этой точке FastAPI начинает слушать запросы.
 
     # --- ЭТО БЛОК SHUTDOWN (Выполняется один раз при выключении) ---
-    await engine.dispose() # закрывает каналы связи
+    await reminder_scheduler.stop()
+    await job_queue.stop() # прерванные задачи возвращаются в очередь
+    await task_write_batcher.close() # дописать накопленные записи задач
+    await broker.stop()
+    await registry.stop()
+    await dispose_engine() # закрывает каналы связи
 
 # Подключаем логику к приложению
 app = FastAPI(
@@ -28,4 +85,39 @@ app = FastAPI(
     debug=settings.app.DEBUG,
 )
 
+# последний добавленный middleware - внешний: TimingMiddleware оборачивает MetricsMiddleware,
+# сжатие - внутренний, его время входит в фазы Server-Timing
+app.add_middleware(CompressionMiddleware) # gzip/br/zstd по Accept-Encoding
+app.add_middleware(MetricsMiddleware) # метрики Prometheus для /metrics
+app.add_middleware(TimingMiddleware) # Server-Timing и профилирование запросов
+app.add_exception_handler(AuthException, auth_exception_handler) # счетчик ошибок аутентификации
 app.include_router(all_router)
+
+
+def run() -> None:
+    """
+    Запуск одним процессом: python -m src.main (make app-start).
+    Цикл событий, парсер HTTP, keep-alive, backlog и limit_concurrency - из SERVER__*,
+    пул воркеров - python -m src.server.
+    """
+    import uvicorn
+
+    from src.server import describe_runtime, uvicorn_options
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    options = uvicorn_options()
+    logger.info("Сервер: %s", describe_runtime(options))
+
+    config = settings.server
+    uvicorn.run(
+        # для перезагрузки uvicorn нужна строка импорта, иначе - уже импортированный объект
+        "src.main:app" if config.RELOAD else app,
+        host=config.HOST,
+        port=config.PORT,
+        reload=config.RELOAD,
+        **options,
+    )
+
+
+if __name__ == "__main__":
+    run()
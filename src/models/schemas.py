@@ -1,4 +1,16 @@
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from datetime import date, datetime, timezone
+from typing import Annotated, Any, Literal
+
+from pydantic import AfterValidator, BaseModel, ConfigDict, EmailStr, Field
+
+
+def _to_naive_utc(value: datetime) -> datetime:
+    """Сроки хранятся в UTC без таймзоны (как остальные даты в БД); время без таймзоны считается UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+UtcDatetime = Annotated[datetime, AfterValidator(_to_naive_utc)]
 
 
 # валидация данных pydentic при создании
@@ -17,6 +29,8 @@ class ListAddSchema(BaseModel):
 class TaskAddSchema(BaseModel):
     task_name: str = Field(..., min_length=4, max_length=64)
     completed: bool = Field(default=False)
+    parent_id: int | None = Field(None, ge=1) # подзадача задачи из того же листа
+    due_at: UtcDatetime | None = None # срок; за него придет напоминание
     # list_id: int = Field(..., ge=1) # запрещает 0
 
 # схемы для обновления данных
@@ -50,9 +64,25 @@ class TaskUpdateSchema(TaskAddSchema):
 class TaskPatchSchema(BaseModel):
     task_name: str | None = Field(None, min_length=4, max_length=64)
     completed: bool | None = Field(None)
+    due_at: UtcDatetime | None = None # null - снять срок
     # По умолчанию None. Если в JSON поля нет — будет None. А model_dump(exclude_unset=True) не возьмет Ноне в словарь
     # list_id: int | None = Field(None, ge=1) # запрещает 0
 
+class ListMemberAddSchema(BaseModel):
+    email: EmailStr # пользователь, с которым делятся листом
+    role: Literal["viewer", "editor"] = "viewer"
+    model_config = ConfigDict(extra="forbid")
+
+TagName = Annotated[str, Field(min_length=1, max_length=32, pattern=r"^[^,]+$")] # запятая разделяет теги в ?tags=
+
+class TaskTagsSchema(BaseModel):
+    tags: list[TagName] = Field(..., max_length=20) # полный набор тегов задачи, [] - снять все
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True)
+
+class TaskMoveSchema(BaseModel):
+    after_id: int | None = Field(None, ge=1) # поставить сразу после этой задачи, None - в начало листа
+    parent_id: int | None = Field(None, ge=1) # если передан - перенести вместе с поддеревом под эту задачу (null - в корень)
+
 # схемы для ответа
 class UserResponseSchema(BaseModel):
     id_user: int
@@ -61,6 +91,28 @@ class UserResponseSchema(BaseModel):
 
     model_config=ConfigDict(from_attributes=True)
 
+class UserPageSchema(BaseModel):
+    """Страница поиска пользователей (админка)"""
+    items: list[UserResponseSchema]
+    next_after_id: int | None # after_id следующей страницы, None - страница последняя
+    next_after_email: str | None = None # after_email следующей страницы при поиске по почте
+    total: int | None # None - подсчет не запрашивали
+    total_is_estimate: bool = False # total - оценка планировщика (на SQLite - нижняя граница)
+
+class JobSchema(BaseModel):
+    """Состояние фоновой задачи"""
+    id_job: int
+    type: str
+    status: Literal["pending", "running", "done", "failed"]
+    progress: float # 0..1
+    attempts: int
+    result: dict[str, Any] | None
+    error: str | None
+    created_at: datetime
+    finished_at: datetime | None
+
+    model_config=ConfigDict(from_attributes=True)
+
 class ListResponseSchema(BaseModel):
     id_list: int
     title: str
@@ -71,14 +123,141 @@ class ListResponseSchema(BaseModel):
     # Для каждого поля в схеме (например, id, name) он делает: getattr(db_user, "id"), getattr(db_user, "name").
     model_config=ConfigDict(from_attributes=True)
 
+class ListMemberResponseSchema(BaseModel):
+    id_user: int
+    name: str
+    email: str
+    role: str
+
+class TagResponseSchema(BaseModel):
+    id_tag: int
+    name: str
+    task_count: int
+
+    model_config=ConfigDict(from_attributes=True)
+
 class TaskResponseSchema(BaseModel):
     id_task: int
     task_name: str
     completed: bool
     list_id: int
+    parent_id: int | None = None
+    position: str | None = None # ключ порядка в листе; у архивных нет
+    due_at: datetime | None = None
+    archived: bool = False # задача из archived_tasks (include_archived=true)
 
     model_config=ConfigDict(from_attributes=True)
 
+# статистика (src/stats.py)
+class DistributionSchema(BaseModel):
+    """Распределение значения по листам"""
+    min: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+    mean: float
+
+class ListStatsSchema(BaseModel):
+    list_id: int
+    tasks: int
+    completed: int
+    completion_rate: float
+
+class DailyStatsSchema(BaseModel):
+    day: date # UTC
+    created: int
+    completed: int
+
+class StatsSchema(BaseModel):
+    tasks: int # вместе с архивными
+    completed: int
+    completion_rate: float
+    lists: int # листы, в которых есть задачи
+    tasks_per_list: DistributionSchema
+    completion_rate_per_list: DistributionSchema
+    per_list: list[ListStatsSchema]
+    daily: list[DailyStatsSchema]
+
+# схемы для дельта-синхронизации
+class ListSyncSchema(ListResponseSchema):
+    version: int
+    updated_at: datetime
+
+class TaskTreeSchema(TaskResponseSchema):
+    subtasks: list["TaskTreeSchema"] = []
+
+class TaskSyncSchema(TaskResponseSchema):
+    version: int
+    updated_at: datetime
+
+class TombstoneSchema(BaseModel):
+    entity: Literal["list", "task"]
+    entity_id: int
+    list_id: int | None
+    version: int
+
+    model_config=ConfigDict(from_attributes=True)
+
+class SyncResponseSchema(BaseModel):
+    cursor: str # передать в since при следующей синхронизации: "свой[,лист:номер...]" с номерами совместных листов
+    lists: list[ListSyncSchema]
+    tasks: list[TaskSyncSchema]
+    deleted: list[TombstoneSchema] # удаление листа означает удаление и всех его задач
+
+# схемы для пакетных операций
+# вместо айди можно указать "$имя" - ссылку на объект, созданный ранее в том же батче (поле ref)
+IdOrRef = int | Annotated[str, Field(pattern=r"^\$\w+$")]
+
+class BatchListCreate(BaseModel):
+    op: Literal["list.create"]
+    ref: str | None = Field(None, pattern=r"^\w+$")
+    data: ListAddSchema
+
+class BatchListPatch(BaseModel):
+    op: Literal["list.patch"]
+    id_list: IdOrRef
+    data: ListPatchSchema
+
+class BatchListDelete(BaseModel):
+    op: Literal["list.delete"]
+    id_list: IdOrRef
+
+class BatchTaskCreate(BaseModel):
+    op: Literal["task.create"]
+    ref: str | None = Field(None, pattern=r"^\w+$")
+    id_list: IdOrRef
+    data: TaskAddSchema
+
+class BatchTaskPatch(BaseModel):
+    op: Literal["task.patch"]
+    id_list: IdOrRef
+    id_task: IdOrRef
+    data: TaskPatchSchema
+
+class BatchTaskDelete(BaseModel):
+    op: Literal["task.delete"]
+    id_list: IdOrRef
+    id_task: IdOrRef
+
+BatchOperation = Annotated[
+    BatchListCreate | BatchListPatch | BatchListDelete
+    | BatchTaskCreate | BatchTaskPatch | BatchTaskDelete,
+    Field(discriminator="op"),
+]
+
+class BatchRequestSchema(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=100)
+
+class BatchResultSchema(BaseModel):
+    index: int
+    op: str
+    status_code: int
+    result: dict[str, Any] | None # созданный или измененный объект, None для удаления
+
+class BatchResponseSchema(BaseModel):
+    results: list[BatchResultSchema]
+
 # модель для авторизации
 # ИСПОЛЬЗУЕТСЯ В ДЕМО, актуальная в модуле авторизации
 class UserAuthSchema(BaseModel):
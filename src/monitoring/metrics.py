@@ -0,0 +1,352 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+from fastapi import Request
+from fastapi.exception_handlers import http_exception_handler
+from sqlalchemy import event
+
+from src.auth.exceptions import AuthException
+from src.config import settings
+from src.monitoring.timing import current_timings
+
+logger = logging.getLogger(__name__)
+
+# Метрики в текстовом формате Prometheus без сторонних библиотек.
+# Значения меняются только из потока цикла событий, поэтому обычные словари
+# без блокировок: между await другая корутина не может вклиниться в "+=".
+# Снимок для выдачи тоже снимается в цикле событий, в поток уходит только работа с файлами.
+# Для нескольких воркеров uvicorn каждый процесс пишет свой снимок в
+# MONITORING__METRICS_MULTIPROCESS_DIR/<pid>.json, а /metrics суммирует все снимки.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def snapshot(self) -> list:
+        return [[list(key), value] for key, value in self.values.items()]
+
+    def merge(self, values: dict, snapshot: list) -> None:
+        for key, value in snapshot:
+            key = tuple(key)
+            values[key] = values.get(key, 0.0) + value
+
+    def samples(self, values: dict):
+        for key, value in values.items():
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def set(self, *labels: str, value: float) -> None:
+        """Для коллекторов, которые копируют уже накопленный где-то счетчик"""
+        self.values[labels] = value
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) - amount
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self.values: dict[tuple[str, ...], list[float]] = {} # счетчики по корзинам (не накопительные) + [sum, count]
+
+    def observe(self, *labels: str, value: float) -> None:
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0.0] * (len(self.buckets) + 3)
+        row[bisect.bisect_left(self.buckets, value)] += 1 # последняя корзина - +Inf
+        row[-2] += value
+        row[-1] += 1
+
+    def snapshot(self) -> list:
+        return [[list(key), list(row)] for key, row in self.values.items()]
+
+    def merge(self, values: dict, snapshot: list) -> None:
+        for key, row in snapshot:
+            key = tuple(key)
+            total = values.setdefault(key, [0.0] * len(row))
+            for index, value in enumerate(row):
+                total[index] += value
+
+    def samples(self, values: dict):
+        for key, row in values.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, float("inf")), row):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", {**labels, "le": le}, cumulative
+            yield f"{self.name}_sum", labels, row[-2]
+            yield f"{self.name}_count", labels, row[-1]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+        self.collectors: dict[str, Callable[[], None]] = {}
+        self.writer: asyncio.Task | None = None
+
+    def _register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def register_collector(self, name: str, collector: Callable[[], None]) -> None:
+        """
+        Функция, обновляющая метрики перед выдачей (состояние пула, очереди и т.п.).
+        Повторная регистрация с тем же именем заменяет коллектор (новый движок после перезапуска lifespan).
+        """
+        self.collectors[name] = collector
+
+    def snapshot(self) -> dict:
+        """Копия всех значений. Вызывается в цикле событий, дальше с копией можно работать в потоке."""
+        for collector in self.collectors.values():
+            try:
+                collector()
+            except Exception:
+                logger.exception("Ошибка коллектора метрик %s", collector)
+        return {
+            "pid": os.getpid(),
+            "metrics": {name: metric.snapshot() for name, metric in self.metrics.items()},
+        }
+
+    # --- несколько процессов ---
+
+    @property
+    def multiprocess_dir(self) -> Path | None:
+        return settings.monitoring.METRICS_MULTIPROCESS_DIR
+
+    def _write(self, data: dict) -> None:
+        directory = self.multiprocess_dir
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{data['pid']}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data))
+        tmp_path.replace(path) # атомарная замена: читатель не увидит половину файла
+
+    def _read_all(self, own: dict) -> list[dict]:
+        """Свой снимок (самый свежий) и снимки остальных воркеров"""
+        self._write(own)
+        snapshots = [own]
+        for path in self.multiprocess_dir.glob("*.json"):
+            if path.stem == str(own["pid"]):
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def _merge(self, snapshots: list[dict]) -> dict[str, dict]:
+        merged = {name: {} for name in self.metrics}
+        for data in snapshots:
+            # счетчики умерших воркеров остаются в сумме (они монотонны), а gauge - нет
+            alive = data["pid"] == os.getpid() or _pid_alive(data["pid"])
+            for name, values in data["metrics"].items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.type == "gauge" and not alive):
+                    continue
+                metric.merge(merged[name], values)
+        return merged
+
+    def _format(self, values: dict[str, dict]) -> str:
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for sample_name, labels, value in metric.samples(values[name]):
+                if labels:
+                    label_text = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                    lines.append(f"{sample_name}{{{label_text}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{sample_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    async def render(self) -> str:
+        own = self.snapshot()
+        if self.multiprocess_dir is None:
+            snapshots = [own]
+        else:
+            snapshots = await asyncio.to_thread(self._read_all, own)
+        return self._format(self._merge(snapshots))
+
+    async def _write_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.monitoring.METRICS_FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(self._write, self.snapshot())
+            except OSError:
+                logger.exception("Не удалось записать снимок метрик")
+
+    def start(self) -> None:
+        """Периодическая запись снимка процесса, только в режиме нескольких процессов"""
+        if self.multiprocess_dir is not None and self.writer is None:
+            self.writer = asyncio.create_task(self._write_loop())
+
+    async def stop(self) -> None:
+        if self.writer is not None:
+            self.writer.cancel()
+            self.writer = None
+            await asyncio.to_thread(self._write, self.snapshot())
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Время обработки запроса по шаблону роута", ("method", "route"))
+REQUESTS = registry.counter(
+    "http_requests_total", "Количество ответов по шаблону роута и коду", ("method", "route", "status"))
+IN_FLIGHT = registry.gauge(
+    "http_requests_in_flight", "Запросы в обработке")
+QUERIES_PER_REQUEST = registry.histogram(
+    "db_queries_per_request", "SQL-запросов на один HTTP-запрос", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+POOL_CHECKOUTS = registry.counter(
+    "db_pool_checkouts_total", "Выдачи соединений из пула")
+POOL_CHECKOUT_DURATION = registry.histogram(
+    "db_pool_checkout_duration_seconds", "Сколько соединение было занято до возврата в пул")
+POOL_SIZE = registry.gauge("db_pool_size", "Размер пула соединений")
+POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Соединения, выданные из пула")
+POOL_OVERFLOW = registry.gauge("db_pool_overflow", "Соединения сверх размера пула (QueuePool.overflow, до заполнения пула отрицательно)")
+STARTUP_SECONDS = registry.gauge(
+    "app_startup_seconds", "Время от начала импорта приложения до готовности принимать запросы")
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total", "Обращения к кешам (доля попаданий - hit / (hit + miss))", ("cache", "result"))
+AUTH_FAILURES = registry.counter(
+    "auth_failures_total", "Ошибки аутентификации по классу исключения", ("exception",))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def record_auth_failure(error: AuthException) -> None:
+    AUTH_FAILURES.inc(type(error).__name__)
+
+
+async def auth_exception_handler(request: Request, error: AuthException):
+    """Считает ошибку и отдает стандартный ответ FastAPI для HTTPException"""
+    record_auth_failure(error)
+    return await http_exception_handler(request, error)
+
+
+def instrument_engine(engine) -> None:
+    """Подписка на события пула движка, вызывается один раз при старте"""
+    sync_engine = engine.sync_engine
+    pool = sync_engine.pool
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKOUTS.inc()
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            POOL_CHECKOUT_DURATION.observe(value=time.perf_counter() - started)
+
+    def collect_pool() -> None:
+        # у пулов SQLite (StaticPool и т.п.) нет части методов
+        for gauge, method in ((POOL_SIZE, "size"), (POOL_CHECKED_OUT, "checkedout"), (POOL_OVERFLOW, "overflow")):
+            if hasattr(pool, method):
+                gauge.set(value=getattr(pool, method)())
+
+    registry.register_collector("db_pool", collect_pool)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: запросы в обработке, время и количество SQL по шаблону роута.
+    Шаблон (/me/todo_lists/{id_list}/tasks) FastAPI кладет в scope["route"] при маршрутизации,
+    поэтому число временных рядов не растет от айди в пути.
+    Должна стоять внутри TimingMiddleware, чтобы видеть счетчик запросов к базе (sql.instrument_sql).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", "<unmatched>")
+            method = scope["method"]
+            REQUEST_LATENCY.observe(method, template, value=time.perf_counter() - started)
+            REQUESTS.inc(method, template, str(status_code))
+            timings = current_timings()
+            if timings is not None:
+                QUERIES_PER_REQUEST.observe(template, value=timings.queries)
@@ -0,0 +1,106 @@
+import logging
+import re
+import time
+
+from sqlalchemy import event
+
+from src.config import settings
+from src.monitoring.metrics import registry
+from src.monitoring.timing import current_timings
+
+logger = logging.getLogger(__name__)
+
+QUERY_DURATION = registry.histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+SLOW_QUERIES = registry.counter(
+    "db_slow_queries_total", "SQL-запросы дольше MONITORING__SLOW_QUERY_MS")
+N_PLUS_ONE = registry.counter(
+    "db_n_plus_one_total", "Запросы с повторами одной формы SQL выше порога (только в DEBUG)", ("route",))
+
+QUERY_STARTED_KEY = "query_started" # ключ в conn.info со стеком времени начала запросов
+
+# "$1, $2, $3" и "?, ?, ?" от IN (...) разной длины сводятся к одной форме
+_PARAMS_LIST = re.compile(r"(?:\$\d+|\?)(?:\s*,\s*(?:\$\d+|\?))+")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    return _SPACES.sub(" ", _PARAMS_LIST.sub("?, ...", statement)).strip()
+
+
+def _truncate(value, limit: int = 500) -> str:
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+def _describe(parameters, executemany: bool = False) -> str:
+    """Параметры без значений: количество и типы (в значениях могут быть email, хеши паролей, токены)"""
+    if executemany and parameters:
+        return f"{len(parameters)} наборов по {_describe(parameters[0])}"
+    if isinstance(parameters, dict):
+        parameters = list(parameters.values())
+    if not isinstance(parameters, (list, tuple)):
+        return type(parameters).__name__
+    text = f"{len(parameters)}: " + ", ".join(type(value).__name__ for value in parameters)
+    return text if len(text) <= 500 else text[:500] + "..."
+
+
+def instrument_sql(engine) -> None:
+    """
+    Хуки курсора движка:
+    - количество и время SQL на запрос (фаза sql в Server-Timing, метрики);
+    - лог запросов дольше MONITORING__SLOW_QUERY_MS с роутом и типами параметров
+      (значения - только с MONITORING__SLOW_QUERY_LOG_PARAMS);
+    - в DEBUG - предупреждение, когда один запрос выполняет одну и ту же форму SQL
+      больше MONITORING__N_PLUS_ONE_THRESHOLD раз (ленивые user_lists/all_tasks в цикле).
+    Вызывается один раз при старте.
+    """
+    sync_engine = engine.sync_engine
+    config = settings.monitoring
+    slow_seconds = config.SLOW_QUERY_MS / 1000
+    log_values = config.SLOW_QUERY_LOG_PARAMS
+    detect_n_plus_one = settings.app.DEBUG
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(QUERY_STARTED_KEY, []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info[QUERY_STARTED_KEY].pop()
+        QUERY_DURATION.observe(value=elapsed)
+
+        # хуки выполняются в гринлете SQLAlchemy с контекстом вызывающей корутины
+        timings = current_timings()
+        if timings is not None:
+            timings.queries += 1
+            timings.add("sql", elapsed)
+
+        if elapsed >= slow_seconds:
+            SLOW_QUERIES.inc()
+            logger.warning(
+                "Медленный запрос %.1f ms, роут %s: %s; параметры %s",
+                elapsed * 1000,
+                timings.route if timings is not None else "-",
+                _SPACES.sub(" ", statement).strip(),
+                _truncate(parameters) if log_values else _describe(parameters, executemany),
+            )
+
+        if detect_n_plus_one and timings is not None:
+            shape = statement_shape(statement)
+            count = timings.statements.get(shape, 0) + 1
+            timings.statements[shape] = count
+            if count == config.N_PLUS_ONE_THRESHOLD + 1: # одно предупреждение на форму в запросе
+                N_PLUS_ONE.inc(timings.route)
+                logger.warning(
+                    "Возможный N+1: роут %s выполнил запрос больше %d раз: %s",
+                    timings.route, config.N_PLUS_ONE_THRESHOLD, shape,
+                )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # after_cursor_execute не вызывается при ошибке, стек времени надо выровнять
+        connection = exception_context.connection
+        if connection is not None and connection.info.get(QUERY_STARTED_KEY):
+            connection.info[QUERY_STARTED_KEY].pop()
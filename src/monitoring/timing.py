@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import hmac
+import inspect
+import logging
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+
+from src.config import settings
+
+# опциональная зависимость: uv sync --extra profiling
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    """
+    Фазы одного запроса в секундах. Одноименные фазы суммируются,
+    вложенные входят и в свою фазу, и в объемлющую (db внутри principal).
+    """
+
+    __slots__ = ("scope", "started", "phases", "endpoint_done", "queries", "statements")
+
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope or {}
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.endpoint_done: float | None = None # момент возврата из эндпоинта (TimedRoute)
+        self.queries = 0 # SQL-запросов за время запроса (считает sql.instrument_sql)
+        self.statements: dict[str, int] = {} # форма запроса -> сколько раз выполнен (только в DEBUG)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @property
+    def route(self) -> str:
+        """Шаблон роута, если маршрутизация уже прошла, иначе путь запроса"""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+_current_timings: ContextVar[RequestTimings | None] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> RequestTimings | None:
+    return _current_timings.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Замер фазы текущего запроса. Вне запроса (скрипты, фоновые задачи) ничего не делает."""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def _mark_endpoint_done() -> None:
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.endpoint_done = time.perf_counter()
+
+
+def _timed_endpoint(endpoint):
+    # functools.wraps сохраняет сигнатуру (__wrapped__) - FastAPI видит те же параметры и зависимости
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark_endpoint_done()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Роут, отмечающий момент возврата из эндпоинта.
+    Время от него до начала ответа - фаза serialize (валидация response_model и JSON).
+    Подключается через APIRouter(route_class=TimedRoute).
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+def format_server_timing(timings: RequestTimings) -> str:
+    entries = []
+    for name, seconds in timings.phases.items():
+        entry = f"{name};dur={seconds * 1000:.2f}"
+        if name == "sql":
+            entry += f';desc="{timings.queries} queries"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+def _profile_path(method: str, path: str) -> str:
+    slug = re.sub(r"[^\w-]+", "_", path.strip("/")) or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}-{method}-{slug}.html"
+
+
+def _write_profile(profiler, filename: str) -> None:
+    directory = settings.monitoring.PROFILE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / filename).write_text(profiler.output_html())
+
+
+class TimingMiddleware:
+    """
+    ASGI-middleware: на каждый HTTP-запрос заводит RequestTimings,
+    отдает фазы в заголовке Server-Timing и пишет лог-запись с теми же полями.
+
+    Профилирование (pyinstrument): для доли запросов PROFILE_SAMPLE_RATE
+    или по заголовку X-Profile со значением PROFILE_TOKEN.
+    HTML-отчеты пишутся в PROFILE_DIR.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.config = settings.monitoring
+        if Profiler is None and (self.config.PROFILE_SAMPLE_RATE > 0 or self.config.PROFILE_TOKEN):
+            logger.warning("Профилирование включено, но pyinstrument не установлен")
+
+    def _should_profile(self, scope) -> bool:
+        if Profiler is None:
+            return False
+        token = self.config.PROFILE_TOKEN
+        if token:
+            for key, value in scope["headers"]:
+                if key == b"x-profile" and hmac.compare_digest(value, token.encode()):
+                    return True
+        return random.random() < self.config.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope)
+        context_token = _current_timings.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                now = time.perf_counter()
+                if timings.endpoint_done is not None:
+                    timings.add("serialize", now - timings.endpoint_done)
+                timings.add("app", now - timings.started) # до начала ответа, тело еще не отправлено
+                if self.config.SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", format_server_timing(timings).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = None
+        if self._should_profile(scope):
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_timings.reset(context_token)
+            total = time.perf_counter() - timings.started
+            logger.info(
+                "%s %s %d %.2f ms %s",
+                scope["method"], scope["path"], status_code, total * 1000,
+                format_server_timing(timings),
+                extra={
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status_code": status_code,
+                    "total_ms": round(total * 1000, 3),
+                    "queries": timings.queries,
+                    "phases_ms": {name: round(seconds * 1000, 3) for name, seconds in timings.phases.items()},
+                },
+            )
+
+            if profiler is not None:
+                profiler.stop()
+                # рендер HTML и запись файла - не в цикле событий
+                await asyncio.to_thread(_write_profile, profiler, _profile_path(scope["method"], scope["path"]))
@@ -0,0 +1,69 @@
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+
+from src.events.broker import broker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Reminder:
+    id_task: int
+    user_id: int
+    list_id: int
+    task_name: str
+    due_at: datetime # UTC без таймзоны, как в БД
+
+
+class Notifier(ABC):
+    """
+    Способ доставки напоминаний (REMINDERS__NOTIFIER).
+    Исключение из send - напоминание не доставлено, планировщик вернет его в очередь.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def send(self, reminder: Reminder) -> None:
+        ...
+
+
+class EventNotifier(Notifier):
+    """Событие task.reminder пользователю - приходит в открытые SSE/WebSocket клиента"""
+
+    name = "events"
+
+    async def send(self, reminder: Reminder) -> None:
+        broker.publish(reminder.user_id, "task.reminder", {
+            "id_task": reminder.id_task,
+            "list_id": reminder.list_id,
+            "task_name": reminder.task_name,
+            "due_at": reminder.due_at.isoformat(),
+        })
+
+
+class LogNotifier(Notifier):
+    name = "log"
+
+    async def send(self, reminder: Reminder) -> None:
+        logger.info("Напоминание: задача %d пользователя %d, срок %s",
+                    reminder.id_task, reminder.user_id, reminder.due_at.isoformat())
+
+
+class MemoryNotifier(Notifier):
+    """Для проверок и локального запуска: напоминания складываются в список sent"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.sent: list[Reminder] = []
+
+    async def send(self, reminder: Reminder) -> None:
+        self.sent.append(reminder)
+
+
+NOTIFIERS: dict[str, type[Notifier]] = {
+    cls.name: cls for cls in (EventNotifier, LogNotifier, MemoryNotifier)
+}
@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from src.config import settings
+from src.database.config import session_factory
+from src.database.tables import ListMembersORM, ListsORM, TasksORM
+from src.events.broker import Event, broker
+from src.jobs.queue import utcnow
+from src.monitoring.metrics import registry
+from src.reminders.notifiers import NOTIFIERS, Notifier, Reminder
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_SENT = registry.counter(
+    "reminders_sent_total", "Доставленные напоминания о сроках задач", ("notifier",))
+REMINDERS_FAILED = registry.counter(
+    "reminders_failed_total", "Напоминания, которые не удалось доставить (вернутся в очередь)", ("notifier",))
+REMINDER_LAG = registry.histogram(
+    "reminder_lag_seconds", "Задержка доставки напоминания относительно срока задачи",
+    buckets=(0.05, 0.25, 1.0, 5.0, 30.0, 60.0, 300.0, 3600.0))
+REMINDERS_SCHEDULED = registry.gauge(
+    "reminders_scheduled", "Сроки, загруженные в память планировщика")
+
+
+class ReminderScheduler:
+    """
+    Напоминания о сроках задач внутри процесса приложения, без отдельного сервиса.
+
+    В памяти только ближайшее окно: куча (due_at, id_task) невыполненных задач без напоминания
+    со сроком до horizon (не дальше REMINDERS__WINDOW_SECONDS и не больше REMINDERS__BATCH_SIZE штук).
+    Окно перечитывается раз в REMINDERS__REFILL_SECONDS и когда время доходит до horizon -
+    диапазоном частичного индекса ix_tasks_due_at_unreminded, поэтому миллионы далеких сроков
+    не занимают ни память, ни время. Сроки, заданные между перечитываниями, приходят
+    событиями task.created/task.patched (от всех воркеров при EVENTS__BACKEND=postgres).
+
+    Напоминание захватывается UPDATE ... SET reminded_at WHERE reminded_at IS NULL:
+    воркеры держат одно окно, но каждое напоминание уходит один раз.
+    Напоминание получают владелец листа и все его участники.
+    Не доставленное никому напоминание снимает отметку и повторится при следующем перечитывании.
+    """
+
+    def __init__(self):
+        self.heap: list[tuple[datetime, int]] = []
+        self.horizon = datetime.min # в куче все задачи со сроком раньше horizon
+        self.refill_at = datetime.min
+        self.refilling: list[tuple[datetime, int]] | None = None # сроки, пришедшие во время перечитывания
+        self.last_event: tuple[datetime, int] | None = None # событие листа приходит подряд каждому получателю
+        self.notifier: Notifier | None = None
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def start(self, notifier: Notifier | None = None) -> None:
+        if self.task is not None:
+            return
+        self.notifier = notifier or NOTIFIERS[settings.reminders.NOTIFIER]()
+        self.heap, self.horizon, self.refill_at = [], datetime.min, datetime.min
+        broker.listen(self._on_event)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is None:
+            return
+        broker.listeners.remove(self._on_event)
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    def schedule(self, id_task: int, due_at: datetime) -> None:
+        """Новый срок задачи: в кучу, если он попадает в загруженное окно"""
+        if self.refilling is not None:
+            self.refilling.append((due_at, id_task))
+        if due_at >= self.horizon:
+            return # загрузится перечитыванием
+        if len(self.heap) >= settings.reminders.BATCH_SIZE:
+            self.horizon = due_at # окно сужается: этот и более поздние сроки - при перечитывании
+            return
+        heapq.heappush(self.heap, (due_at, id_task))
+        self.wakeup.set()
+
+    def _on_event(self, event: Event) -> None:
+        if event.type not in ("task.created", "task.patched"):
+            return
+        due_at = event.data.get("due_at")
+        if due_at is None or event.data.get("completed"):
+            return
+        key = (datetime.fromisoformat(due_at), event.data["id_task"])
+        if key == self.last_event:
+            return # та же задача для другого участника листа
+        self.last_event = key
+        self.schedule(key[1], key[0])
+
+    async def refill(self) -> None:
+        """Загружает ближайшие сроки заново: одна выборка по индексу, уже упорядоченная - готовая куча"""
+        config = settings.reminders
+        now = utcnow()
+        until = now + timedelta(seconds=config.WINDOW_SECONDS)
+        self.refilling = []
+        try:
+            async with session_factory() as session:
+                rows = (await session.execute(
+                    select(TasksORM.due_at, TasksORM.id_task)
+                    .where(
+                        ~TasksORM.completed, # условие частичного индекса ix_tasks_due_at_unreminded
+                        TasksORM.reminded_at.is_(None),
+                        TasksORM.due_at.is_not(None),
+                        TasksORM.due_at < until)
+                    .order_by(TasksORM.due_at)
+                    .limit(config.BATCH_SIZE)
+                )).all()
+            self.heap = [(row.due_at, row.id_task) for row in rows]
+            self.horizon = rows[-1].due_at if len(rows) == config.BATCH_SIZE else until
+            # сроки, закоммиченные после выборки, могли в нее не попасть
+            late = [entry for entry in self.refilling if entry[0] < self.horizon]
+            if late:
+                self.heap.extend(late)
+                heapq.heapify(self.heap)
+        finally:
+            self.refilling = None
+        self.refill_at = now + timedelta(seconds=config.REFILL_SECONDS)
+        REMINDERS_SCHEDULED.set(value=len(self.heap))
+
+    async def fire(self, ids: list[int]) -> int:
+        """Захватывает и доставляет напоминания; задачи, у которых срок сдвинули или уже напомнили, пропускаются"""
+        now = utcnow()
+        async with session_factory() as session:
+            claimed = (await session.execute(
+                update(TasksORM)
+                .where(
+                    TasksORM.id_task.in_(ids),
+                    ~TasksORM.completed,
+                    TasksORM.reminded_at.is_(None),
+                    TasksORM.due_at <= now)
+                .values(reminded_at=now, updated_at=TasksORM.updated_at) # служебная отметка, не правка задачи
+                .returning(TasksORM.id_task, TasksORM.list_id, TasksORM.task_name, TasksORM.due_at),
+                execution_options={"synchronize_session": False},
+            )).all()
+            recipients: dict[int, set[int]] = {} # лист -> владелец и участники
+            if claimed:
+                list_ids = {row.list_id for row in claimed}
+                query = select(ListsORM.id_list, ListsORM.user_id).where(ListsORM.id_list.in_(list_ids)).union_all(
+                    select(ListMembersORM.list_id, ListMembersORM.user_id).where(ListMembersORM.list_id.in_(list_ids)))
+                for id_list, id_user in (await session.execute(query)).all():
+                    recipients.setdefault(id_list, set()).add(id_user)
+            await session.commit()
+
+        failed = []
+        for row in claimed:
+            delivered = 0
+            for id_user in sorted(recipients.get(row.list_id, ())):
+                reminder = Reminder(row.id_task, id_user, row.list_id, row.task_name, row.due_at)
+                try:
+                    await self.notifier.send(reminder)
+                except Exception:
+                    logger.exception("Напоминание о задаче %d пользователю %d не доставлено", row.id_task, id_user)
+                    REMINDERS_FAILED.inc(self.notifier.name)
+                    continue
+                delivered += 1
+                REMINDERS_SENT.inc(self.notifier.name)
+            if not delivered:
+                # повтор - только если не дошло никому: иначе получившие напоминание получили бы его дважды
+                failed.append(row.id_task)
+                continue
+            REMINDER_LAG.observe(value=(utcnow() - row.due_at).total_seconds())
+
+        if failed:
+            async with session_factory() as session:
+                await session.execute(
+                    update(TasksORM)
+                    .where(TasksORM.id_task.in_(failed))
+                    .values(reminded_at=None, updated_at=TasksORM.updated_at),
+                    execution_options={"synchronize_session": False},
+                )
+                await session.commit()
+        return len(claimed) - len(failed)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = utcnow()
+                if now >= self.refill_at or now >= self.horizon:
+                    await self.refill()
+                    now = utcnow()
+                due = []
+                while self.heap and self.heap[0][0] <= now:
+                    due.append(heapq.heappop(self.heap)[1])
+                if due:
+                    await self.fire(due)
+                    continue
+            except Exception:
+                logger.exception("Ошибка планировщика напоминаний")
+                self.refill_at = datetime.min # невыбранные сроки загрузятся заново
+                await asyncio.sleep(settings.reminders.REFILL_SECONDS)
+                continue
+
+            next_at = min(self.refill_at, self.horizon, self.heap[0][0] if self.heap else self.horizon)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max((next_at - utcnow()).total_seconds(), 0))
+            except TimeoutError:
+                pass
+            self.wakeup.clear()
+
+
+reminder_scheduler = ReminderScheduler()
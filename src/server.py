@@ -0,0 +1,245 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import src
+from src.config import settings
+
+logger = logging.getLogger("src.server")
+
+# Боевой запуск: python -m src.server
+# Мастер-процесс один раз импортирует приложение и загружает ключи, открывает сокет
+# и форкает воркеры. Воркеры наследуют загруженные модули и разобранные ключи
+# (copy-on-write), а движок БД каждый создает сам в lifespan уже после форка -
+# соединения пула нельзя делить между процессами.
+
+
+def worker_count() -> int:
+    return settings.server.WORKERS or os.cpu_count() or 1
+
+
+def resolve_loop(loop: str) -> str:
+    """auto -> uvloop, если установлен, иначе asyncio"""
+    if loop != "auto":
+        return loop
+    if sys.platform != "win32" and importlib.util.find_spec("uvloop") is not None:
+        return "uvloop"
+    return "asyncio"
+
+
+def resolve_http(http: str) -> str:
+    """auto -> httptools, если установлен, иначе h11"""
+    if http != "auto":
+        return http
+    return "httptools" if importlib.util.find_spec("httptools") is not None else "h11"
+
+
+def uvicorn_options() -> dict:
+    """
+    Параметры uvicorn.Config из настроек SERVER__*, общие для src.server и src.main.run.
+    auto раскрывается заранее, чтобы в лог попал реальный выбор.
+    """
+    config = settings.server
+    return {
+        "loop": resolve_loop(config.LOOP),
+        "http": resolve_http(config.HTTP),
+        "timeout_keep_alive": config.KEEP_ALIVE,
+        "backlog": config.BACKLOG,
+        "limit_concurrency": config.LIMIT_CONCURRENCY or None,
+        "timeout_graceful_shutdown": config.GRACEFUL_TIMEOUT,
+        "proxy_headers": True,
+    }
+
+
+def describe_runtime(options: dict) -> str:
+    return (
+        f"loop={options['loop']} http={options['http']} keep-alive={options['timeout_keep_alive']}s"
+        f" backlog={options['backlog']} limit_concurrency={options['limit_concurrency'] or '-'}"
+    )
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Один слушающий сокет на всех воркеров: ядро само раздает им соединения"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload():
+    """Все, что неизменно и одинаково у воркеров, делается до форка"""
+    from src.auth import utils as auth_utils
+    from src.database.config import create_schema
+    from src.main import app
+
+    auth_utils.load_keys()
+    if settings.db.CREATE_ALL:
+        asyncio.run(create_schema())
+        settings.db.CREATE_ALL = False # схема уже создана, воркерам не нужно
+    return app
+
+
+def prepare_multiprocess_metrics(workers: int) -> None:
+    """У каждого воркера свои счетчики: /metrics должен суммировать снимки всех процессов"""
+    directory = settings.monitoring.METRICS_MULTIPROCESS_DIR
+    if directory is None:
+        if workers == 1:
+            return
+        directory = Path(tempfile.mkdtemp(prefix="todo-metrics-"))
+        settings.monitoring.METRICS_MULTIPROCESS_DIR = directory # воркеры унаследуют настройку при форке
+    # снимки прошлого запуска не должны попасть в сумму
+    for path in directory.glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+class Supervisor:
+    """
+    Держит WORKERS воркеров: перезапускает упавшие и отработавшие MAX_REQUESTS,
+    по SIGTERM/SIGINT останавливает всех с ожиданием GRACEFUL_TIMEOUT,
+    по SIGHUP по очереди заменяет всех воркеров новыми.
+    """
+
+    def __init__(self, app, sock: socket.socket):
+        self.app = app
+        self.sock = sock
+        self.config = settings.server
+        self.workers: dict[int, float] = {} # pid -> время запуска
+        self.stopping = False
+        self.recycle = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.monotonic()
+            return
+
+        # --- воркер ---
+        src.STARTED_AT = time.perf_counter() # бюджет старта воркера - от форка, импорт уже был в мастере
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        code = 0
+        try:
+            self.serve()
+        except SystemExit as error: # uvicorn выходит через sys.exit, например при ошибке lifespan
+            code = error.code if isinstance(error.code, int) else 1
+        except BaseException:
+            logger.exception("Воркер %d упал", os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+
+    def serve(self) -> None:
+        import uvicorn
+
+        max_requests = None
+        if self.config.MAX_REQUESTS:
+            # разброс, чтобы воркеры не перезапускались одновременно
+            max_requests = self.config.MAX_REQUESTS + random.randint(0, self.config.MAX_REQUESTS_JITTER)
+
+        server = uvicorn.Server(uvicorn.Config(
+            self.app,
+            lifespan="on",
+            limit_max_requests=max_requests,
+            **uvicorn_options(),
+        ))
+        server.run(sockets=[self.sock])
+
+    def _handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _handle_recycle(self, signum, frame) -> None:
+        self.recycle = True
+
+    def reap(self) -> None:
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                return
+            if pid == 0:
+                return
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if not self.stopping:
+                logger.info("Воркер %d завершился (код %d)", pid, code)
+                if code > 0 and time.monotonic() - started < 1:
+                    time.sleep(1) # воркер падает при старте - не крутить fork в цикле
+
+    def recycle_workers(self) -> None:
+        """Замена воркеров: на каждого старого запускается новый, старый плавно останавливается по SIGTERM"""
+        self.recycle = False
+        for pid in list(self.workers):
+            self.spawn()
+            os.kill(pid, signal.SIGTERM)
+
+    def stop(self) -> None:
+        logger.info("Остановка воркеров, ожидание до %.0f s", self.config.GRACEFUL_TIMEOUT)
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.config.GRACEFUL_TIMEOUT + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in self.workers:
+            logger.warning("Воркер %d не остановился, SIGKILL", pid)
+            os.kill(pid, signal.SIGKILL)
+        for pid in list(self.workers):
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_recycle)
+
+        logger.info(
+            "Мастер %d: %d воркеров на %s:%d, %s",
+            os.getpid(), worker_count(), self.config.HOST, self.config.PORT,
+            describe_runtime(uvicorn_options()),
+        )
+        while not self.stopping:
+            self.reap()
+            if self.recycle:
+                self.recycle_workers()
+            while len(self.workers) < worker_count() and not self.stopping:
+                self.spawn()
+            time.sleep(0.2)
+
+        self.stop()
+        self.sock.close()
+
+
+def main() -> int:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s",
+    )
+    if worker_count() > 1 and settings.events.BACKEND == "memory":
+        logger.warning("EVENTS__BACKEND=memory: события SSE/WebSocket не будут доходить между воркерами")
+    prepare_multiprocess_metrics(worker_count())
+
+    sock = bind_socket(settings.server.HOST, settings.server.PORT, settings.server.BACKLOG)
+    app = preload()
+    Supervisor(app, sock).run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+from itertools import chain
+from typing import Any, Iterable, NamedTuple, Sequence
+
+import numpy as np
+
+# Статистика по задачам: столбцы задач читаются из базы порциями прямо в массивы NumPy
+# (src/database/crud/stats.py), все агрегаты - векторные операции над массивами без циклов по строкам.
+# Даты приходят из базы уже днями от эпохи (целые), поэтому datetime-объекты не создаются вовсе.
+
+COLUMNS = 4 # list_id, completed (0/1), created_day, completed_day (-1 у невыполненных)
+# счетчики по листам - массивом по id, если он не больше DENSE_IDS_PER_TASK * число задач (или DENSE_IDS_MIN)
+DENSE_IDS_PER_TASK = 4
+DENSE_IDS_MIN = 1 << 16
+
+
+class TaskColumns(NamedTuple):
+    list_id: np.ndarray # int64
+    completed: np.ndarray # bool
+    created_day: np.ndarray # int64, дни от 1970-01-01 (UTC)
+    completed_day: np.ndarray # int64, -1 у невыполненных
+
+
+def rows_to_array(rows: Sequence[Sequence[int]]) -> np.ndarray:
+    """
+    Порция строк из COLUMNS целых -> массив (COLUMNS, n): каждый столбец подряд в памяти.
+    np.fromiter по сплошному потоку значений в разы быстрее np.array(rows):
+    тот разбирает каждую строку SQLAlchemy как произвольную последовательность.
+    Транспонируется порция, пока она в кеше процессора, а не весь массив в конце.
+    """
+    values = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * COLUMNS)
+    return np.ascontiguousarray(values.reshape(-1, COLUMNS).T)
+
+
+def to_columns(chunks: Iterable[np.ndarray]) -> TaskColumns:
+    chunks = list(chunks)
+    data = np.concatenate(chunks, axis=1) if chunks else np.empty((COLUMNS, 0), dtype=np.int64)
+    list_id, completed, created_day, completed_day = data
+    return TaskColumns(list_id, completed.astype(bool), created_day, completed_day)
+
+
+def _distribution(values: np.ndarray) -> dict[str, float]:
+    if not len(values):
+        return {"min": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0, "mean": 0.0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "min": float(values.min()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+    }
+
+
+def _daily(days_column: np.ndarray, start: int, days: int) -> np.ndarray:
+    """Число событий по дням [start, start + days); дни вне окна (и -1) отбрасываются"""
+    # все, что раньше окна, - в корзину 0, позже - в days + 1: один проход clip вместо маски и выборки
+    offset = np.clip(days_column - (start - 1), 0, days + 1)
+    return np.bincount(offset, minlength=days + 2)[1:days + 1]
+
+
+def summarize(columns: TaskColumns, today: int, days: int = 30, top: int | None = None) -> dict[str, Any]:
+    """
+    Сводка для StatsSchema. today - текущий день от эпохи, ряд по дням - последние days дней включая today.
+    top (от 1) - только top крупнейших листов в per_list (None - все листы по возрастанию id).
+    """
+    tasks = len(columns.list_id)
+    completed = int(np.count_nonzero(columns.completed))
+
+    if tasks and columns.list_id.max() <= max(DENSE_IDS_PER_TASK * tasks, DENSE_IDS_MIN):
+        # id листов плотные: счетчики прямо по id, без сортировки; пустые id затем отбрасываются
+        per_list_tasks = np.bincount(columns.list_id)
+        per_list_completed = np.bincount(columns.list_id[columns.completed], minlength=len(per_list_tasks))
+        lists = np.flatnonzero(per_list_tasks)
+        per_list_tasks, per_list_completed = per_list_tasks[lists], per_list_completed[lists]
+    else:
+        # редкие большие id: np.unique сортирует их, inverse - номер листа каждой задачи
+        lists, inverse = np.unique(columns.list_id, return_inverse=True)
+        per_list_tasks = np.bincount(inverse, minlength=len(lists))
+        per_list_completed = np.bincount(inverse[columns.completed], minlength=len(lists))
+    per_list_rate = per_list_completed / np.maximum(per_list_tasks, 1)
+
+    if top is not None and top < len(lists):
+        picked = np.argpartition(-per_list_tasks, top - 1)[:top] # top крупнейших без полной сортировки
+        picked = picked[np.lexsort((lists[picked], -per_list_tasks[picked]))] # по числу задач, при равенстве по id
+    else:
+        picked = slice(None)
+
+    start = today - days + 1
+    dates = np.arange(start, start + days).astype("datetime64[D]")
+    created_daily = _daily(columns.created_day, start, days)
+    completed_daily = _daily(columns.completed_day, start, days)
+
+    return {
+        "tasks": tasks,
+        "completed": completed,
+        "completion_rate": completed / tasks if tasks else 0.0,
+        "lists": len(lists),
+        "tasks_per_list": _distribution(per_list_tasks),
+        "completion_rate_per_list": _distribution(per_list_rate),
+        "per_list": [
+            {"list_id": list_id, "tasks": count, "completed": done, "completion_rate": rate}
+            for list_id, count, done, rate in zip(
+                lists[picked].tolist(), per_list_tasks[picked].tolist(),
+                per_list_completed[picked].tolist(), per_list_rate[picked].tolist())
+        ],
+        "daily": [
+            {"day": day, "created": created, "completed": done}
+            for day, created, done in zip(dates.tolist(), created_daily.tolist(), completed_daily.tolist())
+        ],
+    }